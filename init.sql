@@ -6,6 +6,9 @@
 -- Extension pour les UUID
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Extension pour la recherche par trigrammes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Table des catégories de produits
 CREATE TABLE IF NOT EXISTS categories (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -37,18 +40,76 @@ CREATE TABLE IF NOT EXISTS produits (
     seuil_alerte INTEGER DEFAULT 10 CHECK (seuil_alerte >= 0),
     categorie_id UUID REFERENCES categories(id) ON DELETE SET NULL,
     fournisseur_id UUID REFERENCES fournisseurs(id) ON DELETE SET NULL,
+    recherche TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('french', nom || ' ' || coalesce(description, ''))
+    ) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Table des mouvements de stock (entrées/sorties)
+-- Partitionnée par mois sur date_mouvement (voir creer_partitions_mouvements)
 CREATE TABLE IF NOT EXISTS mouvements_stock (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
     type_mouvement VARCHAR(10) NOT NULL CHECK (type_mouvement IN ('ENTREE', 'SORTIE')),
     quantite INTEGER NOT NULL CHECK (quantite > 0),
     motif TEXT,
-    date_mouvement TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    utilisateur_id UUID,
+    date_mouvement TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Mouvement correctif de la réconciliation (voir reconciliation.corriger_ecarts)
+    regularisation BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (id, date_mouvement)
+) PARTITION BY RANGE (date_mouvement);
+
+-- Partition par défaut : reçoit les mouvements hors des partitions mensuelles
+CREATE TABLE IF NOT EXISTS mouvements_stock_defaut PARTITION OF mouvements_stock DEFAULT;
+
+-- Instantanés du stock : stock de chaque produit au début d'une période (jour, mois)
+-- Le stock à une date se déduit de l'instantané le plus proche et des mouvements intermédiaires
+CREATE TABLE IF NOT EXISTS stocks_instantanes (
+    produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
+    date_instantane TIMESTAMP NOT NULL,
+    quantite INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (produit_id, date_instantane)
+);
+
+-- Solde par produit des mouvements archivés (voir archiver_partitions_mouvements) :
+-- le stock d'un produit égale ce solde plus celui des mouvements restants
+CREATE TABLE IF NOT EXISTS soldes_archives (
+    produit_id UUID PRIMARY KEY REFERENCES produits(id) ON DELETE CASCADE,
+    quantite BIGINT NOT NULL
+);
+
+-- Limite de l'archivage : les mouvements antérieurs à `avant` ne sont plus dans
+-- mouvements_stock (une seule ligne, tenue à jour par archiver_partitions_mouvements)
+CREATE TABLE IF NOT EXISTS limite_archives (
+    unique_ligne BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (unique_ligne),
+    avant DATE NOT NULL
+);
+
+-- Cumuls journaliers des mouvements par produit, tenus à jour par trigger
+-- (voir cumuler_mouvements_journaliers) : un rapport sur une période lit une ligne par
+-- produit et par jour. Les cumuls des partitions archivées sont conservés.
+CREATE TABLE IF NOT EXISTS mouvements_journaliers (
+    produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
+    jour DATE NOT NULL,
+    entrees BIGINT NOT NULL DEFAULT 0,
+    sorties BIGINT NOT NULL DEFAULT 0,
+    -- Part des sorties due aux régularisations de la réconciliation (hors demande)
+    sorties_regularisation BIGINT NOT NULL DEFAULT 0,
+    nb_mouvements INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (produit_id, jour)
+);
+
+-- Clés d'idempotence des mouvements : une demande rejouée (délai dépassé, reprise de la
+-- file d'ingestion) retourne le mouvement déjà enregistré au lieu de l'appliquer deux fois.
+-- Table distincte car un index unique de mouvements_stock devrait inclure date_mouvement
+CREATE TABLE IF NOT EXISTS cles_idempotence (
+    cle VARCHAR(100) PRIMARY KEY,
+    mouvement_id UUID NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -63,12 +124,26 @@ CREATE TABLE IF NOT EXISTS utilisateurs (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Auteur des mouvements (la table des utilisateurs est créée après mouvements_stock)
+ALTER TABLE mouvements_stock ADD CONSTRAINT mouvements_stock_utilisateur_id_fkey
+    FOREIGN KEY (utilisateur_id) REFERENCES utilisateurs(id) ON DELETE SET NULL;
+
 -- Index pour améliorer les performances
 CREATE INDEX IF NOT EXISTS idx_produits_categorie ON produits(categorie_id);
 CREATE INDEX IF NOT EXISTS idx_produits_fournisseur ON produits(fournisseur_id);
 CREATE INDEX IF NOT EXISTS idx_produits_reference ON produits(reference);
-CREATE INDEX IF NOT EXISTS idx_mouvements_produit ON mouvements_stock(produit_id);
+CREATE INDEX IF NOT EXISTS idx_produits_nom_id ON produits(nom, id);
+CREATE INDEX IF NOT EXISTS idx_produits_nom_trgm ON produits USING GIN (nom gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_produits_reference_trgm ON produits USING GIN (reference gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_produits_recherche ON produits USING GIN (recherche);
+-- Index partiel : ne contient que les produits en alerte de stock
+CREATE INDEX IF NOT EXISTS idx_produits_alerte ON produits(quantite_stock) WHERE quantite_stock <= seuil_alerte;
+-- Historique d'un produit du plus récent au plus ancien (pagination par curseur date, id)
+CREATE INDEX IF NOT EXISTS idx_mouvements_produit_historique ON mouvements_stock(produit_id, date_mouvement DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_mouvements_date ON mouvements_stock(date_mouvement);
+CREATE INDEX IF NOT EXISTS idx_mouvements_utilisateur ON mouvements_stock(utilisateur_id, date_mouvement DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_mouvements_journaliers_jour ON mouvements_journaliers(jour);
+CREATE INDEX IF NOT EXISTS idx_cles_idempotence_date ON cles_idempotence(created_at);
 
 -- Fonction pour mettre à jour automatiquement updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -79,6 +154,86 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Création des partitions mensuelles de mouvements_stock couvrant [debut, fin)
+-- Les lignes du mois déjà présentes dans la partition par défaut y sont déplacées
+CREATE OR REPLACE FUNCTION creer_partitions_mouvements(debut DATE, fin DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    mois DATE := date_trunc('month', debut);
+    nom TEXT;
+    nb INTEGER := 0;
+BEGIN
+    WHILE mois < fin LOOP
+        nom := 'mouvements_stock_' || to_char(mois, 'YYYY_MM');
+        IF to_regclass(nom) IS NULL THEN
+            CREATE TEMP TABLE mouvements_a_deplacer ON COMMIT DROP AS
+                SELECT * FROM mouvements_stock_defaut
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            -- Suppression par la table mère : les cumuls journaliers retranchent les lignes
+            -- déplacées, que la réinsertion ajoute à nouveau
+            DELETE FROM mouvements_stock
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF mouvements_stock FOR VALUES FROM (%L) TO (%L)',
+                nom, mois, (mois + INTERVAL '1 month')::DATE
+            );
+            INSERT INTO mouvements_stock SELECT * FROM mouvements_a_deplacer;
+            DROP TABLE mouvements_a_deplacer;
+            nb := nb + 1;
+        END IF;
+        mois := mois + INTERVAL '1 month';
+    END LOOP;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
+
+-- Archivage des partitions mensuelles entièrement antérieures à `avant` :
+-- solde reporté dans soldes_archives, partition détachée puis déplacée dans le schéma
+-- archives, ou supprimée ; la fin de la dernière partition archivée est retenue dans
+-- limite_archives
+CREATE OR REPLACE FUNCTION archiver_partitions_mouvements(avant DATE, supprimer BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition RECORD;
+    nb INTEGER := 0;
+    limite DATE;
+BEGIN
+    CREATE SCHEMA IF NOT EXISTS archives;
+    FOR partition IN
+        SELECT c.relname, (to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month')::DATE AS fin
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'mouvements_stock'::regclass
+          AND c.relname ~ '^mouvements_stock_[0-9]{4}_[0-9]{2}$'
+          AND to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month' <= avant
+    LOOP
+        EXECUTE format(
+            'INSERT INTO soldes_archives AS s (produit_id, quantite)
+             SELECT produit_id, sum(CASE WHEN type_mouvement = ''ENTREE'' THEN quantite ELSE -quantite END)
+             FROM %I GROUP BY produit_id
+             ON CONFLICT (produit_id) DO UPDATE SET quantite = s.quantite + EXCLUDED.quantite',
+            partition.relname
+        );
+        EXECUTE format('ALTER TABLE mouvements_stock DETACH PARTITION %I', partition.relname);
+        IF supprimer THEN
+            EXECUTE format('DROP TABLE %I', partition.relname);
+        ELSE
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archives', partition.relname);
+        END IF;
+        nb := nb + 1;
+        limite := greatest(limite, partition.fin);
+    END LOOP;
+    IF limite IS NOT NULL THEN
+        INSERT INTO limite_archives AS l (avant) VALUES (limite)
+        ON CONFLICT (unique_ligne) DO UPDATE SET avant = greatest(l.avant, EXCLUDED.avant);
+    END IF;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
+
+-- Partitions du mois courant et des trois suivants
+SELECT creer_partitions_mouvements(CURRENT_DATE, (date_trunc('month', CURRENT_DATE) + INTERVAL '4 months')::DATE);
+
 -- Triggers pour updated_at
 CREATE TRIGGER update_categories_updated_at BEFORE UPDATE ON categories
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -92,6 +247,109 @@ CREATE TRIGGER update_produits_updated_at BEFORE UPDATE ON produits
 CREATE TRIGGER update_utilisateurs_updated_at BEFORE UPDATE ON utilisateurs
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Mise à jour des cumuls journaliers par instruction (tables de transition) :
+-- un lot de mouvements donne un seul UPSERT groupé par produit et par jour
+CREATE OR REPLACE FUNCTION cumuler_mouvements_journaliers()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE mouvements_journaliers j
+        SET entrees = j.entrees - a.entrees,
+            sorties = j.sorties - a.sorties,
+            sorties_regularisation = j.sorties_regularisation - a.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements - a.nb_mouvements
+        FROM (
+            SELECT produit_id, date_mouvement::DATE AS jour,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0) AS entrees,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0) AS sorties,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                       AND regularisation), 0) AS sorties_regularisation,
+                   count(*) AS nb_mouvements
+            FROM anciens
+            GROUP BY 1, 2
+        ) a
+        WHERE j.produit_id = a.produit_id AND j.jour = a.jour;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO mouvements_journaliers AS j
+            (produit_id, jour, entrees, sorties, sorties_regularisation, nb_mouvements)
+        SELECT produit_id, date_mouvement::DATE,
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                   AND regularisation), 0),
+               count(*)
+        FROM nouveaux
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (produit_id, jour) DO UPDATE
+        SET entrees = j.entrees + EXCLUDED.entrees,
+            sorties = j.sorties + EXCLUDED.sorties,
+            sorties_regularisation = j.sorties_regularisation + EXCLUDED.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements + EXCLUDED.nb_mouvements;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Une table de transition n'est permise que pour un seul événement : un trigger par événement
+-- Seules les écritures adressées à mouvements_stock sont suivies (pas à une partition directement)
+CREATE TRIGGER cumuler_mouvements_insertion AFTER INSERT ON mouvements_stock
+    REFERENCING NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+CREATE TRIGGER cumuler_mouvements_modification AFTER UPDATE ON mouvements_stock
+    REFERENCING OLD TABLE AS anciens NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+CREATE TRIGGER cumuler_mouvements_suppression AFTER DELETE ON mouvements_stock
+    REFERENCING OLD TABLE AS anciens
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+-- Vues matérialisées des rapports de valorisation du stock
+-- (rafraîchies par REFRESH MATERIALIZED VIEW CONCURRENTLY, d'où les index uniques ;
+-- rafraichi_le est la date du dernier rafraîchissement)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_stock_par_categorie AS
+SELECT coalesce(p.categorie_id, '00000000-0000-0000-0000-000000000000') AS categorie_id,
+       coalesce(c.nom, 'Sans catégorie') AS categorie,
+       count(*) AS nb_produits,
+       sum(p.quantite_stock) AS quantite,
+       sum(p.prix_unitaire * p.quantite_stock) AS valeur,
+       now()::TIMESTAMP AS rafraichi_le
+FROM produits p
+LEFT JOIN categories c ON c.id = p.categorie_id
+GROUP BY p.categorie_id, c.nom;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_stock_par_categorie ON mv_stock_par_categorie(categorie_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_stock_par_fournisseur AS
+SELECT coalesce(p.fournisseur_id, '00000000-0000-0000-0000-000000000000') AS fournisseur_id,
+       coalesce(f.nom, 'Sans fournisseur') AS fournisseur,
+       count(*) AS nb_produits,
+       sum(p.quantite_stock) AS quantite,
+       sum(p.prix_unitaire * p.quantite_stock) AS valeur,
+       now()::TIMESTAMP AS rafraichi_le
+FROM produits p
+LEFT JOIN fournisseurs f ON f.id = p.fournisseur_id
+GROUP BY p.fournisseur_id, f.nom;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_stock_par_fournisseur ON mv_stock_par_fournisseur(fournisseur_id);
+
+-- Notification des modifications des tables de référence (invalidation des caches applicatifs)
+CREATE OR REPLACE FUNCTION notifier_referentiel()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('referentiel', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notifier_categories AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+    FOR EACH STATEMENT EXECUTE FUNCTION notifier_referentiel();
+
+CREATE TRIGGER notifier_fournisseurs AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fournisseurs
+    FOR EACH STATEMENT EXECUTE FUNCTION notifier_referentiel();
+
 -- Insertion de données de test
 INSERT INTO categories (id, nom, description) VALUES
     ('a1b2c3d4-e5f6-7890-abcd-ef1234567890', 'Électronique', 'Produits électroniques et accessoires'),
@@ -107,3 +365,7 @@ INSERT INTO produits (id, reference, nom, description, prix_unitaire, quantite_s
     ('a7b8c9d0-e1f2-3456-0123-567890123456', 'ELEC-002', 'Clavier mécanique', 'Clavier mécanique RGB', 89.99, 30, 5, 'a1b2c3d4-e5f6-7890-abcd-ef1234567890', 'd4e5f6a7-b8c9-0123-def0-234567890123'),
     ('b8c9d0e1-f2a3-4567-1234-678901234567', 'BURO-001', 'Stylo bleu', 'Lot de 10 stylos bleus', 5.99, 200, 50, 'b2c3d4e5-f6a7-8901-bcde-f12345678901', 'e5f6a7b8-c9d0-1234-ef01-345678901234'),
     ('c9d0e1f2-a3b4-5678-2345-789012345678', 'INFO-001', 'Câble HDMI 2m', 'Câble HDMI haute vitesse 2 mètres', 12.99, 100, 20, 'c3d4e5f6-a7b8-9012-cdef-123456789012', 'd4e5f6a7-b8c9-0123-def0-234567890123');
+
+-- Calcul initial des rapports
+REFRESH MATERIALIZED VIEW mv_stock_par_categorie;
+REFRESH MATERIALIZED VIEW mv_stock_par_fournisseur;
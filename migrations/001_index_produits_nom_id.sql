@@ -0,0 +1,6 @@
+-- ============================================
+-- Migration 001 : index de pagination des produits
+-- Sert le tri (nom, id) et la pagination par curseur
+-- ============================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_produits_nom_id ON produits(nom, id);
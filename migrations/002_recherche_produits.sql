@@ -0,0 +1,14 @@
+-- ============================================
+-- Migration 002 : recherche indexée des produits
+-- Trigrammes (pg_trgm) sur nom et référence, plein texte sur nom/description
+-- ============================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE produits ADD COLUMN IF NOT EXISTS recherche TSVECTOR GENERATED ALWAYS AS (
+    to_tsvector('french', nom || ' ' || coalesce(description, ''))
+) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_produits_nom_trgm ON produits USING GIN (nom gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_produits_reference_trgm ON produits USING GIN (reference gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_produits_recherche ON produits USING GIN (recherche);
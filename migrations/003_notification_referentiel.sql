@@ -0,0 +1,20 @@
+-- ============================================
+-- Migration 003 : notification des modifications du référentiel
+-- Invalide les caches applicatifs des catégories et fournisseurs
+-- ============================================
+
+CREATE OR REPLACE FUNCTION notifier_referentiel()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('referentiel', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notifier_categories ON categories;
+CREATE TRIGGER notifier_categories AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+    FOR EACH STATEMENT EXECUTE FUNCTION notifier_referentiel();
+
+DROP TRIGGER IF EXISTS notifier_fournisseurs ON fournisseurs;
+CREATE TRIGGER notifier_fournisseurs AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fournisseurs
+    FOR EACH STATEMENT EXECUTE FUNCTION notifier_referentiel();
@@ -0,0 +1,7 @@
+-- ============================================
+-- Migration 004 : index partiel des alertes de stock
+-- Le contrôle des alertes ne parcourt plus que les produits concernés
+-- ============================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_produits_alerte ON produits(quantite_stock)
+    WHERE quantite_stock <= seuil_alerte;
@@ -0,0 +1,28 @@
+-- ============================================
+-- Migration 005 : vues matérialisées des rapports de stock
+-- Valeur et quantités du stock par catégorie et par fournisseur
+-- ============================================
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_stock_par_categorie AS
+SELECT coalesce(p.categorie_id, '00000000-0000-0000-0000-000000000000') AS categorie_id,
+       coalesce(c.nom, 'Sans catégorie') AS categorie,
+       count(*) AS nb_produits,
+       sum(p.quantite_stock) AS quantite,
+       sum(p.prix_unitaire * p.quantite_stock) AS valeur
+FROM produits p
+LEFT JOIN categories c ON c.id = p.categorie_id
+GROUP BY p.categorie_id, c.nom;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_stock_par_categorie ON mv_stock_par_categorie(categorie_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_stock_par_fournisseur AS
+SELECT coalesce(p.fournisseur_id, '00000000-0000-0000-0000-000000000000') AS fournisseur_id,
+       coalesce(f.nom, 'Sans fournisseur') AS fournisseur,
+       count(*) AS nb_produits,
+       sum(p.quantite_stock) AS quantite,
+       sum(p.prix_unitaire * p.quantite_stock) AS valeur
+FROM produits p
+LEFT JOIN fournisseurs f ON f.id = p.fournisseur_id
+GROUP BY p.fournisseur_id, f.nom;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_stock_par_fournisseur ON mv_stock_par_fournisseur(fournisseur_id);
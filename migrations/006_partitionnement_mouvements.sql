@@ -0,0 +1,106 @@
+-- ============================================
+-- Migration 006 : partitionnement mensuel de mouvements_stock
+-- Conversion de la table existante en table partitionnée sur date_mouvement
+-- ============================================
+
+-- Création des partitions mensuelles de mouvements_stock couvrant [debut, fin)
+-- Les lignes du mois déjà présentes dans la partition par défaut y sont déplacées
+CREATE OR REPLACE FUNCTION creer_partitions_mouvements(debut DATE, fin DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    mois DATE := date_trunc('month', debut);
+    nom TEXT;
+    nb INTEGER := 0;
+BEGIN
+    WHILE mois < fin LOOP
+        nom := 'mouvements_stock_' || to_char(mois, 'YYYY_MM');
+        IF to_regclass(nom) IS NULL THEN
+            CREATE TEMP TABLE mouvements_a_deplacer ON COMMIT DROP AS
+                SELECT * FROM mouvements_stock_defaut
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            DELETE FROM mouvements_stock_defaut
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF mouvements_stock FOR VALUES FROM (%L) TO (%L)',
+                nom, mois, (mois + INTERVAL '1 month')::DATE
+            );
+            INSERT INTO mouvements_stock SELECT * FROM mouvements_a_deplacer;
+            DROP TABLE mouvements_a_deplacer;
+            nb := nb + 1;
+        END IF;
+        mois := mois + INTERVAL '1 month';
+    END LOOP;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
+
+-- Archivage des partitions mensuelles entièrement antérieures à `avant` :
+-- détachées puis déplacées dans le schéma archives, ou supprimées
+CREATE OR REPLACE FUNCTION archiver_partitions_mouvements(avant DATE, supprimer BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition RECORD;
+    nb INTEGER := 0;
+BEGIN
+    CREATE SCHEMA IF NOT EXISTS archives;
+    FOR partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'mouvements_stock'::regclass
+          AND c.relname ~ '^mouvements_stock_[0-9]{4}_[0-9]{2}$'
+          AND to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month' <= avant
+    LOOP
+        EXECUTE format('ALTER TABLE mouvements_stock DETACH PARTITION %I', partition.relname);
+        IF supprimer THEN
+            EXECUTE format('DROP TABLE %I', partition.relname);
+        ELSE
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archives', partition.relname);
+        END IF;
+        nb := nb + 1;
+    END LOOP;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
+
+-- Conversion (sans effet si la table est déjà partitionnée)
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'mouvements_stock'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE mouvements_stock RENAME TO mouvements_stock_ancienne;
+    ALTER TABLE mouvements_stock_ancienne RENAME CONSTRAINT mouvements_stock_pkey TO mouvements_stock_ancienne_pkey;
+    DROP INDEX IF EXISTS idx_mouvements_produit;
+    DROP INDEX IF EXISTS idx_mouvements_date;
+
+    CREATE TABLE mouvements_stock (
+        id UUID NOT NULL DEFAULT uuid_generate_v4(),
+        produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
+        type_mouvement VARCHAR(10) NOT NULL CHECK (type_mouvement IN ('ENTREE', 'SORTIE')),
+        quantite INTEGER NOT NULL CHECK (quantite > 0),
+        motif TEXT,
+        date_mouvement TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, date_mouvement)
+    ) PARTITION BY RANGE (date_mouvement);
+
+    CREATE TABLE mouvements_stock_defaut PARTITION OF mouvements_stock DEFAULT;
+
+    PERFORM creer_partitions_mouvements(
+        coalesce((SELECT min(date_mouvement) FROM mouvements_stock_ancienne)::DATE, CURRENT_DATE),
+        (date_trunc('month', CURRENT_DATE) + INTERVAL '4 months')::DATE
+    );
+
+    INSERT INTO mouvements_stock (id, produit_id, type_mouvement, quantite, motif, date_mouvement, created_at)
+    SELECT id, produit_id, type_mouvement, quantite, motif,
+           coalesce(date_mouvement, created_at, CURRENT_TIMESTAMP), created_at
+    FROM mouvements_stock_ancienne;
+
+    DROP TABLE mouvements_stock_ancienne;
+
+    CREATE INDEX idx_mouvements_produit ON mouvements_stock(produit_id);
+    CREATE INDEX idx_mouvements_date ON mouvements_stock(date_mouvement);
+END;
+$$;
@@ -0,0 +1,18 @@
+-- ============================================
+-- Migration 007 : instantanés périodiques du stock
+-- Stock à une date = instantané le plus proche + mouvements intermédiaires
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS stocks_instantanes (
+    produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
+    date_instantane TIMESTAMP NOT NULL,
+    quantite INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (produit_id, date_instantane)
+);
+
+-- Les mouvements d'un produit sur un intervalle de dates se lisent par une plage d'index.
+-- CONCURRENTLY n'est pas disponible sur une table partitionnée.
+-- L'index remplace idx_mouvements_produit, dont il couvre les recherches.
+CREATE INDEX IF NOT EXISTS idx_mouvements_produit_date ON mouvements_stock(produit_id, date_mouvement);
+DROP INDEX IF EXISTS idx_mouvements_produit;
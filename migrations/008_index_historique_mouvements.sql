@@ -0,0 +1,9 @@
+-- ============================================
+-- Migration 008 : index de l'historique des mouvements par produit
+-- Pagination par curseur (date, id) du plus récent au plus ancien
+-- ============================================
+
+-- CONCURRENTLY n'est pas disponible sur une table partitionnée.
+-- Remplace idx_mouvements_produit_date (migration 007), dont il sert aussi les requêtes.
+CREATE INDEX IF NOT EXISTS idx_mouvements_produit_historique ON mouvements_stock(produit_id, date_mouvement DESC, id DESC);
+DROP INDEX IF EXISTS idx_mouvements_produit_date;
@@ -0,0 +1,18 @@
+-- ============================================
+-- Migration 009 : auteur des mouvements de stock
+-- Filtre du journal des mouvements par utilisateur
+-- ============================================
+
+ALTER TABLE mouvements_stock ADD COLUMN IF NOT EXISTS utilisateur_id UUID;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'mouvements_stock_utilisateur_id_fkey') THEN
+        ALTER TABLE mouvements_stock ADD CONSTRAINT mouvements_stock_utilisateur_id_fkey
+            FOREIGN KEY (utilisateur_id) REFERENCES utilisateurs(id) ON DELETE SET NULL;
+    END IF;
+END;
+$$;
+
+-- CONCURRENTLY n'est pas disponible sur une table partitionnée
+CREATE INDEX IF NOT EXISTS idx_mouvements_utilisateur ON mouvements_stock(utilisateur_id, date_mouvement DESC, id DESC);
@@ -0,0 +1,48 @@
+-- ============================================
+-- Migration 010 : solde des mouvements archivés
+-- La réconciliation stock / mouvements reste juste après archivage des partitions
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS soldes_archives (
+    produit_id UUID PRIMARY KEY REFERENCES produits(id) ON DELETE CASCADE,
+    quantite BIGINT NOT NULL
+);
+
+-- Le solde des partitions déjà archivées n'est pas repris : les produits concernés
+-- apparaîtront en écart et pourront être régularisés (python/reconciliation.py)
+-- Archivage des partitions mensuelles entièrement antérieures à `avant` :
+-- solde reporté dans soldes_archives, partition détachée puis déplacée dans le schéma
+-- archives, ou supprimée
+CREATE OR REPLACE FUNCTION archiver_partitions_mouvements(avant DATE, supprimer BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition RECORD;
+    nb INTEGER := 0;
+BEGIN
+    CREATE SCHEMA IF NOT EXISTS archives;
+    FOR partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'mouvements_stock'::regclass
+          AND c.relname ~ '^mouvements_stock_[0-9]{4}_[0-9]{2}$'
+          AND to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month' <= avant
+    LOOP
+        EXECUTE format(
+            'INSERT INTO soldes_archives AS s (produit_id, quantite)
+             SELECT produit_id, sum(CASE WHEN type_mouvement = ''ENTREE'' THEN quantite ELSE -quantite END)
+             FROM %I GROUP BY produit_id
+             ON CONFLICT (produit_id) DO UPDATE SET quantite = s.quantite + EXCLUDED.quantite',
+            partition.relname
+        );
+        EXECUTE format('ALTER TABLE mouvements_stock DETACH PARTITION %I', partition.relname);
+        IF supprimer THEN
+            EXECUTE format('DROP TABLE %I', partition.relname);
+        ELSE
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archives', partition.relname);
+        END IF;
+        nb := nb + 1;
+    END LOOP;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,137 @@
+-- ============================================
+-- Migration 011 : cumuls journaliers des mouvements
+-- Une ligne par produit et par jour (entrées, sorties, nombre), tenue à jour par trigger
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS mouvements_journaliers (
+    produit_id UUID NOT NULL REFERENCES produits(id) ON DELETE CASCADE,
+    jour DATE NOT NULL,
+    entrees BIGINT NOT NULL DEFAULT 0,
+    sorties BIGINT NOT NULL DEFAULT 0,
+    -- Part des sorties due aux régularisations de la réconciliation (hors demande)
+    sorties_regularisation BIGINT NOT NULL DEFAULT 0,
+    nb_mouvements INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (produit_id, jour)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mouvements_journaliers_jour ON mouvements_journaliers(jour);
+
+-- Création des partitions mensuelles de mouvements_stock couvrant [debut, fin)
+-- Les lignes du mois déjà présentes dans la partition par défaut y sont déplacées
+CREATE OR REPLACE FUNCTION creer_partitions_mouvements(debut DATE, fin DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    mois DATE := date_trunc('month', debut);
+    nom TEXT;
+    nb INTEGER := 0;
+BEGIN
+    WHILE mois < fin LOOP
+        nom := 'mouvements_stock_' || to_char(mois, 'YYYY_MM');
+        IF to_regclass(nom) IS NULL THEN
+            CREATE TEMP TABLE mouvements_a_deplacer ON COMMIT DROP AS
+                SELECT * FROM mouvements_stock_defaut
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            -- Suppression par la table mère : les cumuls journaliers retranchent les lignes
+            -- déplacées, que la réinsertion ajoute à nouveau
+            DELETE FROM mouvements_stock
+                WHERE date_mouvement >= mois AND date_mouvement < mois + INTERVAL '1 month';
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF mouvements_stock FOR VALUES FROM (%L) TO (%L)',
+                nom, mois, (mois + INTERVAL '1 month')::DATE
+            );
+            INSERT INTO mouvements_stock SELECT * FROM mouvements_a_deplacer;
+            DROP TABLE mouvements_a_deplacer;
+            nb := nb + 1;
+        END IF;
+        mois := mois + INTERVAL '1 month';
+    END LOOP;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
+
+-- Le libellé 'Régularisation (réconciliation)' est celui de reconciliation.MOTIF_CORRECTION ;
+-- la migration 015 le remplace par la colonne regularisation
+-- Mise à jour des cumuls journaliers par instruction (tables de transition) :
+-- un lot de mouvements donne un seul UPSERT groupé par produit et par jour
+CREATE OR REPLACE FUNCTION cumuler_mouvements_journaliers()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE mouvements_journaliers j
+        SET entrees = j.entrees - a.entrees,
+            sorties = j.sorties - a.sorties,
+            sorties_regularisation = j.sorties_regularisation - a.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements - a.nb_mouvements
+        FROM (
+            SELECT produit_id, date_mouvement::DATE AS jour,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0) AS entrees,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0) AS sorties,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                       AND motif = 'Régularisation (réconciliation)'), 0) AS sorties_regularisation,
+                   count(*) AS nb_mouvements
+            FROM anciens
+            GROUP BY 1, 2
+        ) a
+        WHERE j.produit_id = a.produit_id AND j.jour = a.jour;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO mouvements_journaliers AS j
+            (produit_id, jour, entrees, sorties, sorties_regularisation, nb_mouvements)
+        SELECT produit_id, date_mouvement::DATE,
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                   AND motif = 'Régularisation (réconciliation)'), 0),
+               count(*)
+        FROM nouveaux
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (produit_id, jour) DO UPDATE
+        SET entrees = j.entrees + EXCLUDED.entrees,
+            sorties = j.sorties + EXCLUDED.sorties,
+            sorties_regularisation = j.sorties_regularisation + EXCLUDED.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements + EXCLUDED.nb_mouvements;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Triggers et reprise de l'historique dans une même transaction : les écritures de
+-- mouvements sont bloquées le temps du calcul, aucune n'est perdue ni comptée deux fois
+BEGIN;
+
+LOCK TABLE mouvements_stock IN SHARE ROW EXCLUSIVE MODE;
+
+-- Une table de transition n'est permise que pour un seul événement : un trigger par événement
+-- Seules les écritures adressées à mouvements_stock sont suivies (pas à une partition directement)
+DROP TRIGGER IF EXISTS cumuler_mouvements_insertion ON mouvements_stock;
+CREATE TRIGGER cumuler_mouvements_insertion AFTER INSERT ON mouvements_stock
+    REFERENCING NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+DROP TRIGGER IF EXISTS cumuler_mouvements_modification ON mouvements_stock;
+CREATE TRIGGER cumuler_mouvements_modification AFTER UPDATE ON mouvements_stock
+    REFERENCING OLD TABLE AS anciens NEW TABLE AS nouveaux
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+DROP TRIGGER IF EXISTS cumuler_mouvements_suppression ON mouvements_stock;
+CREATE TRIGGER cumuler_mouvements_suppression AFTER DELETE ON mouvements_stock
+    REFERENCING OLD TABLE AS anciens
+    FOR EACH STATEMENT EXECUTE FUNCTION cumuler_mouvements_journaliers();
+
+-- Reprise uniquement si la table est vide (migration rejouée : les cumuls sont déjà à jour)
+INSERT INTO mouvements_journaliers
+    (produit_id, jour, entrees, sorties, sorties_regularisation, nb_mouvements)
+SELECT produit_id, date_mouvement::DATE,
+       coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0),
+       coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0),
+       coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+           AND motif = 'Régularisation (réconciliation)'), 0),
+       count(*)
+FROM mouvements_stock
+WHERE NOT EXISTS (SELECT 1 FROM mouvements_journaliers)
+GROUP BY 1, 2;
+
+COMMIT;
+
+-- Les mouvements des partitions déjà archivées ne sont pas repris
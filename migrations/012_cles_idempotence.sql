@@ -0,0 +1,13 @@
+-- ============================================
+-- Migration 012 : clés d'idempotence des mouvements
+-- Un mouvement rejoué avec la même clé n'est appliqué qu'une fois
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS cles_idempotence (
+    cle VARCHAR(100) PRIMARY KEY,
+    mouvement_id UUID NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Purge des clés anciennes (voir purger_cles_idempotence dans python/mouvement.py)
+CREATE INDEX IF NOT EXISTS idx_cles_idempotence_date ON cles_idempotence(created_at);
@@ -0,0 +1,66 @@
+-- ============================================
+-- Migration 014 : limite de l'archivage des mouvements
+-- Le stock à une date antérieure aux mouvements archivés n'est plus calculable depuis
+-- mouvements_stock : la limite est enregistrée pour refuser ces dates
+-- ============================================
+
+-- Limite de l'archivage : les mouvements antérieurs à `avant` ne sont plus dans
+-- mouvements_stock (une seule ligne, tenue à jour par archiver_partitions_mouvements)
+CREATE TABLE IF NOT EXISTS limite_archives (
+    unique_ligne BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (unique_ligne),
+    avant DATE NOT NULL
+);
+
+-- Partitions déjà archivées et conservées dans le schéma archives (celles supprimées
+-- ne peuvent pas être retrouvées)
+INSERT INTO limite_archives (avant)
+SELECT max(to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month')::DATE
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'archives' AND c.relname ~ '^mouvements_stock_[0-9]{4}_[0-9]{2}$'
+HAVING count(*) > 0
+ON CONFLICT (unique_ligne) DO UPDATE SET avant = greatest(limite_archives.avant, EXCLUDED.avant);
+
+-- Archivage des partitions mensuelles entièrement antérieures à `avant` :
+-- solde reporté dans soldes_archives, partition détachée puis déplacée dans le schéma
+-- archives, ou supprimée ; la fin de la dernière partition archivée est retenue dans
+-- limite_archives
+CREATE OR REPLACE FUNCTION archiver_partitions_mouvements(avant DATE, supprimer BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition RECORD;
+    nb INTEGER := 0;
+    limite DATE;
+BEGIN
+    CREATE SCHEMA IF NOT EXISTS archives;
+    FOR partition IN
+        SELECT c.relname, (to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month')::DATE AS fin
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'mouvements_stock'::regclass
+          AND c.relname ~ '^mouvements_stock_[0-9]{4}_[0-9]{2}$'
+          AND to_date(substr(c.relname, 18), 'YYYY_MM') + INTERVAL '1 month' <= avant
+    LOOP
+        EXECUTE format(
+            'INSERT INTO soldes_archives AS s (produit_id, quantite)
+             SELECT produit_id, sum(CASE WHEN type_mouvement = ''ENTREE'' THEN quantite ELSE -quantite END)
+             FROM %I GROUP BY produit_id
+             ON CONFLICT (produit_id) DO UPDATE SET quantite = s.quantite + EXCLUDED.quantite',
+            partition.relname
+        );
+        EXECUTE format('ALTER TABLE mouvements_stock DETACH PARTITION %I', partition.relname);
+        IF supprimer THEN
+            EXECUTE format('DROP TABLE %I', partition.relname);
+        ELSE
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archives', partition.relname);
+        END IF;
+        nb := nb + 1;
+        limite := greatest(limite, partition.fin);
+    END LOOP;
+    IF limite IS NOT NULL THEN
+        INSERT INTO limite_archives AS l (avant) VALUES (limite)
+        ON CONFLICT (unique_ligne) DO UPDATE SET avant = greatest(l.avant, EXCLUDED.avant);
+    END IF;
+    RETURN nb;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,58 @@
+-- ============================================
+-- Migration 015 : marquage des mouvements de régularisation
+-- Les corrections de la réconciliation sont repérées par la colonne regularisation au lieu
+-- de leur libellé ; les cumuls journaliers s'en servent pour isoler ces sorties
+-- ============================================
+
+-- Valeur par défaut constante : ajout sans réécriture des partitions
+ALTER TABLE mouvements_stock ADD COLUMN IF NOT EXISTS regularisation BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Reprise des corrections déjà enregistrées, avant le remplacement de la fonction : la
+-- fonction précédente, fondée sur le libellé, retranche puis rajoute la même quantité
+UPDATE mouvements_stock SET regularisation = TRUE
+WHERE motif = 'Régularisation (réconciliation)' AND NOT regularisation;
+
+-- Mise à jour des cumuls journaliers par instruction (tables de transition) :
+-- un lot de mouvements donne un seul UPSERT groupé par produit et par jour
+CREATE OR REPLACE FUNCTION cumuler_mouvements_journaliers()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE mouvements_journaliers j
+        SET entrees = j.entrees - a.entrees,
+            sorties = j.sorties - a.sorties,
+            sorties_regularisation = j.sorties_regularisation - a.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements - a.nb_mouvements
+        FROM (
+            SELECT produit_id, date_mouvement::DATE AS jour,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0) AS entrees,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0) AS sorties,
+                   coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                       AND regularisation), 0) AS sorties_regularisation,
+                   count(*) AS nb_mouvements
+            FROM anciens
+            GROUP BY 1, 2
+        ) a
+        WHERE j.produit_id = a.produit_id AND j.jour = a.jour;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO mouvements_journaliers AS j
+            (produit_id, jour, entrees, sorties, sorties_regularisation, nb_mouvements)
+        SELECT produit_id, date_mouvement::DATE,
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'ENTREE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'), 0),
+               coalesce(sum(quantite) FILTER (WHERE type_mouvement = 'SORTIE'
+                   AND regularisation), 0),
+               count(*)
+        FROM nouveaux
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (produit_id, jour) DO UPDATE
+        SET entrees = j.entrees + EXCLUDED.entrees,
+            sorties = j.sorties + EXCLUDED.sorties,
+            sorties_regularisation = j.sorties_regularisation + EXCLUDED.sorties_regularisation,
+            nb_mouvements = j.nb_mouvements + EXCLUDED.nb_mouvements;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
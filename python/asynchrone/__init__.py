@@ -0,0 +1,13 @@
+"""
+API asynchrone de la couche d'accès aux données (SQLAlchemy asyncio, pilote asyncpg)
+Chaque module reprend les fonctions du module synchrone de même nom, avec les mêmes
+paramètres et les mêmes valeurs de retour, et réutilise ses requêtes et models.py :
+
+    from asynchrone.produit import lire_produit
+    from asynchrone.mouvement import sortie_stock
+
+    produit = await lire_produit(produit_id)
+    mouvement_id = await sortie_stock(produit_id, 2, "Vente")
+
+Le dossier python/ doit être dans le chemin d'import, comme pour les modules synchrones.
+"""
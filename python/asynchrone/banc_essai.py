@@ -0,0 +1,119 @@
+"""
+Banc d'essai : débit de N appels simultanés à lire_produit et sortie_stock,
+API asynchrone (asyncio.gather) contre API synchrone (pool de threads)
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python -m asynchrone.banc_essai --appels 1000 --threads 50
+
+Les sorties portent le motif "Banc d'essai" ; celles qui ont réussi sont compensées à la fin
+par un lot d'entrées.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+import mouvement
+import produit
+from asynchrone import connexion as connexion_asynchrone
+from asynchrone import mouvement as mouvement_asynchrone
+from asynchrone import produit as produit_asynchrone
+from connexion import get_session, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from models import Produit
+
+MOTIF = "Banc d'essai"
+
+
+def _produits_en_stock(nombre):
+    """Identifiants de `nombre` produits ayant au moins deux unités en stock"""
+    session = get_session()
+    try:
+        return list(session.execute(
+            select(Produit.id).where(Produit.quantite_stock >= 2).order_by(Produit.id).limit(nombre)
+        ).scalars())
+    finally:
+        session.close()
+
+
+def _mesurer_threads(fonction, appels, threads):
+    """Durée d'exécution de tous les appels dans un pool de `threads` threads"""
+    with ThreadPoolExecutor(max_workers=threads) as executeur:
+        debut = time.perf_counter()
+        resultats = list(executeur.map(lambda args: fonction(*args), appels))
+        return time.perf_counter() - debut, resultats
+
+
+async def _mesurer_asyncio(fonction, appels):
+    """Durée d'exécution de tous les appels lancés simultanément dans la boucle"""
+    debut = time.perf_counter()
+    resultats = await asyncio.gather(*(fonction(*args) for args in appels))
+    return time.perf_counter() - debut, resultats
+
+
+async def _banc_asynchrone(lectures, sorties):
+    """Mesures de l'API asynchrone (pool chauffé au préalable)"""
+    await asyncio.gather(*(connexion_asynchrone.test_connexion()
+                           for _ in range(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+    mesures = (await _mesurer_asyncio(produit_asynchrone.lire_produit, lectures),
+               await _mesurer_asyncio(mouvement_asynchrone.sortie_stock, sorties))
+    await connexion_asynchrone.engine.dispose()
+    return mesures
+
+
+def _afficher(nom, appels, duree, resultats):
+    reussis = sum(1 for r in resultats if r is not None)
+    print(f"  {nom:<28} {duree * 1000:9.1f} ms  {appels / duree:9.0f} appels/s  "
+          f"({reussis}/{appels} réussis)")
+
+
+def executer(nb_appels=1000, threads=50):
+    """Lancer le banc d'essai et afficher le débit de chaque API"""
+    produit_ids = _produits_en_stock(nb_appels)
+    if len(produit_ids) < nb_appels:
+        print(f"Seulement {len(produit_ids)} produit(s) avec du stock, {nb_appels} requis")
+        return False
+
+    # Un produit par appel : le débit mesuré n'est pas limité par les verrous de ligne
+    lectures = [(produit_id,) for produit_id in produit_ids]
+    sorties = [(produit_id, 1, MOTIF) for produit_id in produit_ids]
+
+    # Chauffer le pool synchrone
+    _mesurer_threads(produit.lire_produit, lectures[:threads], threads)
+
+    print(f"{nb_appels} appels simultanés, pools de {DB_POOL_SIZE}+{DB_MAX_OVERFLOW} connexions")
+    print(f"Synchrone ({threads} threads) :")
+    _afficher("lire_produit", nb_appels, *_mesurer_threads(produit.lire_produit, lectures, threads))
+    duree_sortie, sortis_threads = _mesurer_threads(mouvement.sortie_stock, sorties, threads)
+    _afficher("sortie_stock", nb_appels, duree_sortie, sortis_threads)
+
+    print("Asynchrone (asyncio.gather) :")
+    (duree_lecture, lus), (duree_sortie, sortis) = asyncio.run(_banc_asynchrone(lectures, sorties))
+    _afficher("lire_produit", nb_appels, duree_lecture, lus)
+    _afficher("sortie_stock", nb_appels, duree_sortie, sortis)
+
+    # Remettre le stock : une unité par sortie réussie, les résultats étant dans l'ordre des
+    # appels (une sortie refusée, stock épuisé entre-temps par exemple, n'est pas compensée)
+    retraits = [
+        (produit_id, (par_thread is not None) + (par_boucle is not None))
+        for produit_id, par_thread, par_boucle in zip(produit_ids, sortis_threads, sortis)
+    ]
+    _, erreurs = mouvement.mouvements_en_lot(
+        [(produit_id, 'ENTREE', nombre, f"{MOTIF} (compensation)")
+         for produit_id, nombre in retraits if nombre]
+    )
+    if erreurs:
+        print(f"Erreur lors de la compensation: {erreurs}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit de l'API asynchrone contre l'API synchrone")
+    parser.add_argument('--appels', type=int, default=1000, help="appels simultanés (défaut: 1000)")
+    parser.add_argument('--threads', type=int, default=50,
+                        help="threads de l'API synchrone (défaut: 50)")
+    args = parser.parse_args()
+    executer(args.appels, args.threads)
@@ -0,0 +1,93 @@
+"""
+CRUD asynchrone pour la table categories, voir categorie.py
+"""
+
+from sqlalchemy import select
+
+from asynchrone.connexion import get_session, apres_transaction
+from cache import cache_categories, en_cache
+from models import Categorie
+
+
+async def creer_categorie(nom, description=None):
+    """Créer une nouvelle catégorie"""
+    session = get_session()
+    try:
+        categorie = Categorie(nom=nom, description=description)
+        session.add(categorie)
+        await session.commit()
+        apres_transaction(cache_categories.invalider)
+        return categorie.id
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la création: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+@en_cache(cache_categories)
+async def lire_categories():
+    """Lire toutes les catégories"""
+    session = get_session()
+    try:
+        categories = await session.scalars(select(Categorie).order_by(Categorie.nom))
+        return [(c.id, c.nom, c.description) for c in categories]
+    finally:
+        await session.close()
+
+
+@en_cache(cache_categories)
+async def lire_categorie(categorie_id):
+    """Lire une catégorie par son ID"""
+    session = get_session()
+    try:
+        c = await session.get(Categorie, categorie_id)
+        if c:
+            return (c.id, c.nom, c.description)
+        return None
+    finally:
+        await session.close()
+
+
+async def modifier_categorie(categorie_id, nom=None, description=None):
+    """Modifier une catégorie existante"""
+    session = get_session()
+    try:
+        categorie = await session.get(Categorie, categorie_id)
+        if not categorie:
+            return False
+
+        if nom is not None:
+            categorie.nom = nom
+        if description is not None:
+            categorie.description = description
+
+        await session.commit()
+        apres_transaction(cache_categories.invalider)
+        return True
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la modification: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def supprimer_categorie(categorie_id):
+    """Supprimer une catégorie"""
+    session = get_session()
+    try:
+        categorie = await session.get(Categorie, categorie_id)
+        if categorie:
+            await session.delete(categorie)
+            await session.commit()
+            apres_transaction(cache_categories.invalider)
+            return True
+        return False
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la suppression: {e}")
+        return False
+    finally:
+        await session.close()
@@ -0,0 +1,153 @@
+"""
+Connexion asynchrone à la base de données PostgreSQL (extension asyncio de SQLAlchemy)
+Même configuration que connexion.py (.env, pool), pilote asyncpg
+"""
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from connexion import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                       DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT)
+
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername='postgresql+asyncpg')
+
+# asyncpg transmet les paramètres de session au démarrage de la connexion
+_parametres_serveur = {}
+if DB_STATEMENT_TIMEOUT > 0:
+    _parametres_serveur['statement_timeout'] = str(DB_STATEMENT_TIMEOUT)
+
+# Créer le moteur asynchrone (pool distinct de celui du moteur synchrone)
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_recycle=DB_POOL_RECYCLE,
+    connect_args={'server_settings': _parametres_serveur}
+)
+
+# Créer la factory de sessions ; pas d'expiration au commit, aucun chargement implicite
+# n'étant possible hors d'un await
+SessionLocal = async_sessionmaker(engine, autocommit=False, autoflush=False,
+                                  expire_on_commit=False)
+
+# Unité de travail active dans la tâche courante, voir transaction()
+_unite_courante = ContextVar('unite_de_travail_asynchrone', default=None)
+
+
+class UniteDeTravail:
+    """Session et transaction partagées par les fonctions CRUD appelées dans transaction()"""
+
+    def __init__(self):
+        self.session = SessionLocal()
+        self.annulee = False
+        self.rappels = []
+
+    async def annuler(self):
+        """Annuler l'unité : rien ne sera validé, y compris les opérations suivantes"""
+        self.annulee = True
+        await self.session.rollback()
+
+
+class _SessionPartagee:
+    """
+    Session d'une unité de travail telle que la voient les fonctions CRUD :
+    commit se limite à un flush, rollback annule toute l'unité et close est sans effet.
+    """
+
+    def __init__(self, unite):
+        self._unite = unite
+
+    def __getattr__(self, nom):
+        return getattr(self._unite.session, nom)
+
+    async def commit(self):
+        await self._unite.session.flush()
+
+    async def rollback(self):
+        await self._unite.annuler()
+
+    async def close(self):
+        pass
+
+
+@asynccontextmanager
+async def transaction():
+    """
+    Unité de travail asynchrone, mêmes règles que connexion.transaction() :
+
+        async with transaction() as uow:
+            produit_id = await creer_produit(...)
+            await entree_stock(produit_id, 10)
+    """
+    unite = _unite_courante.get()
+    if unite is not None:
+        yield unite
+        return
+
+    unite = UniteDeTravail()
+    jeton = _unite_courante.set(unite)
+    try:
+        yield unite
+        if unite.annulee:
+            await unite.session.rollback()
+        else:
+            await unite.session.commit()
+    except BaseException:
+        unite.annulee = True
+        await unite.session.rollback()
+        raise
+    finally:
+        _unite_courante.reset(jeton)
+        await unite.session.close()
+        for rappel in unite.rappels:
+            rappel()
+
+
+def apres_transaction(rappel):
+    """
+    Exécuter `rappel` (sans argument) après la validation ou l'annulation de l'unité de
+    travail active, ou immédiatement hors unité : invalidation de cache par exemple.
+    """
+    unite = _unite_courante.get()
+    if unite is None:
+        rappel()
+    elif rappel not in unite.rappels:
+        unite.rappels.append(rappel)
+
+
+def transaction_active():
+    """Indique si une unité de travail est active dans la tâche courante"""
+    return _unite_courante.get() is not None
+
+
+def get_session():
+    """
+    Crée et retourne une nouvelle session asynchrone (à fermer par `await session.close()`).
+    Dans un bloc transaction(), retourne la session partagée de l'unité de travail.
+    """
+    unite = _unite_courante.get()
+    if unite is not None:
+        return _SessionPartagee(unite)
+    return SessionLocal()
+
+
+async def test_connexion():
+    """
+    Teste la connexion à la base de données.
+    Retourne True si OK, False sinon.
+    """
+    try:
+        session = get_session()
+        await session.execute(text("SELECT 1"))
+        await session.close()
+        return True
+    except Exception as e:
+        print(f"Erreur de test de connexion: {e}")
+        return False
@@ -0,0 +1,97 @@
+"""
+CRUD asynchrone pour la table fournisseurs, voir fournisseur.py
+"""
+
+from sqlalchemy import select
+
+from asynchrone.connexion import get_session, apres_transaction
+from cache import cache_fournisseurs, en_cache
+from models import Fournisseur
+
+
+async def creer_fournisseur(nom, email=None, telephone=None, adresse=None):
+    """Créer un nouveau fournisseur"""
+    session = get_session()
+    try:
+        fournisseur = Fournisseur(nom=nom, email=email, telephone=telephone, adresse=adresse)
+        session.add(fournisseur)
+        await session.commit()
+        apres_transaction(cache_fournisseurs.invalider)
+        return fournisseur.id
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la création: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+@en_cache(cache_fournisseurs)
+async def lire_fournisseurs():
+    """Lire tous les fournisseurs"""
+    session = get_session()
+    try:
+        fournisseurs = await session.scalars(select(Fournisseur).order_by(Fournisseur.nom))
+        return [(f.id, f.nom, f.email, f.telephone, f.adresse) for f in fournisseurs]
+    finally:
+        await session.close()
+
+
+@en_cache(cache_fournisseurs)
+async def lire_fournisseur(fournisseur_id):
+    """Lire un fournisseur par son ID"""
+    session = get_session()
+    try:
+        f = await session.get(Fournisseur, fournisseur_id)
+        if f:
+            return (f.id, f.nom, f.email, f.telephone, f.adresse)
+        return None
+    finally:
+        await session.close()
+
+
+async def modifier_fournisseur(fournisseur_id, nom=None, email=None, telephone=None, adresse=None):
+    """Modifier un fournisseur existant"""
+    session = get_session()
+    try:
+        fournisseur = await session.get(Fournisseur, fournisseur_id)
+        if not fournisseur:
+            return False
+
+        if nom is not None:
+            fournisseur.nom = nom
+        if email is not None:
+            fournisseur.email = email
+        if telephone is not None:
+            fournisseur.telephone = telephone
+        if adresse is not None:
+            fournisseur.adresse = adresse
+
+        await session.commit()
+        apres_transaction(cache_fournisseurs.invalider)
+        return True
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la modification: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def supprimer_fournisseur(fournisseur_id):
+    """Supprimer un fournisseur"""
+    session = get_session()
+    try:
+        fournisseur = await session.get(Fournisseur, fournisseur_id)
+        if fournisseur:
+            await session.delete(fournisseur)
+            await session.commit()
+            apres_transaction(cache_fournisseurs.invalider)
+            return True
+        return False
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la suppression: {e}")
+        return False
+    finally:
+        await session.close()
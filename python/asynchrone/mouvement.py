@@ -0,0 +1,157 @@
+"""
+CRUD asynchrone pour la table mouvements_stock, voir mouvement.py (mêmes requêtes)
+La maintenance (purge des clés, partitions, archivage) reste dans l'API synchrone.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from asynchrone.connexion import get_session, transaction_active
+from models import CleIdempotence, Produit
+from mouvement import (_requete_mouvement, _LotMouvements, _requete_mouvements,
+                       _requete_historique, _requete_volumes_journaliers,
+                       _requete_volumes_par_produit)
+
+
+async def _mouvement_de_cle(session, cle):
+    """Mouvement déjà enregistré pour une clé d'idempotence (None si la clé est inconnue)"""
+    return await session.scalar(
+        select(CleIdempotence.mouvement_id).where(CleIdempotence.cle == cle)
+    )
+
+
+async def _appliquer_mouvement(produit_id, type_mouvement, quantite, motif, utilisateur_id=None,
+                               cle=None):
+    """Voir mouvement._appliquer_mouvement : une instruction, un aller-retour"""
+    if quantite <= 0:
+        print("La quantité doit être positive")
+        return None
+
+    session = get_session()
+    try:
+        if not transaction_active():
+            await session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+        mouvement_id = await session.scalar(
+            _requete_mouvement(produit_id, type_mouvement, quantite, motif, utilisateur_id, cle)
+        )
+
+        if mouvement_id is None:
+            # Chemin d'échec uniquement : distinguer produit absent et stock insuffisant
+            stock = await session.scalar(
+                select(Produit.quantite_stock).where(Produit.id == produit_id)
+            )
+            if stock is None:
+                print("Produit non trouvé")
+            else:
+                print(f"Stock insuffisant. Disponible: {stock}")
+        return mouvement_id
+    except IntegrityError as e:
+        # Même clé enregistrée entre-temps par une demande concurrente (unité : propagée)
+        if transaction_active():
+            raise
+        await session.rollback()
+        mouvement_id = await _mouvement_de_cle(session, cle) if cle is not None else None
+        if mouvement_id is None:
+            print(f"Erreur lors du mouvement de stock: {e}")
+        return mouvement_id
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors du mouvement de stock: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+async def entree_stock(produit_id, quantite, motif=None, utilisateur_id=None, cle=None):
+    """Enregistrer une entrée de stock (`cle` : clé d'idempotence optionnelle)"""
+    return await _appliquer_mouvement(produit_id, 'ENTREE', quantite, motif, utilisateur_id, cle)
+
+
+async def sortie_stock(produit_id, quantite, motif=None, utilisateur_id=None, cle=None):
+    """Enregistrer une sortie de stock (`cle` : clé d'idempotence optionnelle)"""
+    return await _appliquer_mouvement(produit_id, 'SORTIE', quantite, motif, utilisateur_id, cle)
+
+
+async def mouvements_en_lot(lignes, tout_ou_rien=True, utilisateur_id=None, lever=False):
+    """
+    Appliquer une liste de mouvements en une seule transaction (voir mouvement.mouvements_en_lot).
+    Retourne (ids des mouvements alignés sur les lignes, liste des erreurs).
+    """
+    lot = _LotMouvements(lignes, utilisateur_id)
+    session = get_session()
+    try:
+        produits = (await session.execute(lot.requete_verrou())).all()
+        requete_cles = lot.requete_cles()
+        connues = {}
+        if requete_cles is not None:
+            connues = dict((await session.execute(requete_cles)).all())
+        lot.controler(produits, connues)
+
+        if lot.erreurs and (tout_ou_rien or not lot.acceptees):
+            return lot.mouvement_ids, lot.erreurs  # rien n'a été écrit
+        if not lot.acceptees:
+            return lot.mouvement_ids, lot.erreurs  # uniquement des clés déjà enregistrées
+
+        for requete, parametres in lot.instructions():
+            await session.execute(requete, parametres)
+        await session.commit()
+        return lot.resultat()
+    except Exception as e:
+        await session.rollback()
+        if lever:
+            raise
+        print(f"Erreur lors du lot de mouvements: {e}")
+        return [None] * len(lignes), lot.erreurs + [(None, str(e))]
+    finally:
+        await session.close()
+
+
+async def _lignes(requete):
+    """Exécuter une requête de lecture et retourner ses lignes en tuples"""
+    session = get_session()
+    try:
+        return [tuple(ligne) for ligne in await session.execute(requete)]
+    finally:
+        await session.close()
+
+
+async def lire_mouvements(limite=50, avant=None, produit_id=None, type_mouvement=None,
+                          utilisateur_id=None, debut=None, fin=None):
+    """
+    Lire les derniers mouvements de stock, du plus récent au plus ancien.
+    Retourne une liste de (id, référence, produit, type, quantité, motif, date, utilisateur).
+    """
+    return await _lignes(_requete_mouvements(limite, avant, produit_id, type_mouvement,
+                                             utilisateur_id, debut, fin))
+
+
+async def historique_produit_page(produit_id, avant=None, limite=50, debut=None, fin=None,
+                                  type_mouvement=None):
+    """
+    Lire une page de l'historique d'un produit, du plus récent au plus ancien.
+    Retourne une liste de (id, type, quantité, motif, date).
+    """
+    return await _lignes(
+        _requete_historique(produit_id, avant, debut, fin, type_mouvement).limit(limite)
+    )
+
+
+async def historique_produit(produit_id):
+    """Obtenir l'historique complet des mouvements d'un produit"""
+    return await _lignes(_requete_historique(produit_id))
+
+
+async def volumes_journaliers(debut, fin, produit_id=None):
+    """
+    Volumes d'entrées et de sorties par jour sur [debut, fin), lus dans les cumuls journaliers.
+    Retourne une liste de (jour, entrées, sorties, nombre de mouvements) par jour croissant.
+    """
+    return await _lignes(_requete_volumes_journaliers(debut, fin, produit_id))
+
+
+async def volumes_par_produit(debut, fin, limite=20):
+    """
+    Produits ayant le plus de sorties sur [debut, fin), d'après les cumuls journaliers.
+    Retourne une liste de (id, référence, nom, entrées, sorties, nombre de mouvements).
+    """
+    return await _lignes(_requete_volumes_par_produit(debut, fin, limite))
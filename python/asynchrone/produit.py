@@ -0,0 +1,210 @@
+"""
+CRUD asynchrone pour la table produits, voir produit.py (mêmes requêtes)
+"""
+
+from asynchrone.connexion import get_session, transaction
+from asynchrone.mouvement import entree_stock
+from models import Produit
+from produit import (MOTIF_STOCK_INITIAL, _selection_produits, _requete_page, _requete_produit, _requete_recherche,
+                     _filtre_produits, _valeurs_prix, _requetes_en_masse, _requete_alertes,
+                     _requete_nombre_alertes, _requete_par_categorie)
+
+
+async def creer_produit(reference, nom, prix_unitaire, description=None,
+                        quantite_stock=0, seuil_alerte=10, categorie_id=None, fournisseur_id=None,
+                        utilisateur_id=None):
+    """Créer un nouveau produit et son entrée « Stock initial » (voir produit.py)"""
+    async with transaction() as uow:
+        produit_id = await _inserer_produit(reference, nom, prix_unitaire, description,
+                                            seuil_alerte, categorie_id, fournisseur_id)
+        if produit_id and quantite_stock and not await entree_stock(
+                produit_id, quantite_stock, MOTIF_STOCK_INITIAL, utilisateur_id):
+            await uow.annuler()
+    return None if uow.annulee else produit_id
+
+
+async def _inserer_produit(reference, nom, prix_unitaire, description, seuil_alerte,
+                           categorie_id, fournisseur_id):
+    """Insérer un produit sans stock (voir produit._inserer_produit)"""
+    session = get_session()
+    try:
+        produit = Produit(
+            reference=reference,
+            nom=nom,
+            description=description,
+            prix_unitaire=prix_unitaire,
+            seuil_alerte=seuil_alerte,
+            categorie_id=categorie_id,
+            fournisseur_id=fournisseur_id
+        )
+        session.add(produit)
+        await session.commit()
+        return produit.id
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la création: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+async def _lignes(requete):
+    """Exécuter une requête de lecture et retourner ses lignes en tuples"""
+    session = get_session()
+    try:
+        return [tuple(ligne) for ligne in await session.execute(requete)]
+    finally:
+        await session.close()
+
+
+async def lire_produits():
+    """Lire tous les produits avec catégorie et fournisseur"""
+    return await _lignes(_selection_produits().order_by(Produit.nom, Produit.id))
+
+
+async def lire_produits_page(apres=None, limite=50):
+    """
+    Lire une page de produits triés par (nom, id).
+    `apres` est le curseur (nom, id) du dernier produit de la page précédente.
+    """
+    return await _lignes(_requete_page(apres, limite))
+
+
+async def iterer_produits(taille_lot=1000):
+    """
+    Parcourir tous les produits triés par (nom, id) sans les charger en mémoire
+    (générateur asynchrone : `async for produit in iterer_produits()`).
+    Utilise un curseur côté serveur lu par lots de `taille_lot` lignes.
+    """
+    session = get_session()
+    try:
+        lignes = await session.stream(
+            _selection_produits()
+            .order_by(Produit.nom, Produit.id)
+            .execution_options(yield_per=taille_lot)
+        )
+        async for ligne in lignes:
+            yield tuple(ligne)
+    finally:
+        await session.close()
+
+
+async def lire_produit(produit_id):
+    """Lire un produit par son ID"""
+    session = get_session()
+    try:
+        ligne = (await session.execute(_requete_produit(produit_id))).first()
+        if ligne:
+            return tuple(ligne)
+        return None
+    finally:
+        await session.close()
+
+
+async def rechercher_produits(terme, limite=50):
+    """Rechercher des produits par nom, référence ou description (voir produit.py)"""
+    return await _lignes(_requete_recherche(terme, limite))
+
+
+async def modifier_produit(produit_id, **kwargs):
+    """Modifier un produit existant"""
+    session = get_session()
+    try:
+        produit = await session.get(Produit, produit_id)
+        if not produit:
+            return False
+
+        champs_autorises = ['reference', 'nom', 'description', 'prix_unitaire',
+                            'seuil_alerte', 'categorie_id', 'fournisseur_id']
+
+        for champ, valeur in kwargs.items():
+            if champ in champs_autorises and valeur is not None:
+                setattr(produit, champ, valeur)
+
+        await session.commit()
+        return True
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la modification: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def _modifier_en_masse(valeurs, conditions, simulation):
+    """Voir produit._modifier_en_masse"""
+    comptage, mise_a_jour = _requetes_en_masse(valeurs, conditions)
+    session = get_session()
+    try:
+        if simulation:
+            return await session.scalar(comptage)
+
+        resultat = await session.execute(mise_a_jour)
+        await session.commit()
+        return resultat.rowcount
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la modification en masse: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+async def modifier_prix_en_masse(pourcentage, categorie_id=None, fournisseur_id=None,
+                                 terme=None, simulation=False):
+    """Augmenter (ou baisser) de `pourcentage` % le prix des produits filtrés"""
+    if pourcentage <= -100:
+        print("La baisse ne peut pas atteindre 100%")
+        return None
+
+    conditions = _filtre_produits(categorie_id, fournisseur_id, terme)
+    return await _modifier_en_masse(_valeurs_prix(pourcentage), conditions, simulation)
+
+
+async def modifier_seuil_en_masse(seuil_alerte, categorie_id=None, fournisseur_id=None,
+                                  terme=None, simulation=False):
+    """Fixer le seuil d'alerte de tous les produits filtrés"""
+    if seuil_alerte < 0:
+        print("Le seuil d'alerte doit être positif")
+        return None
+
+    valeurs = {Produit.seuil_alerte: seuil_alerte}
+    conditions = _filtre_produits(categorie_id, fournisseur_id, terme)
+    return await _modifier_en_masse(valeurs, conditions, simulation)
+
+
+async def supprimer_produit(produit_id):
+    """Supprimer un produit"""
+    session = get_session()
+    try:
+        produit = await session.get(Produit, produit_id)
+        if produit:
+            await session.delete(produit)
+            await session.commit()
+            return True
+        return False
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la suppression: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def produits_en_alerte():
+    """Obtenir les produits dont le stock est sous le seuil d'alerte"""
+    return await _lignes(_requete_alertes())
+
+
+async def compter_produits_en_alerte():
+    """Compter les produits en alerte (servi par l'index partiel idx_produits_alerte)"""
+    session = get_session()
+    try:
+        return await session.scalar(_requete_nombre_alertes())
+    finally:
+        await session.close()
+
+
+async def produits_par_categorie(categorie_id):
+    """Obtenir les produits d'une catégorie"""
+    return await _lignes(_requete_par_categorie(categorie_id))
@@ -0,0 +1,192 @@
+"""
+CRUD asynchrone pour la table utilisateurs, voir utilisateur.py
+Gestion de l'authentification
+"""
+
+from sqlalchemy import func, select, text
+
+from asynchrone.connexion import get_session
+from models import Utilisateur
+from utilisateur import hasher_mot_de_passe
+
+
+async def creer_utilisateur(username, mot_de_passe, role='user'):
+    """Créer un nouvel utilisateur"""
+    session = get_session()
+    try:
+        # Vérifier si le username existe déjà
+        existant = await session.scalar(
+            select(Utilisateur.id).where(Utilisateur.username == username)
+        )
+        if existant:
+            print("Ce nom d'utilisateur existe déjà")
+            return None
+
+        utilisateur = Utilisateur(
+            username=username,
+            password_hash=hasher_mot_de_passe(mot_de_passe),
+            role=role
+        )
+        session.add(utilisateur)
+        await session.commit()
+        return utilisateur.id
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la création: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+async def inscrire_utilisateur(username, mot_de_passe):
+    """Inscrire un utilisateur, le premier devenant administrateur (voir utilisateur.py)"""
+    session = get_session()
+    try:
+        await session.execute(text("LOCK TABLE utilisateurs IN SHARE ROW EXCLUSIVE MODE"))
+        existant = await session.scalar(
+            select(Utilisateur.id).where(Utilisateur.username == username)
+        )
+        if existant:
+            print("Ce nom d'utilisateur existe déjà")
+            return None
+
+        role = 'user' if await session.scalar(select(Utilisateur.id).limit(1)) else 'admin'
+        utilisateur = Utilisateur(
+            username=username,
+            password_hash=hasher_mot_de_passe(mot_de_passe),
+            role=role
+        )
+        session.add(utilisateur)
+        await session.commit()
+        return (utilisateur.id, role)
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de l'inscription: {e}")
+        return None
+    finally:
+        await session.close()
+
+
+async def authentifier(username, mot_de_passe):
+    """Authentifier un utilisateur"""
+    session = get_session()
+    try:
+        utilisateur = (await session.scalars(select(Utilisateur).where(
+            Utilisateur.username == username,
+            Utilisateur.password_hash == hasher_mot_de_passe(mot_de_passe),
+            Utilisateur.actif == True
+        ))).first()
+
+        if utilisateur:
+            return (utilisateur.id, utilisateur.username, utilisateur.role)
+        return None
+    finally:
+        await session.close()
+
+
+async def lire_utilisateurs():
+    """Lire tous les utilisateurs"""
+    session = get_session()
+    try:
+        utilisateurs = await session.scalars(select(Utilisateur).order_by(Utilisateur.username))
+        return [(u.id, u.username, u.role, u.actif) for u in utilisateurs]
+    finally:
+        await session.close()
+
+
+async def lire_utilisateur(utilisateur_id):
+    """Lire un utilisateur par son ID"""
+    session = get_session()
+    try:
+        u = await session.get(Utilisateur, utilisateur_id)
+        if u:
+            return (u.id, u.username, u.role, u.actif)
+        return None
+    finally:
+        await session.close()
+
+
+async def _modifier(utilisateur_id, action, **valeurs):
+    """Appliquer des valeurs à un utilisateur existant ; False s'il n'existe pas"""
+    session = get_session()
+    try:
+        utilisateur = await session.get(Utilisateur, utilisateur_id)
+        if not utilisateur:
+            return False
+        for nom, valeur in valeurs.items():
+            setattr(utilisateur, nom, valeur)
+        await session.commit()
+        return True
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de {action}: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def modifier_mot_de_passe(utilisateur_id, nouveau_mot_de_passe):
+    """Modifier le mot de passe d'un utilisateur"""
+    return await _modifier(utilisateur_id, "la modification",
+                           password_hash=hasher_mot_de_passe(nouveau_mot_de_passe))
+
+
+async def admin_existe():
+    """Vérifie si au moins un utilisateur admin actif existe."""
+    session = get_session()
+    try:
+        count = await session.scalar(
+            select(func.count()).select_from(Utilisateur)
+            .where(Utilisateur.role == 'admin', Utilisateur.actif == True)
+        )
+        return count > 0
+    except Exception as e:
+        print(f"Erreur lors de la vérification de l'admin: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def modifier_role(utilisateur_id, nouveau_role):
+    """Modifier le rôle d'un utilisateur"""
+    if nouveau_role not in ('admin', 'user'):
+        print("Rôle invalide. Utilisez 'admin' ou 'user'.")
+        return False
+    return await _modifier(utilisateur_id, "la modification", role=nouveau_role)
+
+
+async def desactiver_utilisateur(utilisateur_id):
+    """Désactiver un utilisateur"""
+    return await _modifier(utilisateur_id, "la désactivation", actif=False)
+
+
+async def activer_utilisateur(utilisateur_id):
+    """Activer un utilisateur"""
+    return await _modifier(utilisateur_id, "l'activation", actif=True)
+
+
+async def supprimer_utilisateur(utilisateur_id):
+    """Supprimer un utilisateur"""
+    session = get_session()
+    try:
+        utilisateur = await session.get(Utilisateur, utilisateur_id)
+        if utilisateur:
+            await session.delete(utilisateur)
+            await session.commit()
+            return True
+        return False
+    except Exception as e:
+        await session.rollback()
+        print(f"Erreur lors de la suppression: {e}")
+        return False
+    finally:
+        await session.close()
+
+
+async def compter_utilisateurs():
+    """Compter le nombre d'utilisateurs"""
+    session = get_session()
+    try:
+        return await session.scalar(select(func.count()).select_from(Utilisateur))
+    finally:
+        await session.close()
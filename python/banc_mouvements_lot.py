@@ -0,0 +1,89 @@
+"""
+Banc d'essai des mouvements : appels unitaires contre mouvements_en_lot
+Les mêmes entrées sont appliquées une par une par entree_stock (une instruction par
+mouvement, validée à chaque appel), puis par lots avec mouvements_en_lot (une transaction
+par lot : verrouillage, UPDATE ensembliste, INSERT multi-lignes).
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python banc_mouvements_lot.py --mouvements 1000 --produits 10 --taille-lot 1000
+
+Les produits de banc sont créés puis supprimés (avec leurs mouvements) à la fin.
+"""
+
+import argparse
+import sys
+import time
+import uuid
+
+from sqlalchemy import select
+
+import mouvement
+from connexion import get_session, test_connexion
+from models import Produit
+from produit import creer_produit, supprimer_produit
+
+MOTIF = "Banc d'essai des lots"
+
+
+def _stock_total(produit_ids):
+    """Somme des stocks des produits de banc"""
+    session = get_session()
+    try:
+        return sum(session.execute(
+            select(Produit.quantite_stock).where(Produit.id.in_(produit_ids))
+        ).scalars())
+    finally:
+        session.close()
+
+
+def _afficher(nom, nombre, duree, reussis):
+    print(f"  {nom:<34} {duree * 1000:9.1f} ms  {nombre / duree:9.0f} mouvements/s  "
+          f"({reussis}/{nombre} réussis)")
+    return nombre / duree
+
+
+def executer(nombre=1000, nb_produits=10, taille_lot=1000):
+    """Lancer le banc d'essai ; True si tous les mouvements ont été appliqués"""
+    test_connexion()  # initialisation du moteur hors mesure
+    produit_ids = [creer_produit(f"LOT-{uuid.uuid4().hex[:8].upper()}", MOTIF, 1)
+                   for _ in range(nb_produits)]
+    if None in produit_ids:
+        return False
+
+    lignes = [(produit_ids[n % nb_produits], 'ENTREE', 1 + n % 5, MOTIF) for n in range(nombre)]
+    print(f"{nombre} entrées sur {nb_produits} produit(s), lots de {taille_lot}")
+    try:
+        debut = time.perf_counter()
+        reussis = sum(1 for produit_id, _, quantite, motif in lignes
+                      if mouvement.entree_stock(produit_id, quantite, motif) is not None)
+        unitaire = _afficher("entree_stock (appels unitaires)", nombre,
+                             time.perf_counter() - debut, reussis)
+
+        debut = time.perf_counter()
+        reussis = 0
+        for indice in range(0, nombre, taille_lot):
+            ids, _ = mouvement.mouvements_en_lot(lignes[indice:indice + taille_lot])
+            reussis += sum(1 for i in ids if i is not None)
+        en_lot = _afficher("mouvements_en_lot", nombre, time.perf_counter() - debut, reussis)
+        print(f"  Débit des lots : {en_lot / unitaire:.1f} fois celui des appels unitaires")
+
+        attendu = 2 * sum(ligne[2] for ligne in lignes)
+        stock = _stock_total(produit_ids)
+        print(f"{'✓' if stock == attendu else '✗'} Stock des produits de banc {stock}, attendu {attendu}")
+        return stock == attendu
+    finally:
+        for produit_id in produit_ids:
+            supprimer_produit(produit_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Appels unitaires contre mouvements_en_lot")
+    parser.add_argument('--mouvements', type=int, default=1000,
+                        help="entrées appliquées par chaque chemin (défaut: 1000)")
+    parser.add_argument('--produits', type=int, default=10,
+                        help="produits de banc entre lesquels les entrées sont réparties (défaut: 10)")
+    parser.add_argument('--taille-lot', type=int, default=1000,
+                        help="lignes par appel de mouvements_en_lot (défaut: 1000)")
+    args = parser.parse_args()
+    if not executer(args.mouvements, args.produits, args.taille_lot):
+        sys.exit(1)
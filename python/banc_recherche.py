@@ -0,0 +1,128 @@
+"""
+Banc d'essai de la recherche de produits : ancienne requête contre rechercher_produits
+L'ancienne recherche (ILIKE '%terme%' sur le nom et la référence, triée par nom, sans limite)
+ne pouvait être servie par aucun index : elle est rejouée en parcours séquentiel, index
+désactivés. La nouvelle est celle de rechercher_produits (index GIN trigrammes et plein texte,
+tri par pertinence, limite).
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python banc_recherche.py --produits 500000 --repetitions 5
+    python banc_recherche.py --termes vis "écrou inox" BANC-00012
+
+Les produits de banc (références BANC-...) sont ajoutés s'il en manque, puis supprimés à la
+fin sauf avec --conserver (utile pour relancer le banc sans les recréer).
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select, func, or_, text
+
+from connexion import engine
+from models import Produit
+from produit import _selection_produits, _requete_recherche
+
+PREFIXE = 'BANC-'
+TERMES = ['vis', 'écrou inox', 'charnière laiton', f'{PREFIXE}00012', 'introuvable']
+
+# Noms composés de mots courants : chaque terme retrouve une fraction réaliste des produits
+SQL_PEUPLER = text(f"""
+    INSERT INTO produits (reference, nom, description, prix_unitaire)
+    SELECT '{PREFIXE}' || lpad(n::TEXT, 7, '0'),
+           (ARRAY['Vis', 'Écrou', 'Boulon', 'Rondelle', 'Charnière', 'Cheville', 'Clou',
+                  'Équerre', 'Serrure', 'Poignée'])[1 + n % 10]
+           || ' ' || (ARRAY['inox', 'laiton', 'acier', 'zingué', 'nylon', 'bronze'])[1 + n / 10 % 6]
+           || ' ' || (n % 997)::TEXT || ' mm',
+           'Article de quincaillerie ' || (ARRAY['intérieur', 'extérieur', 'marine',
+                                                 'industriel'])[1 + n / 60 % 4],
+           1 + n % 500
+    FROM generate_series(:debut, :fin) AS n
+""")
+
+
+def ancienne_requete(terme):
+    """Recherche d'origine : ILIKE sur le nom et la référence, triée par nom, sans limite"""
+    motif = f"%{terme}%"
+    return _selection_produits().where(
+        or_(Produit.nom.ilike(motif), Produit.reference.ilike(motif))
+    ).order_by(Produit.nom)
+
+
+def preparer(nombre):
+    """Ajouter les produits de banc manquants ; retourne le nombre ajouté"""
+    with engine.begin() as connexion:
+        existants = connexion.execute(
+            select(func.count()).where(Produit.reference.startswith(PREFIXE))
+        ).scalar()
+        if existants < nombre:
+            connexion.execute(SQL_PEUPLER, {'debut': existants + 1, 'fin': nombre})
+    if existants < nombre:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connexion:
+            connexion.execute(text("ANALYZE produits"))
+    return max(nombre - existants, 0)
+
+
+def nettoyer():
+    """Supprimer les produits de banc"""
+    with engine.begin() as connexion:
+        return connexion.execute(
+            Produit.__table__.delete().where(Produit.reference.startswith(PREFIXE))
+        ).rowcount
+
+
+def mesurer(requete, repetitions, sans_index=False):
+    """(durée médiane en ms, lignes) de `repetitions` exécutions, après une exécution à blanc"""
+    durees = []
+    with engine.connect() as connexion:
+        if sans_index:
+            connexion.execute(text("SET enable_indexscan = off"))
+            connexion.execute(text("SET enable_bitmapscan = off"))
+        for numero in range(repetitions + 1):
+            debut = time.perf_counter()
+            lignes = len(connexion.execute(requete).all())
+            if numero:
+                durees.append((time.perf_counter() - debut) * 1000)
+        connexion.rollback()
+    return statistics.median(durees), lignes
+
+
+def executer(nombre=500000, termes=TERMES, repetitions=5, conserver=False):
+    """Lancer le banc d'essai et afficher les durées de chaque recherche"""
+    debut = time.perf_counter()
+    ajoutes = preparer(nombre)
+    if ajoutes:
+        print(f"{ajoutes} produit(s) de banc ajouté(s) en {time.perf_counter() - debut:.1f} s")
+
+    with engine.connect() as connexion:
+        total = connexion.execute(select(func.count()).select_from(Produit)).scalar()
+        trigrammes = connexion.execute(
+            text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).scalar()
+    print(f"{total} produits, médiane de {repetitions} exécutions")
+    if not trigrammes:
+        print("⚠️  Extension pg_trgm absente : la nouvelle recherche n'a pas ses index de trigrammes")
+
+    print(f"  {'terme':<20} {'ancienne':>12} {'nouvelle':>12} {'gain':>8}")
+    try:
+        for terme in termes:
+            ancienne, lignes_anciennes = mesurer(ancienne_requete(terme), repetitions, sans_index=True)
+            nouvelle, lignes_nouvelles = mesurer(_requete_recherche(terme), repetitions)
+            print(f"  {terme:<20} {ancienne:9.1f} ms {nouvelle:9.1f} ms {ancienne / nouvelle:7.1f}x"
+                  f"  ({lignes_anciennes} contre {lignes_nouvelles} ligne(s))")
+    finally:
+        if not conserver:
+            print(f"{nettoyer()} produit(s) de banc supprimé(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ancienne recherche de produits contre la nouvelle")
+    parser.add_argument('--produits', type=int, default=500000,
+                        help="produits de banc dans la table (défaut: 500000)")
+    parser.add_argument('--termes', nargs='+', default=TERMES, help="termes recherchés")
+    parser.add_argument('--repetitions', type=int, default=5,
+                        help="exécutions mesurées par terme (défaut: 5)")
+    parser.add_argument('--conserver', action='store_true',
+                        help="conserver les produits de banc à la fin")
+    args = parser.parse_args()
+    executer(args.produits, args.termes, args.repetitions, args.conserver)
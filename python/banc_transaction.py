@@ -0,0 +1,100 @@
+"""
+Banc d'essai de l'unité de travail : « créer un produit + entrée du stock initial »
+Le même parcours est joué sans unité de travail (chaque fonction emprunte sa connexion et
+valide seule) puis avec creer_produit(quantite_stock=...), qui crée le produit et son entrée
+dans une seule unité de travail. Les emprunts de connexion au pool et les COMMIT émis sont
+comptés par des écouteurs sur le moteur ; hors unité de travail, l'entrée est validée en
+autocommit par le serveur, sans COMMIT émis (deux validations serveur par parcours).
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python banc_transaction.py --parcours 500
+
+Les produits de banc sont supprimés (avec leurs mouvements) à la fin.
+"""
+
+import argparse
+import contextlib
+import time
+import uuid
+
+from sqlalchemy import event
+
+import connexion
+from mouvement import entree_stock
+from produit import MOTIF_STOCK_INITIAL, _inserer_produit, creer_produit, supprimer_produit
+
+QUANTITE_INITIALE = 10
+
+
+@contextlib.contextmanager
+def compter(moteur):
+    """Compter les emprunts de connexion et les COMMIT émis sur `moteur` pendant le bloc"""
+    compteurs = {'emprunts': 0, 'validations': 0}
+
+    def emprunt(*args):
+        compteurs['emprunts'] += 1
+
+    def validation(*args):
+        compteurs['validations'] += 1
+
+    event.listen(moteur.pool, 'checkout', emprunt)
+    event.listen(moteur, 'commit', validation)
+    try:
+        yield compteurs
+    finally:
+        event.remove(moteur.pool, 'checkout', emprunt)
+        event.remove(moteur, 'commit', validation)
+
+
+def sans_unite(reference):
+    """Parcours d'origine : création puis entrée, chacune dans sa propre transaction"""
+    produit_id = _inserer_produit(reference, "Banc d'essai", 1, None, 10, None, None)
+    if produit_id is not None:
+        entree_stock(produit_id, QUANTITE_INITIALE, MOTIF_STOCK_INITIAL)
+    return produit_id
+
+
+def avec_unite(reference):
+    """Parcours actuel : création et entrée dans une unité de travail"""
+    return creer_produit(reference, "Banc d'essai", 1, quantite_stock=QUANTITE_INITIALE)
+
+
+def mesurer(nom, parcours, nombre, moteur, produit_ids):
+    """Jouer `nombre` parcours et afficher durée, emprunts et validations par parcours"""
+    with compter(moteur) as compteurs:
+        debut = time.perf_counter()
+        for _ in range(nombre):
+            produit_ids.append(parcours(f"TRX-{uuid.uuid4().hex[:12].upper()}"))
+        duree = time.perf_counter() - debut
+    print(f"  {nom:<24} {duree / nombre * 1000:6.2f} ms par parcours, "
+          f"{compteurs['emprunts'] / nombre:.1f} emprunt(s) de connexion, "
+          f"{compteurs['validations'] / nombre:.1f} COMMIT émis")
+    return duree
+
+
+def executer(nombre=500):
+    """Lancer le banc d'essai et afficher le coût de chaque parcours"""
+    connexion.test_connexion()  # initialisation du moteur hors mesure
+    moteur = connexion.engine
+    produit_ids = []
+    print(f"{nombre} parcours « créer un produit + entrée du stock initial »")
+    try:
+        # Parcours à blanc : chauffer le pool et les caches de requêtes
+        for parcours in (sans_unite, avec_unite):
+            produit_ids.append(parcours(f"TRX-{uuid.uuid4().hex[:12].upper()}"))
+        duree_sans = mesurer("sans unité de travail", sans_unite, nombre, moteur, produit_ids)
+        duree_avec = mesurer("avec unité de travail", avec_unite, nombre, moteur, produit_ids)
+        print(f"  Gain : {(duree_sans - duree_avec) / nombre * 1000:.2f} ms par parcours "
+              f"({(1 - duree_avec / duree_sans) * 100:.0f} %)")
+    finally:
+        for produit_id in produit_ids:
+            if produit_id is not None:
+                supprimer_produit(produit_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coût du parcours création + stock initial")
+    parser.add_argument('--parcours', type=int, default=500,
+                        help="parcours joués par variante (défaut: 500)")
+    args = parser.parse_args()
+    executer(args.parcours)
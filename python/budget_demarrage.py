@@ -0,0 +1,69 @@
+"""
+Contrôle du budget de démarrage de main.py, mesuré avec `python -X importtime`
+Échoue si `import main` dépasse le budget ou charge un module lourd (SQLAlchemy, NumPy, ...),
+ces modules devant être importés dans les fonctions qui les utilisent.
+
+Utilisation :
+    python python/budget_demarrage.py --budget-ms 75 --essais 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules qui ne doivent pas être chargés avant l'écran de connexion
+MODULES_INTERDITS = ('sqlalchemy', 'numpy', 'tabulate', 'psycopg2', 'models')
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+
+
+def mesurer_import(module='main'):
+    """
+    Importer `module` dans un nouvel interpréteur avec -X importtime.
+    Retourne (durée cumulée en µs, liste de (module, durée propre en µs)).
+    """
+    resultat = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=DOSSIER, capture_output=True, text=True, check=True
+    )
+    modules = []
+    total = None
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith('import time:') or 'self [us]' in ligne:
+            continue
+        propre, cumule, nom = ligne[len('import time:'):].split('|')
+        modules.append((nom.strip(), int(propre)))
+        if nom.strip() == module:
+            total = int(cumule)
+    return total, modules
+
+
+def controler(budget_ms=75, essais=5, module='main'):
+    """Mesurer `essais` fois, afficher le détail de la mesure médiane ; True si le budget est tenu"""
+    mesures = sorted((mesurer_import(module) for _ in range(essais)), key=lambda m: m[0])
+    _, modules = mesures[len(mesures) // 2]
+    mediane = statistics.median(m[0] for m in mesures) / 1000
+
+    print(f"import {module} : {mediane:.1f} ms (médiane de {essais}), budget {budget_ms} ms")
+    print("Modules les plus coûteux (durée propre) :")
+    for nom, propre in sorted(modules, key=lambda m: -m[1])[:10]:
+        print(f"  {propre / 1000:7.1f} ms  {nom}")
+
+    interdits = sorted({nom.split('.')[0] for nom, _ in modules} & set(MODULES_INTERDITS))
+    if interdits:
+        print(f"✗ Modules chargés au démarrage : {', '.join(interdits)}")
+    if mediane > budget_ms:
+        print(f"✗ Budget dépassé de {mediane - budget_ms:.1f} ms")
+    return not interdits and mediane <= budget_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Budget d'import de main.py")
+    parser.add_argument('--budget-ms', type=float, default=75, help="budget en ms (défaut: 75)")
+    parser.add_argument('--essais', type=int, default=5, help="nombre de mesures (défaut: 5)")
+    args = parser.parse_args()
+    if not controler(args.budget_ms, args.essais):
+        sys.exit(1)
+    print("✓ Budget de démarrage respecté")
@@ -0,0 +1,167 @@
+"""
+Cache en mémoire des données de référence (catégories, fournisseurs)
+Invalidation locale à l'écriture et entre processus via LISTEN/NOTIFY
+"""
+
+import inspect
+import select
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from connexion import transaction_active
+
+# Canal PostgreSQL utilisé par les triggers de notification (voir init.sql)
+CANAL_NOTIFICATION = 'referentiel'
+
+
+class CacheTTL:
+    """
+    Cache LRU borné en taille, dont les entrées expirent après `duree_vie` secondes.
+    La génération, incrémentée à chaque invalidation, permet d'écarter une valeur lue
+    avant une invalidation survenue pendant la requête.
+    """
+
+    def __init__(self, nom, duree_vie=300, taille_max=128):
+        self.nom = nom
+        self.duree_vie = duree_vie
+        self.taille_max = taille_max
+        self.succes = 0
+        self.echecs = 0
+        self.generation = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        """Retourne (True, valeur) si la clé est présente et valide, (False, None) sinon"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[0] > time.monotonic():
+                self._entrees.move_to_end(cle)
+                self.succes += 1
+                return True, entree[1]
+            if entree is not None:
+                del self._entrees[cle]
+            self.echecs += 1
+            return False, None
+
+    def ecrire(self, cle, valeur, generation=None):
+        """
+        Enregistre une valeur et évince la moins récemment utilisée si besoin.
+        Sans effet si le cache a été invalidé depuis `generation` (lue avant la requête).
+        """
+        with self._verrou:
+            if generation is not None and generation != self.generation:
+                return
+            self._entrees[cle] = (time.monotonic() + self.duree_vie, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider(self):
+        """Vider le cache"""
+        with self._verrou:
+            self.generation += 1
+            self._entrees.clear()
+
+    def statistiques(self):
+        """Retourne (nom, succès, échecs, nombre d'entrées)"""
+        with self._verrou:
+            return (self.nom, self.succes, self.echecs, len(self._entrees))
+
+
+# Un cache par table de référence, indexé par nom de table
+cache_categories = CacheTTL('categories')
+cache_fournisseurs = CacheTTL('fournisseurs')
+_caches = {c.nom: c for c in (cache_categories, cache_fournisseurs)}
+
+
+def en_cache(cache):
+    """
+    Décorateur mettant en cache le résultat d'une fonction de lecture, synchrone ou
+    coroutine (les deux versions d'une même lecture partagent leurs entrées).
+    Dans une unité de travail, le cache n'est ni lu ni alimenté : la lecture peut voir des
+    lignes non validées (les écritures l'invalident via apres_transaction).
+    """
+    def decorateur(fonction):
+        if inspect.iscoroutinefunction(fonction):
+            from asynchrone.connexion import transaction_active as unite_asynchrone_active
+
+            @wraps(fonction)
+            async def enveloppe_asynchrone(*args, **kwargs):
+                if unite_asynchrone_active():
+                    return await fonction(*args, **kwargs)
+                cle = (fonction.__name__, args, tuple(sorted(kwargs.items())))
+                generation = cache.generation
+                trouve, valeur = cache.lire(cle)
+                if not trouve:
+                    valeur = await fonction(*args, **kwargs)
+                    cache.ecrire(cle, valeur, generation)
+                return list(valeur) if isinstance(valeur, list) else valeur
+            return enveloppe_asynchrone
+
+        @wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if transaction_active():
+                return fonction(*args, **kwargs)
+            cle = (fonction.__name__, args, tuple(sorted(kwargs.items())))
+            # Génération lue avant la requête : une invalidation pendant celle-ci
+            # empêche d'enregistrer une valeur périmée
+            generation = cache.generation
+            trouve, valeur = cache.lire(cle)
+            if not trouve:
+                valeur = fonction(*args, **kwargs)
+                cache.ecrire(cle, valeur, generation)
+            # Copie des listes pour que l'appelant ne modifie pas le cache
+            return list(valeur) if isinstance(valeur, list) else valeur
+        return enveloppe
+    return decorateur
+
+
+def statistiques_cache():
+    """Statistiques de tous les caches : liste de (nom, succès, échecs, entrées)"""
+    return [c.statistiques() for c in _caches.values()]
+
+
+def invalider_tout():
+    """Vider tous les caches"""
+    for c in _caches.values():
+        c.invalider()
+
+
+def _ecouter_notifications():
+    """Boucle d'écoute du canal de notification, reconnecte en cas d'erreur"""
+    # Import différé : le moteur n'est créé qu'au démarrage de l'écoute
+    from connexion import engine
+    while True:
+        connexion = None
+        try:
+            connexion = engine.raw_connection()
+            connexion.detach()
+            dbapi = connexion.dbapi_connection
+            dbapi.autocommit = True
+            dbapi.cursor().execute(f"LISTEN {CANAL_NOTIFICATION}")
+            # Des notifications ont pu être manquées pendant la déconnexion
+            invalider_tout()
+            while True:
+                if select.select([dbapi], [], [], 5) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    notification = dbapi.notifies.pop(0)
+                    cache = _caches.get(notification.payload)
+                    if cache:
+                        cache.invalider()
+        except Exception as e:
+            print(f"Erreur d'écoute des notifications: {e}")
+            if connexion is not None:
+                connexion.close()
+            time.sleep(5)
+
+
+def demarrer_ecoute():
+    """Démarrer l'écoute des invalidations émises par les autres processus"""
+    thread = threading.Thread(target=_ecouter_notifications, name='ecoute-referentiel', daemon=True)
+    thread.start()
+    return thread
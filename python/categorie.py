@@ -2,7 +2,8 @@
 CRUD pour la table categories avec SQLAlchemy
 """
 
-from connexion import get_session
+from connexion import get_session, apres_transaction
+from cache import cache_categories, en_cache
 from models import Categorie
 
 
@@ -13,6 +14,7 @@ def creer_categorie(nom, description=None):
         categorie = Categorie(nom=nom, description=description)
         session.add(categorie)
         session.commit()
+        apres_transaction(cache_categories.invalider)
         return categorie.id
     except Exception as e:
         session.rollback()
@@ -22,6 +24,7 @@ def creer_categorie(nom, description=None):
         session.close()
 
 
+@en_cache(cache_categories)
 def lire_categories():
     """Lire toutes les catégories"""
     session = get_session()
@@ -32,6 +35,7 @@ def lire_categories():
         session.close()
 
 
+@en_cache(cache_categories)
 def lire_categorie(categorie_id):
     """Lire une catégorie par son ID"""
     session = get_session()
@@ -58,6 +62,7 @@ def modifier_categorie(categorie_id, nom=None, description=None):
             categorie.description = description
         
         session.commit()
+        apres_transaction(cache_categories.invalider)
         return True
     except Exception as e:
         session.rollback()
@@ -75,6 +80,7 @@ def supprimer_categorie(categorie_id):
         if categorie:
             session.delete(categorie)
             session.commit()
+            apres_transaction(cache_categories.invalider)
             return True
         return False
     except Exception as e:
@@ -1,16 +1,19 @@
 """
 Module de connexion à la base de données PostgreSQL
-Utilise SQLAlchemy avec sessionmaker
+Utilise SQLAlchemy avec sessionmaker ; le moteur, la factory de sessions et la base ORM
+sont créés au premier usage (voir __getattr__), importer ce module ne charge pas SQLAlchemy
 """
 
 import os
-from pathlib import Path
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 # Charger le .env depuis le dossier parent
-env_path = Path(__file__).parent.parent / '.env'
-if env_path.exists():
+env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+if os.path.exists(env_path):
     with open(env_path) as f:
         for line in f:
             line = line.strip()
@@ -27,22 +30,315 @@ DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'password')
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Créer le moteur SQLAlchemy
-engine = create_engine(DATABASE_URL, echo=False)
+# Pool de connexions (depuis .env) : connexions conservées, supplémentaires temporaires,
+# attente maximale d'une connexion libre (s), test avant emprunt, recyclage (s, -1 : jamais)
+# et durée maximale d'une instruction (ms, 0 : illimitée)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'oui', 'yes')
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', '0'))
 
-# Créer la factory de sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Réplique en lecture (depuis .env, optionnelle) : URL complète, durée (s) pendant laquelle
+# les lectures restent sur le primaire après une écriture du processus, et délai (s) avant
+# de retenter une réplique injoignable
+DB_REPLICA_URL = os.getenv('DB_REPLICA_URL', '')
+DB_REPLICA_FENETRE = float(os.getenv('DB_REPLICA_FENETRE', '5'))
+DB_REPLICA_REESSAI = float(os.getenv('DB_REPLICA_REESSAI', '30'))
 
-# Base pour les modèles ORM
-Base = declarative_base()
+# Bornes (ms) de l'histogramme des délais d'obtention d'une connexion
+BORNES_ATTENTE_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
 
 
-def get_session():
+class _MesuresPool:
+    """Compteurs du pool alimentés par les événements SQLAlchemy et par PoolMesure"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.connexions_creees = 0
+        self.emprunts = 0
+        self.restitutions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.pic_empruntees = 0
+        self.attente_totale = 0.0
+        self.attente_max = 0.0
+        self.histogramme = [0] * (len(BORNES_ATTENTE_MS) + 1)
+
+    def attente(self, duree, expiree=False):
+        """Enregistrer le délai d'obtention d'une connexion (s)"""
+        with self.verrou:
+            self.attente_totale += duree
+            self.attente_max = max(self.attente_max, duree)
+            self.histogramme[bisect_left(BORNES_ATTENTE_MS, duree * 1000)] += 1
+            if expiree:
+                self.expirations += 1
+
+
+_mesures = _MesuresPool()
+
+
+class _Routage:
+    """État du routage des lectures : dernière écriture, indisponibilité de la réplique, compteurs"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.derniere_ecriture = float('-inf')
+        self.indisponible_jusqua = 0.0
+        self.lectures_replique = 0
+        self.lectures_primaire = 0
+        self.replis = 0
+
+    def ecriture(self):
+        """Ouvrir (ou prolonger) la fenêtre de lecture de ses propres écritures"""
+        with self.verrou:
+            self.derniere_ecriture = time.monotonic()
+
+    def replique_utilisable(self):
+        maintenant = time.monotonic()
+        with self.verrou:
+            return (maintenant >= self.indisponible_jusqua
+                    and maintenant - self.derniere_ecriture >= DB_REPLICA_FENETRE)
+
+    def lecture(self, replique):
+        with self.verrou:
+            if replique:
+                self.lectures_replique += 1
+            else:
+                self.lectures_primaire += 1
+
+    def echec_replique(self):
+        with self.verrou:
+            self.replis += 1
+            self.indisponible_jusqua = time.monotonic() + DB_REPLICA_REESSAI
+
+
+_routage = _Routage()
+
+
+def signaler_ecriture():
+    """
+    Signaler une écriture faite hors des événements SQLAlchemy (engine.raw_connection())
+    ou par une fonction SQL appelée dans un SELECT : les lectures suivantes du processus restent sur le primaire pendant DB_REPLICA_FENETRE.
+    """
+    _routage.ecriture()
+
+
+# Attributs créés au premier accès par __getattr__
+_verrou_creation = threading.RLock()
+
+
+def _creer_moteurs():
+    """Créer les moteurs et la factory de sessions (une seule fois, voir moteur.py)"""
+    with _verrou_creation:
+        if 'SessionLocal' not in globals():
+            import moteur
+            globals().update(engine=moteur.engine, replica_engine=moteur.replica_engine,
+                             SessionLocal=moteur.SessionLocal)
+
+
+def _creer_base():
+    """Créer la base des modèles ORM (une seule fois)"""
+    with _verrou_creation:
+        if 'Base' not in globals():
+            from sqlalchemy.orm import declarative_base
+            globals()['Base'] = declarative_base()
+
+
+def __getattr__(nom):
+    """
+    Créer au premier accès le moteur (`engine`, `replica_engine`), la factory de sessions
+    (`SessionLocal`) et la base ORM (`Base`), y compris par `from connexion import engine`
+    """
+    if nom in ('engine', 'replica_engine', 'SessionLocal'):
+        _creer_moteurs()
+    elif nom == 'Base':
+        _creer_base()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+    return globals()[nom]
+
+
+def _moteurs():
+    """(engine, replica_engine, SessionLocal), créés au premier appel"""
+    if 'SessionLocal' not in globals():
+        _creer_moteurs()
+    return engine, replica_engine, SessionLocal
+
+
+# Unité de travail active dans le contexte courant (thread ou tâche), voir transaction()
+_unite_courante = ContextVar('unite_de_travail', default=None)
+
+
+class UniteDeTravail:
+    """Session et transaction partagées par les fonctions CRUD appelées dans transaction()"""
+
+    def __init__(self):
+        self.session = _moteurs()[2]()
+        self.annulee = False
+        self.rappels = []
+
+    def annuler(self):
+        """Annuler l'unité : rien ne sera validé, y compris les opérations suivantes"""
+        self.annulee = True
+        self.session.rollback()
+
+
+class _SessionPartagee:
+    """
+    Session d'une unité de travail telle que la voient les fonctions CRUD :
+    commit se limite à un flush, rollback annule toute l'unité et close est sans effet.
+    """
+
+    def __init__(self, unite):
+        self._unite = unite
+
+    def __getattr__(self, nom):
+        return getattr(self._unite.session, nom)
+
+    def commit(self):
+        self._unite.session.flush()
+
+    def rollback(self):
+        self._unite.annuler()
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def transaction():
+    """
+    Unité de travail : dans le bloc, les fonctions CRUD partagent une session, donc une
+    connexion et une transaction, validée une seule fois à la sortie du bloc.
+    Tout ou rien : une erreur de base de données dans une opération, uow.annuler() ou une
+    exception levée dans le bloc annulent l'unité entière ; un refus signalé par la valeur
+    de retour (produit absent, stock insuffisant) est laissé à l'appelant.
+    Un bloc imbriqué rejoint l'unité englobante.
+
+        with transaction() as uow:
+            produit_id = creer_produit(...)
+            entree_stock(produit_id, 10)
+        if uow.annulee: ...
+    """
+    unite = _unite_courante.get()
+    if unite is not None:
+        yield unite
+        return
+
+    unite = UniteDeTravail()
+    jeton = _unite_courante.set(unite)
+    try:
+        yield unite
+        if unite.annulee:
+            unite.session.rollback()
+        else:
+            unite.session.commit()
+    except BaseException:
+        unite.annulee = True
+        unite.session.rollback()
+        raise
+    finally:
+        _unite_courante.reset(jeton)
+        unite.session.close()
+        for rappel in unite.rappels:
+            rappel()
+
+
+def apres_transaction(rappel):
+    """
+    Exécuter `rappel` (sans argument) après la validation ou l'annulation de l'unité de
+    travail active, ou immédiatement hors unité : invalidation de cache par exemple.
+    """
+    unite = _unite_courante.get()
+    if unite is None:
+        rappel()
+    elif rappel not in unite.rappels:
+        unite.rappels.append(rappel)
+
+
+def transaction_active():
+    """Indique si une unité de travail est active dans le contexte courant"""
+    return _unite_courante.get() is not None
+
+
+def get_session(lecture=False):
     """
     Crée et retourne une nouvelle session.
     À utiliser avec un context manager ou à fermer manuellement.
+    Dans un bloc transaction(), retourne la session partagée de l'unité de travail.
+    Avec `lecture`, la session est ouverte sur la réplique si elle est configurée et
+    joignable, et si le processus n'a pas écrit depuis DB_REPLICA_FENETRE secondes ;
+    sinon sur le primaire. Une telle session ne doit servir qu'à des lectures.
+    """
+    unite = _unite_courante.get()
+    if unite is not None:
+        return _SessionPartagee(unite)
+    _, replique, fabrique = _moteurs()
+    if lecture and replique is not None and _routage.replique_utilisable():
+        from sqlalchemy import exc
+        session = fabrique(bind=replique)
+        try:
+            session.connection()
+            _routage.lecture(replique=True)
+            return session
+        except exc.DBAPIError as e:
+            session.close()
+            _routage.echec_replique()
+            print(f"Réplique injoignable, lecture sur le primaire: {e.orig}")
+    if lecture:
+        _routage.lecture(replique=False)
+    return fabrique()
+
+
+def statistiques_pool():
+    """
+    Métriques du pool : état courant (taille, connexions empruntées, débordement),
+    compteurs depuis le démarrage et délais d'obtention d'une connexion (ms).
+    `histogramme_attente` associe à chaque borne ('<= 5 ms', ...) le nombre d'emprunts.
+    """
+    pool = _moteurs()[0].pool
+    with _mesures.verrou:
+        mesures = sum(_mesures.histogramme)
+        libelles = [f"<= {borne} ms" for borne in BORNES_ATTENTE_MS]
+        libelles.append(f"> {BORNES_ATTENTE_MS[-1]} ms")
+        return {
+            'taille': pool.size(),
+            'debordement_max': DB_MAX_OVERFLOW,
+            'empruntees': pool.checkedout(),
+            'disponibles': pool.checkedin(),
+            'debordement': max(pool.overflow(), 0),
+            'pic_empruntees': _mesures.pic_empruntees,
+            'connexions_creees': _mesures.connexions_creees,
+            'emprunts': _mesures.emprunts,
+            'restitutions': _mesures.restitutions,
+            'invalidations': _mesures.invalidations,
+            'expirations': _mesures.expirations,
+            'attente_moyenne_ms': round(1000 * _mesures.attente_totale / mesures, 2) if mesures else 0,
+            'attente_max_ms': round(1000 * _mesures.attente_max, 2),
+            'histogramme_attente': dict(zip(libelles, _mesures.histogramme)),
+        }
+
+
+def statistiques_replique():
+    """
+    État du routage des lectures : None sans réplique configurée, sinon un dictionnaire
+    (disponibilité, lectures servies par la réplique et par le primaire, replis sur échec).
     """
-    return SessionLocal()
+    replique = _moteurs()[1]
+    if replique is None:
+        return None
+    maintenant = time.monotonic()
+    with _routage.verrou:
+        return {
+            'replique': replique.url.render_as_string(hide_password=True),
+            'disponible': maintenant >= _routage.indisponible_jusqua,
+            'fenetre_ecriture': maintenant - _routage.derniere_ecriture < DB_REPLICA_FENETRE,
+            'lectures_replique': _routage.lectures_replique,
+            'lectures_primaire': _routage.lectures_primaire,
+            'replis': _routage.replis,
+        }
 
 
 def test_connexion():
@@ -51,6 +347,7 @@ def test_connexion():
     Retourne True si OK, False sinon.
     """
     try:
+        from sqlalchemy import text
         session = get_session()
         session.execute(text("SELECT 1"))
         session.close()
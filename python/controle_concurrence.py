@@ -0,0 +1,205 @@
+"""
+Contrôle de concurrence des mouvements de stock
+Plusieurs sessions retirent simultanément les dernières unités d'un même produit :
+à chaque manche, une seule sortie doit réussir et le stock ne doit jamais devenir négatif.
+Chaque chemin d'écriture est contrôlé : sortie_stock, mouvements_en_lot et sortie_stock
+de l'API asynchrone.
+Un scénario de charge fait ensuite enchaîner entrées et sorties mêlées sur le même produit
+par de nombreux travailleurs : le stock final doit égaler le stock initial plus la somme des
+mouvements réussis (aucune mise à jour perdue) ; le débit obtenu est affiché.
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python controle_concurrence.py --manches 200 --sessions 2 --travailleurs 32 --operations 100
+
+Un produit de contrôle est créé puis supprimé (avec ses mouvements) à la fin.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, func, case
+
+import mouvement
+from asynchrone import connexion as connexion_asynchrone
+from asynchrone import mouvement as mouvement_asynchrone
+from connexion import get_session
+from models import MouvementStock, Produit
+from produit import creer_produit, supprimer_produit
+
+MOTIF = "Contrôle de concurrence"
+
+
+def _etat(produit_id):
+    """(stock, solde des mouvements) du produit de contrôle"""
+    session = get_session()
+    try:
+        stock = session.execute(
+            select(Produit.quantite_stock).where(Produit.id == produit_id)
+        ).scalar()
+        solde = session.execute(
+            select(func.coalesce(func.sum(case(
+                (MouvementStock.type_mouvement == 'ENTREE', MouvementStock.quantite),
+                else_=-MouvementStock.quantite
+            )), 0)).where(MouvementStock.produit_id == produit_id)
+        ).scalar()
+        return stock, solde
+    finally:
+        session.close()
+
+
+def _sortie_lot(produit_id, quantite):
+    """Sortie par mouvements_en_lot : id du mouvement ou None"""
+    ids, _ = mouvement.mouvements_en_lot([(produit_id, 'SORTIE', quantite, MOTIF)])
+    return ids[0]
+
+
+def _sorties_threads(fonction, produit_id, quantite, sessions):
+    """Lancer `sessions` sorties au même instant (barrière), une par thread"""
+    barriere = threading.Barrier(sessions)
+
+    def sortie(_):
+        barriere.wait()
+        return fonction(produit_id, quantite)
+
+    with ThreadPoolExecutor(max_workers=sessions) as executeur:
+        return list(executeur.map(sortie, range(sessions)))
+
+
+async def _manches_asynchrones(produit_id, quantite, sessions, manches, controler):
+    """Manches de l'API asynchrone : sorties simultanées lancées par asyncio.gather"""
+    for _ in range(manches):
+        mouvement.entree_stock(produit_id, quantite, MOTIF)
+        resultats = await asyncio.gather(*(
+            mouvement_asynchrone.sortie_stock(produit_id, quantite, MOTIF) for _ in range(sessions)
+        ))
+        controler(resultats)
+    await connexion_asynchrone.engine.dispose()
+
+
+def controler_chemin(nom, produit_id, manches=200, sessions=2, quantite=3, asynchrone=False,
+                     fonction=None):
+    """
+    Jouer `manches` manches sur un chemin d'écriture : `quantite` unités sont entrées puis
+    `sessions` sessions tentent de les retirer toutes en même temps.
+    Retourne le nombre d'anomalies (manche sans exactement une réussite, stock négatif ou
+    différent du solde des mouvements).
+    """
+    anomalies = []
+    reussites = 0
+
+    def controler(resultats):
+        nonlocal reussites
+        reussis = sum(1 for r in resultats if r is not None)
+        reussites += reussis
+        stock, solde = _etat(produit_id)
+        if reussis != 1 or stock != 0 or stock != solde:
+            anomalies.append((reussis, stock, solde))
+
+    # Les sessions perdantes affichent « Stock insuffisant » : sortie masquée
+    with contextlib.redirect_stdout(io.StringIO()):
+        if asynchrone:
+            asyncio.run(_manches_asynchrones(produit_id, quantite, sessions, manches, controler))
+        else:
+            for _ in range(manches):
+                mouvement.entree_stock(produit_id, quantite, MOTIF)
+                controler(_sorties_threads(fonction, produit_id, quantite, sessions))
+
+    print(f"  {nom:<30} {manches} manches, {reussites} sortie(s) réussie(s), "
+          f"{len(anomalies)} anomalie(s)")
+    for reussis, stock, solde in anomalies[:5]:
+        print(f"    ✗ {reussis} sortie(s) réussie(s), stock {stock}, solde des mouvements {solde}")
+    return len(anomalies)
+
+
+def controler_charge(produit_id, travailleurs=32, operations=100, stock_initial=1000):
+    """
+    `travailleurs` threads lancés au même instant enchaînent chacun `operations` entrées ou
+    sorties (une sur deux en moyenne, 1 à 5 unités) sur le produit.
+    Retourne le nombre d'anomalies : stock final différent du stock initial plus la somme des
+    mouvements réussis (mise à jour perdue), ou du solde des mouvements.
+    """
+    stock_depart = _etat(produit_id)[0]
+    mouvement.entree_stock(produit_id, stock_initial, MOTIF)
+    barriere = threading.Barrier(travailleurs)
+
+    def travailleur(graine):
+        hasard = random.Random(graine)
+        variation = reussis = 0
+        barriere.wait()
+        for _ in range(operations):
+            quantite = hasard.randint(1, 5)
+            if hasard.random() < 0.5:
+                if mouvement.entree_stock(produit_id, quantite, MOTIF) is not None:
+                    variation += quantite
+                    reussis += 1
+            elif mouvement.sortie_stock(produit_id, quantite, MOTIF) is not None:
+                variation -= quantite
+                reussis += 1
+        return variation, reussis
+
+    # Sorties refusées (« Stock insuffisant ») masquées
+    with contextlib.redirect_stdout(io.StringIO()), \
+            ThreadPoolExecutor(max_workers=travailleurs) as executeur:
+        debut = time.perf_counter()
+        resultats = list(executeur.map(travailleur, range(travailleurs)))
+        duree = time.perf_counter() - debut
+
+    variation = sum(r[0] for r in resultats)
+    reussis = sum(r[1] for r in resultats)
+    attendu = stock_depart + stock_initial + variation
+    stock, solde = _etat(produit_id)
+    anomalie = stock != attendu or stock != solde
+    print(f"  {'charge mêlée':<30} {travailleurs} travailleurs x {operations} opérations, "
+          f"{reussis} mouvement(s) réussi(s) en {duree:.2f} s ({reussis / duree:.0f} mouvements/s)")
+    print(f"    {'✗' if anomalie else '✓'} stock final {stock}, attendu {attendu} "
+          f"(initial {stock_depart + stock_initial}, variation {variation:+d}), "
+          f"solde des mouvements {solde}")
+    return int(anomalie)
+
+
+def executer(manches=200, sessions=2, travailleurs=32, operations=100):
+    """Contrôler chaque chemin d'écriture puis la charge mêlée ; True si aucune anomalie"""
+    reference = f"CONC-{uuid.uuid4().hex[:8].upper()}"
+    produit_id = creer_produit(reference, MOTIF, 1)
+    if produit_id is None:
+        return False
+
+    print(f"{sessions} sessions simultanées par manche, produit {reference}")
+    try:
+        anomalies = (
+            controler_chemin("sortie_stock", produit_id, manches, sessions,
+                             fonction=lambda p, q: mouvement.sortie_stock(p, q, MOTIF))
+            + controler_chemin("mouvements_en_lot", produit_id, manches, sessions,
+                               fonction=_sortie_lot)
+            + controler_chemin("asynchrone.sortie_stock", produit_id, manches, sessions,
+                               asynchrone=True)
+            + controler_charge(produit_id, travailleurs, operations)
+        )
+    finally:
+        supprimer_produit(produit_id)
+    return anomalies == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sorties simultanées des dernières unités d'un produit")
+    parser.add_argument('--manches', type=int, default=200, help="manches par chemin (défaut: 200)")
+    parser.add_argument('--sessions', type=int, default=2,
+                        help="sessions simultanées par manche (défaut: 2)")
+    parser.add_argument('--travailleurs', type=int, default=32,
+                        help="travailleurs du scénario de charge (défaut: 32)")
+    parser.add_argument('--operations', type=int, default=100,
+                        help="opérations par travailleur du scénario de charge (défaut: 100)")
+    args = parser.parse_args()
+    if args.sessions < 2:
+        parser.error("--sessions doit être au moins 2")
+    if not executer(args.manches, args.sessions, args.travailleurs, args.operations):
+        sys.exit(1)
+    print("✓ Une seule sortie par manche, stock jamais négatif, aucune mise à jour perdue")
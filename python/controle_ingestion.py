@@ -0,0 +1,126 @@
+"""
+Contrôle de la file d'ingestion : aucun mouvement acquitté n'est perdu
+Un mouvement refusé par la base (produit inconnu, stock insuffisant) doit se retrouver dans
+le fichier de rejets, les mouvements acceptés dans la base, et le journal validé ne doit
+plus rien rejouer au redémarrage. Deux terminaux doivent disposer chacun de leur file, et
+les mouvements d'un terminal arrêté brutalement doivent être repris par le suivant.
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python controle_ingestion.py
+
+Le journal et le fichier de rejets sont créés dans un dossier temporaire ; un produit de
+contrôle est créé puis supprimé (avec ses mouvements) à la fin.
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+from ingestion import FileIngestion, chemin_journal, demarrer_ingestion
+from produit import creer_produit, lire_produit, supprimer_produit
+
+MOTIF = "Contrôle d'ingestion"
+
+
+def _lire_rejets(chemin):
+    """Lignes JSON du fichier de rejets (liste vide s'il n'existe pas)"""
+    if not chemin.exists():
+        return []
+    return [json.loads(ligne) for ligne in chemin.read_text(encoding='utf-8').splitlines()]
+
+
+# Terminal arrêté brutalement : mouvements acquittés (journal synchronisé) mais pas appliqués
+SCRIPT_ARRET_BRUTAL = """
+import os, sys
+from ingestion import FileIngestion
+file = FileIngestion(sys.argv[1], intervalle=3600)
+file.demarrer()
+file.ajouter_plusieurs([(sys.argv[2], 'ENTREE', 4, sys.argv[3])] * 2)
+os._exit(0)
+"""
+
+
+def controler_rejets(reference, produit_id, dossier):
+    """Mouvements refusés dans le fichier de rejets, acceptés dans la base, rien à rejouer"""
+    journal, rejets = dossier / 'rejets.journal', dossier / 'ingestion.rejets'
+    inconnue = f"INCONNU-{uuid.uuid4().hex[:8]}"
+    file = FileIngestion(journal, rejets=rejets)
+    file.demarrer()
+    file.ajouter_plusieurs([
+        (reference, 'ENTREE', 5, MOTIF),
+        (inconnue, 'ENTREE', 1, MOTIF),         # produit inconnu
+        (reference, 'SORTIE', 1000, MOTIF),     # stock insuffisant
+        (reference, 'SORTIE', 2, MOTIF),
+    ])
+    valides = file.attendre()
+    file.arreter()
+
+    ecartes = _lire_rejets(rejets)
+    stock = lire_produit(produit_id)[5]
+    relance = FileIngestion(journal, rejets=rejets)
+    rejoues = relance.demarrer()
+    relance.arreter()
+    return [
+        ("mouvements validés", valides),
+        ("2 mouvements dans le fichier de rejets", len(ecartes) == 2),
+        ("produit inconnu écarté", any(r['m'][0] == inconnue for r in ecartes)),
+        ("stock insuffisant écarté", any(r['m'][2] == 1000 and r['erreur'] for r in ecartes)),
+        ("mouvements acceptés appliqués (stock 3)", stock == 3),
+        ("rien à rejouer au redémarrage", rejoues == 0),
+    ]
+
+
+def controler_terminaux(reference, produit_id, dossier):
+    """Deux terminaux simultanés, puis reprise du journal d'un terminal arrêté brutalement"""
+    rejets = dossier / 'ingestion.rejets'
+    premier = demarrer_ingestion('terminal-1', dossier, rejets=rejets)
+    second = demarrer_ingestion('terminal-2', dossier, rejets=rejets)
+    premier.ajouter(reference, 'ENTREE', 1, MOTIF)
+    second.ajouter(reference, 'ENTREE', 1, MOTIF)
+    simultanes = premier.attendre() and second.attendre()
+    premier.arreter()
+    second.arreter()
+
+    orphelin = chemin_journal('terminal-3', dossier)
+    subprocess.run([sys.executable, '-c', SCRIPT_ARRET_BRUTAL, str(orphelin), reference, MOTIF],
+                   cwd=Path(__file__).parent, check=True)
+    abandonne = orphelin.exists()
+    suivant = demarrer_ingestion('terminal-4', dossier, rejets=rejets)
+    rejoues = suivant.attendre() and suivant.appliques
+    suivant.arreter()
+    return [
+        ("deux terminaux simultanés, chacun sa file", simultanes),
+        ("journal laissé par le terminal arrêté", abandonne),
+        ("ses 2 mouvements repris par le terminal suivant", rejoues == 2),
+        ("journal orphelin supprimé", not orphelin.exists()),
+        ("aucun journal restant après arrêt", not list(dossier.glob('*.journal'))),
+        ("stock final 13", lire_produit(produit_id)[5] == 13),
+    ]
+
+
+def executer():
+    """Jouer les scénarios et afficher chaque vérification ; True si toutes réussissent"""
+    reference = f"INGE-{uuid.uuid4().hex[:8].upper()}"
+    produit_id = creer_produit(reference, MOTIF, 1)
+    if produit_id is None:
+        return False
+
+    dossier = Path(tempfile.mkdtemp(prefix='controle_ingestion_'))
+    try:
+        verifications = (controler_rejets(reference, produit_id, dossier)
+                         + controler_terminaux(reference, produit_id, dossier))
+    finally:
+        supprimer_produit(produit_id)
+
+    for libelle, ok in verifications:
+        print(f"{'✓' if ok else '✗'} {libelle}")
+    return all(ok for _, ok in verifications)
+
+
+if __name__ == "__main__":
+    if not executer():
+        sys.exit(1)
+    print("✓ Aucun mouvement acquitté perdu")
@@ -0,0 +1,149 @@
+"""
+Contrôle du nombre d'instructions SQL par page des fonctions de lecture
+Chaque page (ou liste) doit coûter un nombre constant d'instructions, quelle que soit sa
+taille : une requête jointe, sans chargement paresseux par ligne (N+1). Les instructions
+sont comptées par un écouteur before_cursor_execute sur le primaire et la réplique.
+
+Utilisation (depuis le dossier python/) :
+    python controle_requetes.py --tailles 10 200 --pages 3
+"""
+
+import argparse
+import contextlib
+import sys
+
+from sqlalchemy import event, select, func
+
+import mouvement
+import produit
+from categorie import lire_categories
+from connexion import _moteurs, get_session, test_connexion
+from models import MouvementJournalier
+
+# Instructions attendues pour une page, quelle que soit sa taille
+INSTRUCTIONS_PAR_PAGE = 1
+
+
+@contextlib.contextmanager
+def compter_instructions():
+    """Compter les instructions SQL envoyées au primaire et à la réplique pendant le bloc"""
+    compteur = [0]
+
+    def compter(*args):
+        compteur[0] += 1
+
+    moteurs = [moteur for moteur in _moteurs()[:2] if moteur is not None]
+    for moteur in moteurs:
+        event.listen(moteur, 'before_cursor_execute', compter)
+    try:
+        yield compteur
+    finally:
+        for moteur in moteurs:
+            event.remove(moteur, 'before_cursor_execute', compter)
+
+
+def mesurer_pages(lire, curseur=None, tailles=(10, 200), pages=3):
+    """
+    Lire `pages` pages successives de chaque taille avec lire(curseur, taille), le curseur
+    de la page suivante étant curseur(dernière ligne) ; sans `curseur`, une page par taille.
+    Retourne une liste de (taille, numéro de page, lignes lues, instructions).
+    """
+    mesures = []
+    for taille in tailles:
+        apres = None
+        for numero in range(1, (pages if curseur else 1) + 1):
+            with compter_instructions() as compteur:
+                lignes = lire(apres, taille)
+            mesures.append((taille, numero, len(lignes), compteur[0]))
+            if not lignes:
+                break
+            apres = curseur(lignes[-1]) if curseur else None
+    return mesures
+
+
+def mesurer_liste(lire):
+    """Lire une liste complète ; retourne [(None, 1, lignes lues, instructions)]"""
+    with compter_instructions() as compteur:
+        lignes = lire()
+    return [(None, 1, len(lignes), compteur[0])]
+
+
+def lecteurs(tailles, pages):
+    """(nom, mesures) des fonctions de lecture contrôlées"""
+    premiers = produit.lire_produits_page(limite=1)
+    terme = premiers[0][2][:3] if premiers else 'a'
+    categories = lire_categories()
+    yield "produit.lire_produits_page", mesurer_pages(
+        lambda apres, taille: produit.lire_produits_page(apres, taille),
+        lambda ligne: (ligne[2], ligne[0]), tailles, pages
+    )
+    yield f"produit.rechercher_produits('{terme}')", mesurer_pages(
+        lambda apres, taille: produit.rechercher_produits(terme, taille), None, tailles
+    )
+    yield "produit.lire_produits", mesurer_liste(produit.lire_produits)
+    yield "produit.iterer_produits", mesurer_liste(lambda: list(produit.iterer_produits(100)))
+    yield "produit.produits_en_alerte", mesurer_liste(produit.produits_en_alerte)
+    if categories:
+        yield "produit.produits_par_categorie", mesurer_liste(
+            lambda: produit.produits_par_categorie(categories[0][0])
+        )
+
+    # Mouvements : pages successives par curseur (date, id)
+    yield "mouvement.lire_mouvements", mesurer_pages(
+        lambda avant, taille: mouvement.lire_mouvements(taille, avant),
+        lambda ligne: (ligne[6], ligne[0]), tailles, pages
+    )
+    yield "mouvement.lire_mouvements(SORTIE)", mesurer_pages(
+        lambda avant, taille: mouvement.lire_mouvements(taille, avant, type_mouvement='SORTIE'),
+        lambda ligne: (ligne[6], ligne[0]), tailles, pages
+    )
+    produit_id = _produit_le_plus_mouvemente()
+    if produit_id is not None:
+        yield "mouvement.historique_produit_page", mesurer_pages(
+            lambda avant, taille: mouvement.historique_produit_page(produit_id, avant, taille),
+            lambda ligne: (ligne[4], ligne[0]), tailles, pages
+        )
+
+
+def _produit_le_plus_mouvemente():
+    """Produit ayant le plus de mouvements sur les cumuls journaliers (None s'il n'y en a pas)"""
+    session = get_session()
+    try:
+        return session.execute(
+            select(MouvementJournalier.produit_id)
+            .group_by(MouvementJournalier.produit_id)
+            .order_by(func.sum(MouvementJournalier.nb_mouvements).desc())
+            .limit(1)
+        ).scalar()
+    finally:
+        session.close()
+
+
+def controler(tailles=(10, 200), pages=3):
+    """Mesurer chaque fonction de lecture et afficher le détail ; True si toutes sont constantes"""
+    test_connexion()  # initialisation du dialecte hors mesure
+    conforme = True
+    for nom, mesures in lecteurs(tailles, pages):
+        instructions = sorted({m[3] for m in mesures})
+        ok = instructions == [INSTRUCTIONS_PAR_PAGE]
+        conforme = conforme and ok
+        detail = ", ".join(
+            f"{lignes} ligne(s): {nb}" if taille is None else f"page {numero} de {taille} ({lignes} ligne(s)): {nb}"
+            for taille, numero, lignes, nb in mesures
+        )
+        print(f"{'✓' if ok else '✗'} {nom}")
+        print(f"    instructions par page — {detail}")
+    return conforme
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nombre d'instructions SQL par page des lectures")
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10, 200],
+                        help="tailles de page comparées (défaut: 10 200)")
+    parser.add_argument('--pages', type=int, default=3,
+                        help="pages successives lues par taille (défaut: 3)")
+    args = parser.parse_args()
+    if not controler(args.tailles, args.pages):
+        print(f"✗ Une page doit coûter {INSTRUCTIONS_PAR_PAGE} instruction(s), quelle que soit sa taille")
+        sys.exit(1)
+    print("✓ Nombre d'instructions constant par page")
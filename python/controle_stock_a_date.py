@@ -0,0 +1,214 @@
+"""
+Contrôle du stock à une date
+stock_a_date part des instantanés ; son résultat est comparé à un rejeu complet des
+mouvements, sans instantané :
+- sur un produit de contrôle dont l'historique est connu (mouvements antidatés, instantanés
+  intercalés), le stock à une date doit égaler la somme des mouvements antérieurs ;
+- sur les produits existants, les instantanés et le stock à une date doivent égaler le stock
+  courant moins les mouvements postérieurs ;
+- une date antérieure à la limite d'archivage doit être refusée.
+
+Utilisation (depuis le dossier python/, sur une base de test) :
+    python controle_stock_a_date.py --mouvements 500 --jours 60 --produits 20
+
+Un produit de contrôle est créé puis supprimé (avec ses mouvements et instantanés) à la fin.
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, time
+
+from sqlalchemy import select, update, func
+
+from connexion import get_session
+from instantane import _variation, stock_a_date
+from models import LimiteArchives, MouvementStock, Produit, StockInstantane
+from produit import creer_produit, supprimer_produit
+
+MOTIF = "Contrôle du stock à une date"
+
+
+def _limite():
+    """Limite de l'archivage (datetime) ou None"""
+    session = get_session()
+    try:
+        limite = session.execute(select(LimiteArchives.avant)).scalar()
+        return datetime.combine(limite, time.min) if limite is not None else None
+    finally:
+        session.close()
+
+
+def _stock_remonte(produit_id, date):
+    """Stock courant moins tous les mouvements datés de `date` ou après"""
+    session = get_session()
+    try:
+        depuis = session.execute(
+            select(_variation()).where(
+                MouvementStock.produit_id == produit_id, MouvementStock.date_mouvement >= date
+            )
+        ).scalar()
+        return session.execute(
+            select(Produit.quantite_stock).where(Produit.id == produit_id)
+        ).scalar() - depuis
+    finally:
+        session.close()
+
+
+def _preparer_historique(produit_id, nb_mouvements, jours, debut):
+    """
+    Antidater `nb_mouvements` mouvements du produit de contrôle entre `debut` et maintenant,
+    porter le stock à leur solde et intercaler des instantanés (un par semaine) calculés par
+    rejeu. Retourne la liste triée des (date, variation) et les dates des instantanés.
+    """
+    maintenant = datetime.now().replace(microsecond=0)
+    etendue = int((maintenant - debut).total_seconds())
+    dates = sorted(debut + timedelta(seconds=random.randrange(etendue)) for _ in range(nb_mouvements))
+    historique, stock = [], 0
+    for date in dates:
+        quantite = random.randint(1, 20)
+        if stock >= quantite and random.random() < 0.4:
+            historique.append((date, -quantite))
+            stock -= quantite
+        else:
+            historique.append((date, quantite))
+            stock += quantite
+
+    instantanes = [debut + timedelta(days=n) for n in range(1, jours, 7)]
+    session = get_session()
+    try:
+        session.add_all(
+            MouvementStock(produit_id=produit_id, type_mouvement='ENTREE' if variation > 0 else 'SORTIE',
+                           quantite=abs(variation), motif=MOTIF, date_mouvement=date)
+            for date, variation in historique
+        )
+        session.add_all(
+            StockInstantane(produit_id=produit_id, date_instantane=date,
+                            quantite=sum(v for d, v in historique if d < date))
+            for date in instantanes
+        )
+        session.execute(update(Produit).where(Produit.id == produit_id).values(quantite_stock=stock))
+        session.commit()
+    finally:
+        session.close()
+    return historique, instantanes
+
+
+def controler_historique(nb_mouvements=500, jours=60, limite=None):
+    """
+    Produit de contrôle : stock_a_date à chaque instantané, juste avant et après, à chaque
+    mouvement et à des dates tirées au hasard, comparé à la somme des mouvements antérieurs.
+    Retourne le nombre d'écarts.
+    """
+    reference = f"DATE-{uuid.uuid4().hex[:8].upper()}"
+    produit_id = creer_produit(reference, MOTIF, 1)
+    if produit_id is None:
+        return 1
+
+    debut = datetime.now().replace(microsecond=0) - timedelta(days=jours)
+    if limite is not None:
+        debut = max(debut, limite)
+    try:
+        historique, instantanes = _preparer_historique(produit_id, nb_mouvements, jours, debut)
+        seconde = timedelta(seconds=1)
+        dates = [d + e for d in instantanes for e in (-seconde, timedelta(0), seconde)]
+        dates += [d for d, _ in historique[::max(1, len(historique) // 50)]]
+        dates += [debut + timedelta(seconds=random.randrange(jours * 86400)) for _ in range(50)]
+
+        ecarts = []
+        for date in dates:
+            attendu = sum(v for d, v in historique if d < date)
+            obtenu = stock_a_date(produit_id, date)
+            if obtenu != attendu:
+                ecarts.append((date, obtenu, attendu))
+    finally:
+        supprimer_produit(produit_id)
+
+    print(f"{'✓' if not ecarts else '✗'} Produit de contrôle {reference}: {len(historique)} mouvements, "
+          f"{len(instantanes)} instantanés, {len(dates)} dates, {len(ecarts)} écart(s)")
+    for date, obtenu, attendu in ecarts[:5]:
+        print(f"    ✗ {date:%d/%m/%Y %H:%M:%S}: {obtenu}, rejeu {attendu}")
+    return len(ecarts)
+
+
+def controler_existants(nb_produits=20, limite=None):
+    """
+    Produits existants ayant des instantanés : chaque instantané postérieur à la limite
+    d'archivage, et le stock à une date tirée entre deux instantanés, comparés au stock
+    courant moins les mouvements postérieurs. Retourne le nombre d'écarts.
+    """
+    session = get_session()
+    try:
+        requete = select(StockInstantane.produit_id, StockInstantane.date_instantane, StockInstantane.quantite)
+        if limite is not None:
+            requete = requete.where(StockInstantane.date_instantane >= limite)
+        produits = (
+            select(StockInstantane.produit_id).group_by(StockInstantane.produit_id)
+            .order_by(func.random()).limit(nb_produits)
+        )
+        instantanes = session.execute(
+            requete.where(StockInstantane.produit_id.in_(produits.scalar_subquery()))
+        ).all()
+    finally:
+        session.close()
+
+    ecarts = []
+    for produit_id, date, quantite in instantanes:
+        attendu = _stock_remonte(produit_id, date)
+        if quantite != attendu:
+            ecarts.append(("instantané", date, quantite, attendu))
+        milieu = date + timedelta(hours=random.randint(1, 23))
+        obtenu = stock_a_date(produit_id, milieu)
+        attendu = _stock_remonte(produit_id, milieu)
+        if obtenu != attendu:
+            ecarts.append(("stock_a_date", milieu, obtenu, attendu))
+
+    print(f"{'✓' if not ecarts else '✗'} Produits existants: {len(instantanes)} instantané(s) contrôlé(s), "
+          f"{len(ecarts)} écart(s)")
+    for nature, date, obtenu, attendu in ecarts[:5]:
+        print(f"    ✗ {nature} au {date:%d/%m/%Y %H:%M}: {obtenu}, rejeu {attendu}")
+    return len(ecarts)
+
+
+def controler_limite(limite):
+    """Une date antérieure à la limite d'archivage doit être refusée ; 1 si elle ne l'est pas"""
+    if limite is None:
+        print("  Aucune partition archivée : refus des dates antérieures non contrôlé")
+        return 0
+    session = get_session()
+    try:
+        produit_id = session.execute(select(Produit.id).limit(1)).scalar()
+    finally:
+        session.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        refuse = stock_a_date(produit_id, limite - timedelta(days=1)) is None
+    print(f"{'✓' if refuse else '✗'} Date antérieure à la limite d'archivage ({limite:%d/%m/%Y}) "
+          f"{'refusée' if refuse else 'acceptée'}")
+    return 0 if refuse else 1
+
+
+def executer(nb_mouvements=500, jours=60, nb_produits=20):
+    """Jouer les trois contrôles ; True si aucun écart"""
+    limite = _limite()
+    return (
+        controler_historique(nb_mouvements, jours, limite)
+        + controler_existants(nb_produits, limite)
+        + controler_limite(limite)
+    ) == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock à une date comparé à un rejeu complet")
+    parser.add_argument('--mouvements', type=int, default=500,
+                        help="mouvements antidatés du produit de contrôle (défaut: 500)")
+    parser.add_argument('--jours', type=int, default=60,
+                        help="étendue de l'historique du produit de contrôle (défaut: 60)")
+    parser.add_argument('--produits', type=int, default=20,
+                        help="produits existants contrôlés (défaut: 20)")
+    args = parser.parse_args()
+    if not executer(args.mouvements, args.jours, args.produits):
+        sys.exit(1)
+    print("✓ Stock à une date conforme au rejeu des mouvements")
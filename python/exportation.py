@@ -0,0 +1,106 @@
+"""
+Export des produits et des mouvements de stock en CSV
+Flux COPY ... TO STDOUT écrit directement dans le fichier, sans objet Python par ligne
+
+Utilisation en ligne de commande :
+    python python/exportation.py produits -o produits.csv.gz
+    python python/exportation.py mouvements --debut 2024-01-01 --fin 2024-02-01 > janvier.csv
+"""
+
+import argparse
+import gzip
+import sys
+
+from connexion import engine
+
+# Mêmes colonnes que l'import CSV (importation.COLONNES_CSV)
+SQL_EXPORT_PRODUITS = """
+    SELECT p.reference, p.nom, p.description, p.prix_unitaire, p.quantite_stock,
+           p.seuil_alerte, c.nom AS categorie, f.nom AS fournisseur
+    FROM produits p
+    LEFT JOIN categories c ON c.id = p.categorie_id
+    LEFT JOIN fournisseurs f ON f.id = p.fournisseur_id
+    ORDER BY p.reference
+"""
+
+SQL_EXPORT_MOUVEMENTS = """
+    SELECT m.date_mouvement, p.reference, p.nom AS produit, m.type_mouvement,
+           m.quantite, m.motif
+    FROM mouvements_stock m
+    JOIN produits p ON p.id = m.produit_id
+    WHERE (%(debut)s::TIMESTAMP IS NULL OR m.date_mouvement >= %(debut)s::TIMESTAMP)
+      AND (%(fin)s::TIMESTAMP IS NULL OR m.date_mouvement < %(fin)s::TIMESTAMP)
+    ORDER BY m.date_mouvement
+"""
+
+
+def _exporter(requete, parametres, destination, compresser):
+    """
+    Exécuter COPY (requete) TO STDOUT vers `destination` (chemin ou '-' pour stdout).
+    Les données transitent par blocs, la mémoire utilisée reste constante.
+    """
+    connexion = engine.raw_connection()
+    sortie = None
+    try:
+        curseur = connexion.cursor()
+        copie = curseur.mogrify(
+            f"COPY ({requete}) TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')",
+            parametres
+        ).decode()
+
+        if destination == '-':
+            # GzipFile ne ferme pas le flux qu'il enveloppe
+            sortie = sys.stdout.buffer
+            if compresser:
+                sortie = gzip.GzipFile(fileobj=sortie, mode='wb')
+        elif compresser:
+            sortie = gzip.open(destination, 'wb')
+        else:
+            sortie = open(destination, 'wb')
+
+        curseur.copy_expert(copie, sortie)
+        connexion.commit()
+        return True
+    except Exception as e:
+        connexion.rollback()
+        print(f"Erreur lors de l'export: {e}", file=sys.stderr)
+        return False
+    finally:
+        if sortie is sys.stdout.buffer:
+            sortie.flush()
+        elif sortie is not None:
+            sortie.close()
+        connexion.close()
+
+
+def exporter_produits(destination, compresser=False):
+    """Exporter les produits avec noms de catégorie et fournisseur en CSV"""
+    return _exporter(SQL_EXPORT_PRODUITS, None, destination, compresser)
+
+
+def exporter_mouvements(destination, debut=None, fin=None, compresser=False):
+    """
+    Exporter les mouvements de stock en CSV, triés par date.
+    `debut` (inclus) et `fin` (exclue) filtrent sur date_mouvement.
+    """
+    parametres = {'debut': debut, 'fin': fin}
+    return _exporter(SQL_EXPORT_MOUVEMENTS, parametres, destination, compresser)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export CSV de la base de gestion de stock")
+    parser.add_argument('table', choices=['produits', 'mouvements'])
+    parser.add_argument('-o', '--sortie', default='-',
+                        help="fichier de sortie ('-' pour la sortie standard)")
+    parser.add_argument('--gzip', action='store_true',
+                        help="compresser la sortie (implicite pour un fichier .gz)")
+    parser.add_argument('--debut', help="date de début des mouvements (incluse)")
+    parser.add_argument('--fin', help="date de fin des mouvements (exclue)")
+    args = parser.parse_args()
+
+    compresser = args.gzip or args.sortie.endswith('.gz')
+    if args.table == 'produits':
+        ok = exporter_produits(args.sortie, compresser)
+    else:
+        ok = exporter_mouvements(args.sortie, args.debut, args.fin, compresser)
+    sys.exit(0 if ok else 1)
@@ -2,7 +2,8 @@
 CRUD pour la table fournisseurs avec SQLAlchemy
 """
 
-from connexion import get_session
+from connexion import get_session, apres_transaction
+from cache import cache_fournisseurs, en_cache
 from models import Fournisseur
 
 
@@ -13,6 +14,7 @@ def creer_fournisseur(nom, email=None, telephone=None, adresse=None):
         fournisseur = Fournisseur(nom=nom, email=email, telephone=telephone, adresse=adresse)
         session.add(fournisseur)
         session.commit()
+        apres_transaction(cache_fournisseurs.invalider)
         return fournisseur.id
     except Exception as e:
         session.rollback()
@@ -22,6 +24,7 @@ def creer_fournisseur(nom, email=None, telephone=None, adresse=None):
         session.close()
 
 
+@en_cache(cache_fournisseurs)
 def lire_fournisseurs():
     """Lire tous les fournisseurs"""
     session = get_session()
@@ -32,6 +35,7 @@ def lire_fournisseurs():
         session.close()
 
 
+@en_cache(cache_fournisseurs)
 def lire_fournisseur(fournisseur_id):
     """Lire un fournisseur par son ID"""
     session = get_session()
@@ -62,6 +66,7 @@ def modifier_fournisseur(fournisseur_id, nom=None, email=None, telephone=None, a
             fournisseur.adresse = adresse
         
         session.commit()
+        apres_transaction(cache_fournisseurs.invalider)
         return True
     except Exception as e:
         session.rollback()
@@ -79,6 +84,7 @@ def supprimer_fournisseur(fournisseur_id):
         if fournisseur:
             session.delete(fournisseur)
             session.commit()
+            apres_transaction(cache_fournisseurs.invalider)
             return True
         return False
     except Exception as e:
@@ -0,0 +1,164 @@
+"""
+Import en masse de produits depuis un fichier CSV
+Chargement par COPY dans une table temporaire puis upsert en une requête ; le stock des
+produits créés est enregistré par des entrées « Stock initial » dans la même transaction
+"""
+
+from connexion import engine, signaler_ecriture
+
+# Colonnes attendues dans le fichier CSV, dans cet ordre
+COLONNES_CSV = ('reference', 'nom', 'description', 'prix_unitaire',
+                'quantite_stock', 'seuil_alerte', 'categorie', 'fournisseur')
+
+SQL_TABLE_IMPORT = """
+    CREATE TEMP TABLE import_produits (
+        ligne BIGSERIAL,
+        reference TEXT,
+        nom TEXT,
+        description TEXT,
+        prix_unitaire TEXT,
+        quantite_stock TEXT,
+        seuil_alerte TEXT,
+        categorie TEXT,
+        fournisseur TEXT,
+        categorie_id UUID,
+        fournisseur_id UUID,
+        erreur TEXT
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE import_stocks_initiaux (
+        produit_id UUID,
+        quantite INTEGER
+    ) ON COMMIT DROP
+"""
+
+SQL_RESOLUTION_CATEGORIES = """
+    UPDATE import_produits i SET categorie_id = c.id
+    FROM categories c
+    WHERE c.nom = trim(i.categorie)
+"""
+
+# Les noms de fournisseurs ne sont pas uniques : on retient le plus ancien
+SQL_RESOLUTION_FOURNISSEURS = """
+    UPDATE import_produits i SET fournisseur_id = f.id
+    FROM (
+        SELECT DISTINCT ON (nom) id, nom
+        FROM fournisseurs
+        ORDER BY nom, created_at, id
+    ) f
+    WHERE f.nom = trim(i.fournisseur)
+"""
+
+SQL_VALIDATION = r"""
+    UPDATE import_produits SET erreur = CASE
+        WHEN coalesce(trim(reference), '') = '' THEN 'référence manquante'
+        WHEN length(trim(reference)) > 50 THEN 'référence trop longue'
+        WHEN coalesce(trim(nom), '') = '' THEN 'nom manquant'
+        WHEN length(trim(nom)) > 200 THEN 'nom trop long'
+        WHEN coalesce(replace(trim(prix_unitaire), ',', '.'), '') !~ '^\d{1,8}(\.\d{1,2})?$'
+            THEN 'prix invalide'
+        WHEN coalesce(trim(quantite_stock), '') !~ '^\d{0,9}$' THEN 'quantité invalide'
+        WHEN coalesce(trim(seuil_alerte), '') !~ '^\d{0,9}$' THEN 'seuil invalide'
+        WHEN coalesce(trim(categorie), '') <> '' AND categorie_id IS NULL THEN 'catégorie inconnue'
+        WHEN coalesce(trim(fournisseur), '') <> '' AND fournisseur_id IS NULL THEN 'fournisseur inconnu'
+    END
+"""
+
+# Une référence présente plusieurs fois dans le fichier : la dernière ligne l'emporte.
+# Le stock évolue uniquement par mouvements : les produits créés le sont avec un stock nul
+# et leur quantité est retenue dans import_stocks_initiaux (voir SQL_STOCKS_INITIAUX),
+# le stock des produits existants n'est pas modifié.
+SQL_UPSERT = """
+    WITH source AS (
+        SELECT DISTINCT ON (trim(reference))
+            trim(reference) AS reference,
+            trim(nom) AS nom,
+            nullif(description, '') AS description,
+            replace(trim(prix_unitaire), ',', '.')::NUMERIC(10, 2) AS prix_unitaire,
+            coalesce(nullif(trim(quantite_stock), '')::INTEGER, 0) AS quantite_stock,
+            coalesce(nullif(trim(seuil_alerte), '')::INTEGER, 10) AS seuil_alerte,
+            categorie_id,
+            fournisseur_id
+        FROM import_produits
+        WHERE erreur IS NULL
+        ORDER BY trim(reference), ligne DESC
+    ), upsert AS (
+        INSERT INTO produits (reference, nom, description, prix_unitaire,
+                              quantite_stock, seuil_alerte, categorie_id, fournisseur_id)
+        SELECT reference, nom, description, prix_unitaire, 0, seuil_alerte,
+               categorie_id, fournisseur_id
+        FROM source
+        ON CONFLICT (reference) DO UPDATE SET
+            nom = EXCLUDED.nom,
+            description = coalesce(EXCLUDED.description, produits.description),
+            prix_unitaire = EXCLUDED.prix_unitaire,
+            seuil_alerte = EXCLUDED.seuil_alerte,
+            categorie_id = coalesce(EXCLUDED.categorie_id, produits.categorie_id),
+            fournisseur_id = coalesce(EXCLUDED.fournisseur_id, produits.fournisseur_id)
+        RETURNING id, reference, (xmax = 0) AS insere
+    ), stocks_initiaux AS (
+        INSERT INTO import_stocks_initiaux (produit_id, quantite)
+        SELECT u.id, s.quantite_stock
+        FROM upsert u
+        JOIN source s ON s.reference = u.reference
+        WHERE u.insere AND s.quantite_stock > 0
+    )
+    SELECT count(*) FILTER (WHERE insere), count(*) FILTER (WHERE NOT insere)
+    FROM upsert
+"""
+
+# Stock des produits créés : une entrée par produit et mise à jour ensembliste du stock,
+# en une instruction (comme un mouvement unitaire, voir mouvement._requete_mouvement)
+SQL_STOCKS_INITIAUX = """
+    WITH maj AS (
+        UPDATE produits p SET quantite_stock = p.quantite_stock + i.quantite
+        FROM import_stocks_initiaux i
+        WHERE p.id = i.produit_id
+        RETURNING p.id, i.quantite
+    )
+    INSERT INTO mouvements_stock (produit_id, type_mouvement, quantite, motif, utilisateur_id)
+    SELECT id, 'ENTREE', quantite, 'Stock initial', %(utilisateur_id)s
+    FROM maj
+"""
+
+
+def importer_produits_csv(chemin, separateur=',', utilisateur_id=None):
+    """
+    Importer un catalogue CSV (avec ligne d'en-tête) dans la table produits.
+    Le fichier est transmis en flux à PostgreSQL par COPY, sans être chargé en mémoire.
+    Colonnes attendues : voir COLONNES_CSV ; catégorie et fournisseur sont des noms.
+    Les produits existants (même référence) sont mis à jour, sauf leur stock ; le stock
+    des produits créés est enregistré par des entrées « Stock initial » de `utilisateur_id`.
+    Retourne (insérés, mis à jour, rejetés) ou None en cas d'erreur.
+    """
+    if len(separateur) != 1 or separateur in "'\\":
+        print("Séparateur invalide")
+        return None
+
+    connexion = engine.raw_connection()
+    try:
+        curseur = connexion.cursor()
+        curseur.execute(SQL_TABLE_IMPORT)
+        with open(chemin, encoding='utf-8', newline='') as fichier:
+            curseur.copy_expert(
+                f"COPY import_produits ({', '.join(COLONNES_CSV)}) FROM STDIN "
+                f"WITH (FORMAT csv, HEADER true, DELIMITER '{separateur}')",
+                fichier
+            )
+        curseur.execute(SQL_RESOLUTION_CATEGORIES)
+        curseur.execute(SQL_RESOLUTION_FOURNISSEURS)
+        curseur.execute(SQL_VALIDATION)
+        curseur.execute("SELECT count(*) FROM import_produits WHERE erreur IS NOT NULL")
+        rejetes = curseur.fetchone()[0]
+        curseur.execute(SQL_UPSERT)
+        inseres, mis_a_jour = curseur.fetchone()
+        curseur.execute(SQL_STOCKS_INITIAUX,
+                        {'utilisateur_id': str(utilisateur_id) if utilisateur_id else None})
+        connexion.commit()
+        signaler_ecriture()
+        return (inseres, mis_a_jour, rejetes)
+    except Exception as e:
+        connexion.rollback()
+        print(f"Erreur lors de l'import: {e}")
+        return None
+    finally:
+        connexion.close()
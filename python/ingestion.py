@@ -0,0 +1,361 @@
+"""
+File d'ingestion des mouvements de stock (écriture différée)
+Les mouvements sont acquittés dès leur écriture dans un journal local, puis appliqués
+par lots par un thread ; les mouvements non validés du journal sont rejoués au redémarrage,
+sans doublon grâce à leur clé d'idempotence. Un mouvement que la base refuse pour une
+autre raison qu'une indisponibilité est écarté dans un fichier de rejets.
+Chaque terminal a son propre journal ; les journaux laissés par un terminal arrêté
+brutalement sont repris par le prochain terminal démarré.
+"""
+
+import atexit
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import groupby
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows : le journal n'est pas verrouillé
+    fcntl = None
+
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as DelaiPoolDepasse
+
+from mouvement import mouvements_en_lot, erreur_mouvement
+
+# Journaux des terminaux et fichier de rejets, à la racine du projet (comme le .env)
+# INGESTION_DOSSIER : dossier des journaux ; INGESTION_TERMINAL : identifiant du terminal,
+# à défaut le nom d'hôte et le numéro du processus (un journal par processus)
+DOSSIER_JOURNAUX = Path(os.getenv('INGESTION_DOSSIER') or Path(__file__).parent.parent / 'ingestion')
+TERMINAL = os.getenv('INGESTION_TERMINAL', '')
+REJETS_DEFAUT = Path(__file__).parent.parent / 'ingestion.rejets'
+
+# Journal unique des versions précédentes, repris comme un journal orphelin
+ANCIEN_JOURNAL = Path(__file__).parent.parent / 'ingestion.journal'
+
+
+def chemin_journal(terminal=TERMINAL, dossier=DOSSIER_JOURNAUX):
+    """Journal du terminal `terminal` (à défaut, du processus courant)"""
+    return Path(dossier) / f"{terminal or f'{socket.gethostname()}-{os.getpid()}'}.journal"
+
+
+def _lire_journal(contenu):
+    """(mouvements non validés, dernier numéro attribué, dernier numéro validé) d'un journal"""
+    entrees = []
+    numero = valide = 0
+    for ligne in contenu.splitlines():
+        try:
+            entree = json.loads(ligne)
+        except ValueError:
+            continue  # dernière ligne tronquée par un arrêt brutal
+        if 'v' in entree:
+            valide = max(valide, entree['v'])
+        else:
+            entrees.append(entree)
+            numero = max(numero, entree['n'])
+    return [entree for entree in entrees if entree['n'] > valide], numero, valide
+
+
+def _transitoire(erreur):
+    """Erreur due à l'indisponibilité de la base (connexion perdue, pool saturé, délai, verrou)"""
+    if isinstance(erreur, (OperationalError, DelaiPoolDepasse)):
+        return True
+    return isinstance(erreur, DBAPIError) and erreur.connection_invalidated
+
+
+class FileIngestion:
+    """
+    File de mouvements appliqués par lots d'au plus `taille_lot` lignes, au plus tard
+    `intervalle` secondes après le premier mouvement en attente.
+    Chaque mouvement est écrit et synchronisé (fsync) dans le journal avant d'être acquitté ;
+    un marqueur de validation y est ajouté après chaque commit. Au démarrage, les mouvements
+    postérieurs au dernier marqueur sont rejoués ; chaque mouvement porte une clé
+    d'idempotence, un mouvement déjà appliqué n'est donc pas appliqué à nouveau.
+    Seules les erreurs transitoires sont retentées ; un mouvement refusé (produit inconnu,
+    stock insuffisant, erreur de la base) est ajouté au fichier `rejets` (une ligne JSON par
+    mouvement) avant d'être validé.
+    Les mouvements non validés des journaux `orphelins` que plus aucun processus ne
+    verrouille sont recopiés dans le journal de la file au démarrage, puis ces journaux
+    sont supprimés. Le journal est supprimé à l'arrêt s'il ne reste rien à rejouer.
+    """
+
+    def __init__(self, journal=None, intervalle=0.05, taille_lot=500,
+                 rejets=REJETS_DEFAUT, orphelins=()):
+        self.chemin = Path(journal) if journal else chemin_journal()
+        self.chemin_rejets = Path(rejets)
+        self.orphelins = [Path(chemin) for chemin in orphelins]
+        self.intervalle = intervalle
+        self.taille_lot = taille_lot
+        self._file = queue.Queue()
+        self._verrou = threading.Lock()
+        self._journal = None
+        self._thread = None
+        self._arret = threading.Event()
+        self._numero = 0    # dernier numéro attribué
+        self._valide = 0    # tous les mouvements jusqu'à ce numéro sont validés
+        # Métriques
+        self.acquittes = 0
+        self.appliques = 0
+        self.rejetes = 0
+        self.lots = 0
+        self.rejets = deque(maxlen=100)         # (mouvement, message)
+        self._latences = deque(maxlen=1000)     # durée des transactions de lot
+        self._attentes = deque(maxlen=1000)     # délai entre acquittement et commit
+
+    def demarrer(self):
+        """
+        Ouvrir et verrouiller le journal, remettre en file les mouvements non validés (les
+        siens puis ceux des journaux orphelins) et démarrer le thread d'application.
+        Retourne le nombre de mouvements rejoués.
+        """
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.chemin, 'a+', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._journal.close()
+                self._journal = None
+                raise RuntimeError(f"Journal déjà utilisé par un autre processus: {self.chemin}")
+
+        self._journal.seek(0)
+        contenu = self._journal.read()
+        entrees, self._numero, self._valide = _lire_journal(contenu)
+        if contenu and not contenu.endswith('\n'):
+            self._journal.write('\n')
+
+        for entree in entrees:
+            self._file.put((entree['n'], tuple(entree['m']), entree['u'], time.monotonic()))
+        for chemin in self.orphelins:
+            if chemin != self.chemin:
+                self._reprendre(chemin)
+        self._compacter()
+        rejoues = self._file.qsize()
+
+        self._thread = threading.Thread(target=self._boucle, name='ingestion-mouvements', daemon=True)
+        self._thread.start()
+        return rejoues
+
+    def _reprendre(self, chemin):
+        """
+        Recopier dans le journal de la file les mouvements non validés d'un journal orphelin
+        (non verrouillé), puis le supprimer. Sans verrouillage (Windows), rien n'est repris.
+        """
+        if fcntl is None:
+            return
+        try:
+            orphelin = open(chemin, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        try:
+            try:
+                fcntl.flock(orphelin, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # terminal toujours actif
+            if not chemin.exists() or os.stat(chemin).st_ino != os.fstat(orphelin.fileno()).st_ino:
+                return  # déjà repris par un autre terminal
+            entrees, _, _ = _lire_journal(orphelin.read())
+            for entree in entrees:
+                self._numero += 1
+                self._journal.write(json.dumps({'n': self._numero, 'm': entree['m'], 'u': entree['u']}) + '\n')
+                self._file.put((self._numero, tuple(entree['m']), entree['u'], time.monotonic()))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            os.remove(chemin)
+        finally:
+            orphelin.close()
+
+    def ajouter(self, produit, type_mouvement, quantite, motif=None, utilisateur_id=None, cle=None):
+        """
+        Ajouter un mouvement (produit par UUID ou référence). `cle` est la clé d'idempotence
+        fournie par l'appelant, une clé aléatoire à défaut.
+        Retourne son numéro une fois écrit durablement dans le journal.
+        """
+        return self.ajouter_plusieurs([(produit, type_mouvement, quantite, motif, cle)],
+                                      utilisateur_id)[0]
+
+    def ajouter_plusieurs(self, lignes, utilisateur_id=None):
+        """
+        Ajouter des mouvements (produit, type, quantité, motif[, clé d'idempotence])
+        avec une seule synchronisation. Lève ValueError, sans rien ajouter, si un mouvement
+        sort des bornes du schéma (type, quantité, longueur de la clé).
+        """
+        for ligne in lignes:
+            erreur = erreur_mouvement(ligne[1], ligne[2], ligne[4] if len(ligne) > 4 else None)
+            if erreur is not None:
+                raise ValueError(erreur)
+        utilisateur = str(utilisateur_id) if utilisateur_id else None
+        with self._verrou:
+            if self._journal is None:
+                raise RuntimeError("File d'ingestion non démarrée")
+            elements = []
+            for ligne in lignes:
+                produit, type_mouvement, quantite, motif = ligne[:4]
+                cle = (ligne[4] if len(ligne) > 4 else None) or str(uuid.uuid4())
+                self._numero += 1
+                mouvement = (str(produit), type_mouvement, quantite, motif, cle)
+                self._journal.write(json.dumps({'n': self._numero, 'm': mouvement, 'u': utilisateur}) + '\n')
+                elements.append((self._numero, mouvement, utilisateur, time.monotonic()))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            for element in elements:
+                self._file.put(element)
+            self.acquittes += len(elements)
+        return [element[0] for element in elements]
+
+    def attendre(self, timeout=30):
+        """Attendre que tous les mouvements acquittés soient validés. Retourne True si c'est le cas"""
+        limite = time.monotonic() + timeout
+        while self._valide < self._numero:
+            if time.monotonic() > limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def arreter(self, timeout=10):
+        """Appliquer les mouvements en attente puis arrêter le thread ; supprimer le journal vide"""
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._verrou:
+            if self._journal is not None:
+                if self._valide == self._numero:
+                    os.remove(self.chemin)  # verrou encore tenu : aucun terminal ne le reprend
+                self._journal.close()
+                self._journal = None
+
+    def statistiques(self):
+        """Métriques de la file : profondeur, compteurs et latences (ms)"""
+        latences = list(self._latences)
+        attentes = list(self._attentes)
+        return {
+            'profondeur': self._numero - self._valide,
+            'acquittes': self.acquittes,
+            'appliques': self.appliques,
+            'rejetes': self.rejetes,
+            'lots': self.lots,
+            'latence_commit_moyenne_ms': round(1000 * sum(latences) / len(latences), 1) if latences else 0,
+            'latence_commit_max_ms': round(1000 * max(latences), 1) if latences else 0,
+            'attente_max_ms': round(1000 * max(attentes), 1) if attentes else 0,
+        }
+
+    def _collecter(self):
+        """Attendre un premier mouvement puis regrouper jusqu'à taille_lot ou intervalle écoulé"""
+        try:
+            lot = [self._file.get(timeout=self.intervalle)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.intervalle
+        while len(lot) < self.taille_lot:
+            reste = limite - time.monotonic()
+            try:
+                lot.append(self._file.get(timeout=reste) if reste > 0 else self._file.get_nowait())
+            except queue.Empty:
+                break
+        return lot
+
+    def _boucle(self):
+        """Appliquer les lots ; un lot interrompu par une erreur transitoire est retenté tel quel"""
+        lot = []
+        while not (self._arret.is_set() and not lot and self._file.empty()):
+            if not lot:
+                lot = self._collecter()
+            if lot:
+                lot = self._appliquer(lot)
+                if lot:
+                    time.sleep(1)  # base indisponible : nouvel essai
+
+    def _appliquer(self, lot):
+        """
+        Appliquer un lot, une transaction par suite de mouvements d'un même utilisateur.
+        Une suite refusée par la base pour une erreur non transitoire est reprise mouvement
+        par mouvement ; un mouvement refusé seul est écarté dans le fichier de rejets.
+        Retourne les mouvements restant à appliquer après une erreur transitoire.
+        """
+        restants = list(lot)
+        groupes = [list(groupe) for _, groupe in groupby(lot, key=lambda element: element[2])]
+        while groupes:
+            groupe = groupes.pop(0)
+            utilisateur = groupe[0][2]
+            debut = time.monotonic()
+            try:
+                ids, erreurs = mouvements_en_lot(
+                    [element[1] for element in groupe], tout_ou_rien=False,
+                    utilisateur_id=uuid.UUID(utilisateur) if utilisateur else None, lever=True
+                )
+            except Exception as e:
+                if _transitoire(e):
+                    print(f"Erreur lors de l'application des mouvements (nouvel essai): {e}")
+                    return restants
+                if len(groupe) > 1:
+                    groupes[:0] = [[element] for element in groupe]
+                else:
+                    self._ecarter([(groupe[0], str(e))])
+                    self._valider(groupe[0][0])
+                    restants = restants[1:]
+                continue
+            fin = time.monotonic()
+
+            self._latences.append(fin - debut)
+            self._attentes.extend(fin - element[3] for element in groupe)
+            # Lignes refusées (produit inconnu, stock insuffisant...) : écartées avant la
+            # validation, qui les retire du journal
+            self._ecarter([(groupe[index], message) for index, message in erreurs])
+            self.lots += 1
+            self.appliques += len(groupe) - len(erreurs)
+            self._valider(groupe[-1][0])
+            restants = restants[len(groupe):]
+        return restants
+
+    def _ecarter(self, rejets):
+        """Ajouter des mouvements refusés [(élément, message)] au fichier de rejets (synchronisé)"""
+        if not rejets:
+            return
+        date = datetime.now().isoformat(timespec='seconds')
+        with open(self.chemin_rejets, 'a', encoding='utf-8') as fichier:
+            for (numero, mouvement, utilisateur, _), message in rejets:
+                fichier.write(json.dumps({'n': numero, 'm': mouvement, 'u': utilisateur,
+                                          'erreur': message, 'date': date}) + '\n')
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        for (_, mouvement, _, _), message in rejets:
+            self.rejets.append((mouvement, message))
+        self.rejetes += len(rejets)
+
+    def _valider(self, numero):
+        """Écrire le marqueur de validation ; vider le journal s'il ne reste rien à rejouer"""
+        with self._verrou:
+            if self._journal is None:
+                return  # file arrêtée : le lot sera rejoué au prochain démarrage
+            self._journal.write(json.dumps({'v': numero}) + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._valide = numero
+            self._compacter()
+
+    def _compacter(self):
+        """Tronquer le journal lorsque tous les mouvements sont validés (verrou tenu ou au démarrage)"""
+        if self._valide == self._numero:
+            self._journal.truncate(0)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+
+def demarrer_ingestion(terminal=TERMINAL, dossier=DOSSIER_JOURNAUX, intervalle=0.05, taille_lot=500,
+                       rejets=REJETS_DEFAUT):
+    """
+    Créer et démarrer la file d'ingestion du terminal ; les mouvements restés dans son journal
+    et dans les journaux orphelins du dossier sont rejoués. La file est vidée à la fin du processus.
+    """
+    orphelins = sorted(Path(dossier).glob('*.journal')) + [ANCIEN_JOURNAL]
+    file = FileIngestion(chemin_journal(terminal, dossier), intervalle, taille_lot, rejets, orphelins)
+    file.demarrer()
+    atexit.register(file.arreter)
+    return file
@@ -0,0 +1,143 @@
+"""
+Instantanés périodiques du stock et stock d'un produit à une date
+Le stock à une date part de l'instantané le plus proche et ne relit que les mouvements
+intermédiaires, quelle que soit la longueur de l'historique
+
+Utilisation en ligne de commande (tâche planifiée, par exemple chaque nuit) :
+    python python/instantane.py --periode jour
+"""
+
+import argparse
+import sys
+from datetime import datetime, time
+
+from sqlalchemy import select, func, case
+from sqlalchemy.dialects.postgresql import insert
+from connexion import get_session
+from models import Produit, MouvementStock, StockInstantane, LimiteArchives
+
+PERIODES = ('jour', 'mois')
+_UNITES = {'jour': 'day', 'mois': 'month'}
+
+
+def _variation():
+    """Somme signée des quantités des mouvements (entrées positives, sorties négatives)"""
+    return func.coalesce(func.sum(case(
+        (MouvementStock.type_mouvement == 'ENTREE', MouvementStock.quantite),
+        else_=-MouvementStock.quantite
+    )), 0)
+
+
+def prendre_instantanes(periode='jour'):
+    """
+    Enregistrer le stock de chaque produit au début de la période courante ('jour' ou 'mois').
+    Le stock est calculé en retranchant du stock courant les mouvements datés depuis ce début,
+    l'instantané peut donc être pris à tout moment de la période. Sans effet pour les
+    produits déjà photographiés. Retourne le nombre d'instantanés créés.
+    """
+    if periode not in PERIODES:
+        print(f"Période invalide: {periode}")
+        return None
+
+    session = get_session()
+    try:
+        debut = func.date_trunc(_UNITES[periode], func.localtimestamp())
+        depuis = (
+            select(MouvementStock.produit_id, _variation().label('delta'))
+            .where(MouvementStock.date_mouvement >= debut)
+            .group_by(MouvementStock.produit_id)
+            .subquery()
+        )
+        requete = (
+            insert(StockInstantane)
+            .from_select(
+                ['produit_id', 'date_instantane', 'quantite'],
+                select(Produit.id, debut, Produit.quantite_stock - func.coalesce(depuis.c.delta, 0))
+                .outerjoin(depuis, depuis.c.produit_id == Produit.id)
+            )
+            .on_conflict_do_nothing()
+        )
+        nb = session.execute(requete).rowcount
+        session.commit()
+        return nb
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors de la prise des instantanés: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def stock_a_date(produit_id, date):
+    """
+    Stock d'un produit à une date (avant les mouvements datés de cet instant ou après).
+    Part de l'instantané antérieur le plus récent et rejoue les mouvements suivants,
+    ou à défaut de l'instantané postérieur le plus proche en retranchant les mouvements
+    précédents, ou à défaut du stock courant.
+    Les mouvements antérieurs à la limite d'archivage (limite_archives) ne sont plus dans
+    mouvements_stock : les dates antérieures sont refusées et les instantanés antérieurs
+    ignorés. Retourne None si le produit n'existe pas ou si la date est refusée.
+    """
+    session = get_session(lecture=True)
+    try:
+        limite = session.execute(select(LimiteArchives.avant)).scalar()
+        if limite is not None and date < datetime.combine(limite, time.min):
+            print(f"Mouvements antérieurs au {limite:%d/%m/%Y} archivés : stock à cette date indisponible")
+            return None
+
+        conditions = [StockInstantane.produit_id == produit_id, StockInstantane.date_instantane <= date]
+        if limite is not None:
+            conditions.append(StockInstantane.date_instantane >= limite)
+        avant = session.execute(
+            select(StockInstantane.date_instantane, StockInstantane.quantite)
+            .where(*conditions)
+            .order_by(StockInstantane.date_instantane.desc())
+            .limit(1)
+        ).first()
+        if avant is not None:
+            return avant.quantite + session.execute(
+                select(_variation()).where(
+                    MouvementStock.produit_id == produit_id,
+                    MouvementStock.date_mouvement >= avant.date_instantane,
+                    MouvementStock.date_mouvement < date
+                )
+            ).scalar()
+
+        apres = session.execute(
+            select(StockInstantane.date_instantane, StockInstantane.quantite)
+            .where(StockInstantane.produit_id == produit_id, StockInstantane.date_instantane > date)
+            .order_by(StockInstantane.date_instantane)
+            .limit(1)
+        ).first()
+        if apres is not None:
+            return apres.quantite - session.execute(
+                select(_variation()).where(
+                    MouvementStock.produit_id == produit_id,
+                    MouvementStock.date_mouvement >= date,
+                    MouvementStock.date_mouvement < apres.date_instantane
+                )
+            ).scalar()
+
+        # Aucun instantané : stock courant moins les mouvements depuis la date, en une requête
+        depuis = (
+            select(_variation())
+            .where(MouvementStock.produit_id == produit_id, MouvementStock.date_mouvement >= date)
+            .scalar_subquery()
+        )
+        return session.execute(
+            select(Produit.quantite_stock - depuis).where(Produit.id == produit_id)
+        ).scalar()
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Instantanés périodiques du stock")
+    parser.add_argument('--periode', choices=PERIODES, default='jour',
+                        help="début de période photographié (défaut: jour)")
+    args = parser.parse_args()
+
+    nb = prendre_instantanes(args.periode)
+    if nb is None:
+        sys.exit(1)
+    print(f"{nb} instantané(s) créé(s)")
@@ -5,25 +5,37 @@ Menu interactif en console
 
 import os
 import sys
-from tabulate import tabulate
-
-# Import des modules CRUD
-from connexion import test_connexion
-from categorie import (creer_categorie, lire_categories, lire_categorie, 
-                       modifier_categorie, supprimer_categorie)
-from fournisseur import (creer_fournisseur, lire_fournisseurs, lire_fournisseur,
-                         modifier_fournisseur, supprimer_fournisseur)
-from produit import (creer_produit, lire_produits, lire_produit, modifier_produit,
-                     supprimer_produit, rechercher_produits, produits_en_alerte,
-                     produits_par_categorie)
-from mouvement import (entree_stock, sortie_stock, lire_mouvements, historique_produit)
-from utilisateur import (authentifier, creer_utilisateur, lire_utilisateurs,
-                         modifier_mot_de_passe, desactiver_utilisateur, compter_utilisateurs, admin_existe)
+import threading
+import uuid
+from datetime import datetime, date, timedelta
+
+# Les modules CRUD (et avec eux l'ORM), NumPy et tabulate sont importés dans les fonctions
+# qui les utilisent : l'écran de connexion s'affiche sans les charger
+from connexion import test_connexion, statistiques_pool, statistiques_replique
 
 
 # Variable globale pour l'utilisateur connecté
 utilisateur_connecte = None
 
+# File d'ingestion des mouvements saisis en rafale (démarrée dans main)
+file_ingestion = None
+
+# Tâches de démarrage exécutées pendant l'écran de connexion (voir main)
+demarrage = None
+avertissements_demarrage = []
+
+# Nombre de produits affichés par page
+TAILLE_PAGE = 20
+
+# Nombre maximum de résultats de recherche
+LIMITE_RECHERCHE = 50
+
+
+def tabulate(*args, **kwargs):
+    """tabulate.tabulate, importé au premier tableau affiché"""
+    from tabulate import tabulate as _tabulate
+    return _tabulate(*args, **kwargs)
+
 
 def clear_screen():
     """Effacer l'écran"""
@@ -66,18 +78,27 @@ def saisie_float(message, defaut=None):
             print("Veuillez entrer un nombre valide.")
 
 
-def selectionner_element(liste, message="Votre choix"):
+def selectionner_element(liste, message="Votre choix", suivante=False, precedente=False):
     """
     Sélectionner un élément par son numéro dans une liste.
     Retourne l'UUID (premier élément du tuple) ou None.
+    Si `suivante` / `precedente` sont actifs, retourne 's' / 'p' pour changer de page.
     """
     if not liste:
         return None
     
+    options = ""
+    if suivante:
+        options += ", s=suivante"
+    if precedente:
+        options += ", p=précédente"
+    
     while True:
-        choix = input(f"\n{message} (1-{len(liste)}, 0=annuler): ")
+        choix = input(f"\n{message} (1-{len(liste)}, 0=annuler{options}): ")
         if choix == "0" or choix == "":
             return None
+        if (choix == "s" and suivante) or (choix == "p" and precedente):
+            return choix
         try:
             index = int(choix) - 1
             if 0 <= index < len(liste):
@@ -93,6 +114,10 @@ def selectionner_element(liste, message="Votre choix"):
 
 def menu_principal():
     """Menu principal de l'application"""
+    from produit import compter_produits_en_alerte
+    # Compté à la connexion puis au retour des menus qui modifient stocks et seuils,
+    # et non à chaque affichage du menu
+    nb_alertes = compter_produits_en_alerte()
     while True:
         clear_screen()
         afficher_titre("GESTION DE STOCK - Menu Principal")
@@ -101,9 +126,10 @@ def menu_principal():
         print("2. Gestion des Catégories")
         print("3. Gestion des Fournisseurs")
         print("4. Mouvements de Stock")
-        print("5. Alertes Stock")
+        print(f"5. Alertes Stock ({nb_alertes})")
+        print("6. Rapports")
         if utilisateur_connecte[2] == 'admin':
-            print("6. Gestion des Utilisateurs")
+            print("7. Gestion des Utilisateurs")
         print("0. Déconnexion")
         
         choix = input("\nVotre choix: ")
@@ -118,11 +144,16 @@ def menu_principal():
             menu_mouvements()
         elif choix == "5":
             afficher_alertes_stock()
-        elif choix == "6" and utilisateur_connecte[2] == 'admin':
+        elif choix == "6":
+            menu_rapports()
+        elif choix == "7" and utilisateur_connecte[2] == 'admin':
             menu_utilisateurs()
         elif choix == "0":
             print("\nDéconnexion...")
             return
+        
+        if choix in ("1", "4", "5"):
+            nb_alertes = compter_produits_en_alerte()
 
 
 # ============================================
@@ -140,6 +171,9 @@ def menu_produits():
         print("4. Modifier un produit")
         print("5. Supprimer un produit")
         print("6. Voir détails d'un produit")
+        print("7. Importer un catalogue CSV")
+        print("8. Exporter les produits (CSV)")
+        print("9. Modifications en masse")
         print("0. Retour")
         
         choix = input("\nVotre choix: ")
@@ -156,6 +190,12 @@ def menu_produits():
             supprimer_produit_menu()
         elif choix == "6":
             voir_produit()
+        elif choix == "7":
+            importer_catalogue_menu()
+        elif choix == "8":
+            exporter_produits_menu()
+        elif choix == "9":
+            modifier_en_masse_menu()
         elif choix == "0":
             return
 
@@ -178,29 +218,80 @@ def afficher_produits_tableau(produits, avec_numero=True):
     print(tabulate(data, headers=headers, tablefmt="grid"))
 
 
+def afficher_produits_stock(produits):
+    """Affiche les produits avec leur stock actuel"""
+    print("\nProduits disponibles:")
+    headers = ["#", "Réf.", "Nom", "Stock actuel"]
+    data = [[i+1, p[1], p[2], p[4]] for i, p in enumerate(produits)]
+    print(tabulate(data, headers=headers, tablefmt="simple"))
+
+
+def parcourir_produits(message=None, affichage=afficher_produits_tableau):
+    """
+    Parcourir les produits page par page (pagination par curseur sur nom, id).
+    Avec `message`, permet de sélectionner un produit et retourne son UUID.
+    Sans `message`, affiche seulement les pages. Retourne None si annulé.
+    """
+    from produit import lire_produits_page
+    curseurs = [None]
+    while True:
+        produits = lire_produits_page(curseurs[-1], TAILLE_PAGE + 1)
+        suivante = len(produits) > TAILLE_PAGE
+        produits = produits[:TAILLE_PAGE]
+        
+        if not produits:
+            print("\nAucun produit trouvé.")
+            pause()
+            return None
+        
+        affichage(produits)
+        print(f"\nPage {len(curseurs)}")
+        
+        if message:
+            choix = selectionner_element(produits, message, suivante, len(curseurs) > 1)
+        else:
+            options = "s=suivante, " if suivante else ""
+            options += "p=précédente, " if len(curseurs) > 1 else ""
+            choix = input(f"\n({options}Entrée=retour): ")
+            if not ((choix == "s" and suivante) or (choix == "p" and len(curseurs) > 1)):
+                return None
+        
+        if choix == "s":
+            dernier = produits[-1]
+            curseurs.append((dernier[2], dernier[0]))
+        elif choix == "p":
+            curseurs.pop()
+        else:
+            return choix
+
+
 def lister_produits():
     """Afficher la liste des produits"""
     clear_screen()
     afficher_titre("Liste des Produits")
-    produits = lire_produits()
-    afficher_produits_tableau(produits)
-    pause()
+    parcourir_produits()
 
 
 def rechercher_produit_menu():
     """Rechercher des produits"""
+    from produit import rechercher_produits
     clear_screen()
     afficher_titre("Rechercher un Produit")
-    terme = input("\nTerme de recherche (nom ou référence): ")
+    terme = input("\nTerme de recherche (nom, référence ou description): ")
     
     if terme:
-        produits = rechercher_produits(terme)
+        produits = rechercher_produits(terme, LIMITE_RECHERCHE)
         afficher_produits_tableau(produits)
+        if len(produits) == LIMITE_RECHERCHE:
+            print(f"\n{LIMITE_RECHERCHE} résultats les plus pertinents affichés, affinez la recherche.")
     pause()
 
 
 def ajouter_produit():
     """Ajouter un nouveau produit"""
+    from categorie import lire_categories
+    from fournisseur import lire_fournisseurs
+    from produit import creer_produit
     clear_screen()
     afficher_titre("Ajouter un Produit")
     
@@ -229,7 +320,9 @@ def ajouter_produit():
     cat_id = selectionner_element(categories, "N° Catégorie") if categories else None
     four_id = selectionner_element(fournisseurs, "N° Fournisseur") if fournisseurs else None
     
-    produit_id = creer_produit(reference, nom, prix, description, quantite, seuil, cat_id, four_id)
+    # Le stock initial est enregistré comme entrée dans la même transaction que le produit
+    produit_id = creer_produit(reference, nom, prix, description, quantite, seuil, cat_id, four_id,
+                               utilisateur_connecte[0])
     
     if produit_id:
         print(f"\n✓ Produit créé avec succès")
@@ -240,17 +333,11 @@ def ajouter_produit():
 
 def modifier_produit_menu():
     """Modifier un produit existant"""
+    from produit import lire_produit, modifier_produit
     clear_screen()
     afficher_titre("Modifier un Produit")
     
-    produits = lire_produits()
-    if not produits:
-        print("\nAucun produit à modifier.")
-        pause()
-        return
-    
-    afficher_produits_tableau(produits)
-    produit_id = selectionner_element(produits, "N° du produit à modifier")
+    produit_id = parcourir_produits("N° du produit à modifier")
     
     if not produit_id:
         return
@@ -286,19 +373,60 @@ def modifier_produit_menu():
     pause()
 
 
-def supprimer_produit_menu():
-    """Supprimer un produit"""
+def modifier_en_masse_menu():
+    """Modifier le prix ou le seuil d'alerte d'un ensemble de produits"""
+    from categorie import lire_categories
+    from fournisseur import lire_fournisseurs
+    from produit import modifier_prix_en_masse, modifier_seuil_en_masse
     clear_screen()
-    afficher_titre("Supprimer un Produit")
+    afficher_titre("Modifications en Masse")
+    
+    print("\n1. Variation de prix (%)")
+    print("2. Seuil d'alerte")
+    operation = input("\nVotre choix: ")
+    if operation == "1":
+        valeur = saisie_float("Variation en % (ex: 5 ou -10): ")
+        modifier = modifier_prix_en_masse
+    elif operation == "2":
+        valeur = saisie_int("Nouveau seuil d'alerte: ")
+        modifier = modifier_seuil_en_masse
+    else:
+        return
     
-    produits = lire_produits()
-    if not produits:
-        print("\nAucun produit à supprimer.")
+    print("\n--- Filtres (laisser vide / 0 pour ne pas filtrer) ---")
+    categories = lire_categories()
+    afficher_categories_tableau(categories)
+    cat_id = selectionner_element(categories, "N° Catégorie")
+    fournisseurs = lire_fournisseurs()
+    afficher_fournisseurs_tableau(fournisseurs)
+    four_id = selectionner_element(fournisseurs, "N° Fournisseur")
+    terme = input("\nNom ou référence contenant: ") or None
+    
+    nombre = modifier(valeur, cat_id, four_id, terme, simulation=True)
+    if not nombre:
+        print("\nAucun produit concerné.")
         pause()
         return
     
-    afficher_produits_tableau(produits)
-    produit_id = selectionner_element(produits, "N° du produit à supprimer")
+    confirm = input(f"\n{nombre} produit(s) concerné(s). Confirmer? (oui/non): ")
+    if confirm.lower() == 'oui':
+        nombre = modifier(valeur, cat_id, four_id, terme)
+        if nombre is not None:
+            print(f"\n✓ {nombre} produit(s) modifié(s)")
+        else:
+            print("\n✗ Erreur lors de la modification")
+    else:
+        print("\nModification annulée")
+    pause()
+
+
+def supprimer_produit_menu():
+    """Supprimer un produit"""
+    from produit import lire_produit, supprimer_produit
+    clear_screen()
+    afficher_titre("Supprimer un Produit")
+    
+    produit_id = parcourir_produits("N° du produit à supprimer")
     
     if not produit_id:
         return
@@ -319,17 +447,11 @@ def supprimer_produit_menu():
 
 def voir_produit():
     """Voir les détails d'un produit"""
+    from produit import lire_produit
     clear_screen()
     afficher_titre("Détails du Produit")
     
-    produits = lire_produits()
-    if not produits:
-        print("\nAucun produit.")
-        pause()
-        return
-    
-    afficher_produits_tableau(produits)
-    produit_id = selectionner_element(produits, "N° du produit à afficher")
+    produit_id = parcourir_produits("N° du produit à afficher")
     
     if not produit_id:
         return
@@ -347,15 +469,85 @@ def voir_produit():
         print(f"Fournisseur:  {produit[8] or '-'}")
         print(f"{'='*40}")
         
-        # Afficher l'historique des mouvements
+        parcourir_historique(produit_id)
+        return
+    pause()
+
+
+def parcourir_historique(produit_id):
+    """Afficher l'historique d'un produit page par page, des plus récents aux plus anciens"""
+    from mouvement import historique_produit_page
+    curseurs = [None]
+    while True:
+        mouvements = historique_produit_page(produit_id, curseurs[-1], TAILLE_PAGE + 1)
+        precedents = len(mouvements) > TAILLE_PAGE
+        mouvements = mouvements[:TAILLE_PAGE]
+        
         print("\nHistorique des mouvements:")
-        mouvements = historique_produit(produit_id)
-        if mouvements:
-            headers = ["Type", "Qté", "Motif", "Date"]
-            data = [[m[1], m[2], m[3] or "-", str(m[4])[:19]] for m in mouvements]
-            print(tabulate(data, headers=headers, tablefmt="simple"))
-        else:
+        if not mouvements:
             print("Aucun mouvement enregistré.")
+            pause()
+            return
+        
+        headers = ["Type", "Qté", "Motif", "Date"]
+        data = [[m[1], m[2], m[3] or "-", str(m[4])[:19]] for m in mouvements]
+        print(tabulate(data, headers=headers, tablefmt="simple"))
+        print(f"\nPage {len(curseurs)}")
+        
+        options = "a=plus anciens, " if precedents else ""
+        options += "r=plus récents, " if len(curseurs) > 1 else ""
+        choix = input(f"\n({options}Entrée=retour): ")
+        
+        if choix == "a" and precedents:
+            dernier = mouvements[-1]
+            curseurs.append((dernier[4], dernier[0]))
+        elif choix == "r" and len(curseurs) > 1:
+            curseurs.pop()
+        else:
+            return
+
+
+def importer_catalogue_menu():
+    """Importer un catalogue de produits depuis un fichier CSV"""
+    from importation import importer_produits_csv, COLONNES_CSV
+    clear_screen()
+    afficher_titre("Importer un Catalogue CSV")
+    
+    print(f"\nColonnes attendues (avec en-tête): {', '.join(COLONNES_CSV)}")
+    print("Catégorie et fournisseur sont indiqués par leur nom.")
+    chemin = input("\nChemin du fichier: ")
+    if not chemin:
+        return
+    if not os.path.isfile(chemin):
+        print("\n✗ Fichier introuvable")
+        pause()
+        return
+    separateur = input("Séparateur [,]: ") or ","
+    
+    resultat = importer_produits_csv(chemin, separateur, utilisateur_connecte[0])
+    
+    if resultat:
+        inseres, mis_a_jour, rejetes = resultat
+        print(f"\n✓ Import terminé: {inseres} créé(s), {mis_a_jour} mis à jour, {rejetes} rejeté(s)")
+    else:
+        print("\n✗ Erreur lors de l'import")
+    pause()
+
+
+def exporter_produits_menu():
+    """Exporter les produits dans un fichier CSV"""
+    from exportation import exporter_produits
+    clear_screen()
+    afficher_titre("Exporter les Produits")
+    
+    chemin = input("\nFichier de sortie (.csv ou .csv.gz): ")
+    if not chemin:
+        return
+    
+    if exporter_produits(chemin, chemin.endswith('.gz')):
+        print(f"\n✓ Produits exportés dans {chemin}")
+    else:
+        print("\n✗ Erreur lors de l'export")
     pause()
 
 
@@ -404,6 +596,7 @@ def afficher_categories_tableau(categories):
 
 def lister_categories_menu():
     """Afficher la liste des catégories"""
+    from categorie import lire_categories
     clear_screen()
     afficher_titre("Liste des Catégories")
     categories = lire_categories()
@@ -413,6 +606,7 @@ def lister_categories_menu():
 
 def ajouter_categorie():
     """Ajouter une nouvelle catégorie"""
+    from categorie import creer_categorie
     clear_screen()
     afficher_titre("Ajouter une Catégorie")
     
@@ -430,6 +624,7 @@ def ajouter_categorie():
 
 def modifier_categorie_menu():
     """Modifier une catégorie"""
+    from categorie import lire_categories, lire_categorie, modifier_categorie
     clear_screen()
     afficher_titre("Modifier une Catégorie")
     
@@ -459,6 +654,7 @@ def modifier_categorie_menu():
 
 def supprimer_categorie_menu():
     """Supprimer une catégorie"""
+    from categorie import lire_categories, lire_categorie, supprimer_categorie
     clear_screen()
     afficher_titre("Supprimer une Catégorie")
     
@@ -488,6 +684,8 @@ def supprimer_categorie_menu():
 
 def voir_produits_categorie():
     """Voir les produits d'une catégorie"""
+    from categorie import lire_categories
+    from produit import produits_par_categorie
     clear_screen()
     afficher_titre("Produits par Catégorie")
     
@@ -556,6 +754,7 @@ def afficher_fournisseurs_tableau(fournisseurs):
 
 def lister_fournisseurs_menu():
     """Afficher la liste des fournisseurs"""
+    from fournisseur import lire_fournisseurs
     clear_screen()
     afficher_titre("Liste des Fournisseurs")
     fournisseurs = lire_fournisseurs()
@@ -565,6 +764,7 @@ def lister_fournisseurs_menu():
 
 def ajouter_fournisseur():
     """Ajouter un nouveau fournisseur"""
+    from fournisseur import creer_fournisseur
     clear_screen()
     afficher_titre("Ajouter un Fournisseur")
     
@@ -584,6 +784,7 @@ def ajouter_fournisseur():
 
 def modifier_fournisseur_menu():
     """Modifier un fournisseur"""
+    from fournisseur import lire_fournisseurs, lire_fournisseur, modifier_fournisseur
     clear_screen()
     afficher_titre("Modifier un Fournisseur")
     
@@ -615,6 +816,7 @@ def modifier_fournisseur_menu():
 
 def supprimer_fournisseur_menu():
     """Supprimer un fournisseur"""
+    from fournisseur import lire_fournisseurs, lire_fournisseur, supprimer_fournisseur
     clear_screen()
     afficher_titre("Supprimer un Fournisseur")
     
@@ -654,6 +856,9 @@ def menu_mouvements():
         print("\n1. Entrée de stock")
         print("2. Sortie de stock")
         print("3. Historique des mouvements")
+        print("4. Exporter les mouvements (CSV)")
+        print("5. Stock d'un produit à une date")
+        print("6. Réception par scanner")
         print("0. Retour")
         
         choix = input("\nVotre choix: ")
@@ -664,34 +869,43 @@ def menu_mouvements():
             faire_sortie_stock()
         elif choix == "3":
             voir_historique()
+        elif choix == "4":
+            exporter_mouvements_menu()
+        elif choix == "5":
+            voir_stock_a_date()
+        elif choix == "6":
+            reception_scanner()
         elif choix == "0":
             return
 
 
+def appliquer_avec_reprise(mouvement, produit_id, quantite, motif):
+    """
+    Appliquer un mouvement (entree_stock ou sortie_stock) en proposant de réessayer en cas
+    d'échec. La clé d'idempotence est conservée entre les essais : un mouvement enregistré
+    dont la réponse a été perdue n'est pas appliqué une seconde fois.
+    """
+    cle = str(uuid.uuid4())
+    while True:
+        mouv_id = mouvement(produit_id, quantite, motif, utilisateur_connecte[0], cle)
+        if mouv_id or input("\nRéessayer? (oui/non): ").lower() != 'oui':
+            return mouv_id
+
+
 def faire_entree_stock():
     """Enregistrer une entrée de stock"""
+    from mouvement import entree_stock
     clear_screen()
     afficher_titre("Entrée de Stock")
     
-    produits = lire_produits()
-    if not produits:
-        print("\nAucun produit.")
-        pause()
-        return
-    
-    print("\nProduits disponibles:")
-    headers = ["#", "Réf.", "Nom", "Stock actuel"]
-    data = [[i+1, p[1], p[2], p[4]] for i, p in enumerate(produits)]
-    print(tabulate(data, headers=headers, tablefmt="simple"))
-    
-    produit_id = selectionner_element(produits, "N° du produit")
+    produit_id = parcourir_produits("N° du produit", afficher_produits_stock)
     if not produit_id:
         return
     
     quantite = saisie_int("Quantité à ajouter: ")
     motif = input("Motif (optionnel): ") or None
     
-    mouv_id = entree_stock(produit_id, quantite, motif)
+    mouv_id = appliquer_avec_reprise(entree_stock, produit_id, quantite, motif)
     
     if mouv_id:
         print(f"\n✓ Entrée de stock enregistrée")
@@ -702,28 +916,18 @@ def faire_entree_stock():
 
 def faire_sortie_stock():
     """Enregistrer une sortie de stock"""
+    from mouvement import sortie_stock
     clear_screen()
     afficher_titre("Sortie de Stock")
     
-    produits = lire_produits()
-    if not produits:
-        print("\nAucun produit.")
-        pause()
-        return
-    
-    print("\nProduits disponibles:")
-    headers = ["#", "Réf.", "Nom", "Stock actuel"]
-    data = [[i+1, p[1], p[2], p[4]] for i, p in enumerate(produits)]
-    print(tabulate(data, headers=headers, tablefmt="simple"))
-    
-    produit_id = selectionner_element(produits, "N° du produit")
+    produit_id = parcourir_produits("N° du produit", afficher_produits_stock)
     if not produit_id:
         return
     
     quantite = saisie_int("Quantité à retirer: ")
     motif = input("Motif (optionnel): ") or None
     
-    mouv_id = sortie_stock(produit_id, quantite, motif)
+    mouv_id = appliquer_avec_reprise(sortie_stock, produit_id, quantite, motif)
     
     if mouv_id:
         print(f"\n✓ Sortie de stock enregistrée")
@@ -733,18 +937,136 @@ def faire_sortie_stock():
 
 
 def voir_historique():
-    """Voir l'historique des mouvements"""
+    """Voir l'historique des mouvements, page par page des plus récents aux plus anciens"""
+    from mouvement import lire_mouvements
     clear_screen()
     afficher_titre("Historique des Mouvements")
     
-    mouvements = lire_mouvements(50)
+    print("\nFiltres (Entrée pour ignorer)")
+    type_mouvement = {"e": "ENTREE", "s": "SORTIE"}.get(input("Type (e=entrées, s=sorties): ").lower())
+    mes_mouvements = input("Uniquement mes mouvements? (oui/non): ").lower() == 'oui'
+    utilisateur_id = utilisateur_connecte[0] if mes_mouvements else None
     
-    if mouvements:
-        headers = ["Réf.", "Produit", "Type", "Qté", "Motif", "Date"]
-        data = [[m[1], m[2], m[3], m[4], m[5] or "-", str(m[6])[:19]] for m in mouvements]
+    curseurs = [None]
+    while True:
+        mouvements = lire_mouvements(TAILLE_PAGE + 1, curseurs[-1], type_mouvement=type_mouvement,
+                                     utilisateur_id=utilisateur_id)
+        precedents = len(mouvements) > TAILLE_PAGE
+        mouvements = mouvements[:TAILLE_PAGE]
+        
+        if not mouvements:
+            print("\nAucun mouvement enregistré.")
+            pause()
+            return
+        
+        clear_screen()
+        afficher_titre("Historique des Mouvements")
+        headers = ["Réf.", "Produit", "Type", "Qté", "Motif", "Date", "Utilisateur"]
+        data = [[m[1], m[2], m[3], m[4], m[5] or "-", str(m[6])[:19], m[7] or "-"]
+                for m in mouvements]
         print(tabulate(data, headers=headers, tablefmt="grid"))
+        print(f"\nPage {len(curseurs)}")
+        
+        options = "a=plus anciens, " if precedents else ""
+        options += "r=plus récents, " if len(curseurs) > 1 else ""
+        choix = input(f"\n({options}Entrée=retour): ")
+        
+        if choix == "a" and precedents:
+            dernier = mouvements[-1]
+            curseurs.append((dernier[6], dernier[0]))
+        elif choix == "r" and len(curseurs) > 1:
+            curseurs.pop()
+        else:
+            return
+
+
+def reception_scanner():
+    """Saisie en rafale d'entrées de stock (douchette), appliquées par lots en arrière-plan"""
+    clear_screen()
+    afficher_titre("Réception par Scanner")
+    
+    if file_ingestion is None:
+        print("\n✗ File d'ingestion indisponible")
+        pause()
+        return
+    
+    print("\nScannez les références (RÉF ou RÉF*QTÉ), ligne vide pour terminer")
+    rejetes_avant = file_ingestion.rejetes
+    nb = 0
+    while True:
+        saisie = input("> ").strip()
+        if not saisie:
+            break
+        reference, _, quantite = saisie.partition('*')
+        try:
+            quantite = int(quantite) if quantite else 1
+        except ValueError:
+            print("✗ Quantité invalide")
+            continue
+        try:
+            file_ingestion.ajouter(reference, 'ENTREE', quantite, "Réception scanner", utilisateur_connecte[0])
+        except ValueError as e:
+            print(f"✗ {e}")
+            continue
+        nb += 1
+    
+    if not nb:
+        return
+    if not file_ingestion.attendre():
+        print("\n⚠️  Base indisponible : les entrées seront appliquées dès son retour")
+    
+    rejetes = file_ingestion.rejetes - rejetes_avant
+    print(f"\n✓ {nb - rejetes} entrée(s) enregistrée(s)")
+    if rejetes:
+        print(f"✗ {rejetes} entrée(s) rejetée(s):")
+        for mouvement, message in list(file_ingestion.rejets)[-rejetes:]:
+            print(f"  {mouvement[0]}: {message}")
+    pause()
+
+
+def exporter_mouvements_menu():
+    """Exporter les mouvements de stock dans un fichier CSV"""
+    from exportation import exporter_mouvements
+    clear_screen()
+    afficher_titre("Exporter les Mouvements")
+    
+    chemin = input("\nFichier de sortie (.csv ou .csv.gz): ")
+    if not chemin:
+        return
+    debut = input("Date de début, incluse (AAAA-MM-JJ, optionnel): ") or None
+    fin = input("Date de fin, exclue (AAAA-MM-JJ, optionnel): ") or None
+    
+    if exporter_mouvements(chemin, debut, fin, chemin.endswith('.gz')):
+        print(f"\n✓ Mouvements exportés dans {chemin}")
+    else:
+        print("\n✗ Erreur lors de l'export")
+    pause()
+
+
+def voir_stock_a_date():
+    """Afficher le stock d'un produit à une date passée"""
+    from instantane import stock_a_date
+    clear_screen()
+    afficher_titre("Stock à une Date")
+    
+    produit_id = parcourir_produits("N° du produit", afficher_produits_stock)
+    if not produit_id:
+        return
+    
+    saisie = input("Date (AAAA-MM-JJ, début de journée): ")
+    try:
+        date = datetime.strptime(saisie, "%Y-%m-%d")
+    except ValueError:
+        print("\n✗ Date invalide")
+        pause()
+        return
+    
+    stock = stock_a_date(produit_id, date)
+    
+    if stock is not None:
+        print(f"\nStock au {date:%d/%m/%Y}: {stock}")
     else:
-        print("\nAucun mouvement enregistré.")
+        print("\n✗ Stock à cette date indisponible")
     pause()
 
 
@@ -754,6 +1076,7 @@ def voir_historique():
 
 def afficher_alertes_stock():
     """Afficher les produits en alerte de stock"""
+    from produit import produits_en_alerte
     clear_screen()
     afficher_titre("⚠️  ALERTES STOCK")
     
@@ -769,6 +1092,153 @@ def afficher_alertes_stock():
     pause()
 
 
+# ============================================
+# RAPPORTS
+# ============================================
+
+def menu_rapports():
+    """Menu des rapports de valorisation du stock (lus dans les vues matérialisées)"""
+    from rapport import (valeur_stock_par_categorie, valeur_stock_par_fournisseur,
+                         rafraichir_rapports, date_rafraichissement_rapports)
+    while True:
+        clear_screen()
+        afficher_titre("Rapports")
+        print("\n1. Valeur du stock par catégorie")
+        print("2. Valeur du stock par fournisseur")
+        print("3. Rafraîchir les vues matérialisées")
+        print("4. Prévision de consommation et seuils suggérés")
+        print("5. Volumes d'entrées et de sorties")
+        print("0. Retour")
+        
+        choix = input("\nVotre choix: ")
+        
+        if choix == "1":
+            afficher_rapport_stock("Valeur du Stock par Catégorie", "Catégorie",
+                                   valeur_stock_par_categorie(depuis_vue=True),
+                                   date_rafraichissement_rapports())
+        elif choix == "2":
+            afficher_rapport_stock("Valeur du Stock par Fournisseur", "Fournisseur",
+                                   valeur_stock_par_fournisseur(depuis_vue=True),
+                                   date_rafraichissement_rapports())
+        elif choix == "3":
+            if rafraichir_rapports():
+                print("\n✓ Vues matérialisées rafraîchies")
+            else:
+                print("\n✗ Erreur lors du rafraîchissement")
+            pause()
+        elif choix == "4":
+            previsions_menu()
+        elif choix == "5":
+            volumes_menu()
+        elif choix == "0":
+            return
+
+
+def afficher_rapport_stock(titre, libelle, lignes, rafraichi_le=None):
+    """
+    Afficher un rapport de valorisation suivi du total général, calculé sur les mêmes lignes.
+    `rafraichi_le` : date des données lues dans une vue matérialisée.
+    """
+    clear_screen()
+    afficher_titre(titre)
+    
+    if rafraichi_le:
+        print(f"\nDonnées au {rafraichi_le.strftime('%d/%m/%Y %H:%M')} (menu 3 pour rafraîchir)")
+    if lignes:
+        headers = [libelle, "Produits", "Quantité", "Valeur"]
+        data = [[l[0], l[1], l[2], f"{l[3]}€"] for l in lignes]
+        print(tabulate(data, headers=headers, tablefmt="grid"))
+        nb_produits = sum(l[1] for l in lignes)
+        quantite = sum(l[2] for l in lignes)
+        valeur = sum(l[3] for l in lignes)
+        print(f"\nTotal: {nb_produits} produit(s), {quantite} unité(s), {valeur}€")
+    else:
+        print("\nAucun produit.")
+    pause()
+
+
+def volumes_menu():
+    """Afficher les volumes journaliers d'entrées et de sorties et les produits les plus sortis"""
+    from mouvement import volumes_journaliers, volumes_par_produit
+    clear_screen()
+    afficher_titre("Volumes d'Entrées et de Sorties")
+    
+    jours = saisie_int("\nNombre de jours (défaut: 30): ", 30)
+    if jours <= 0:
+        print("\n✗ Le nombre de jours doit être positif")
+        pause()
+        return
+    fin = date.today() + timedelta(days=1)
+    debut = fin - timedelta(days=jours)
+    
+    volumes = volumes_journaliers(debut, fin)
+    if not volumes:
+        print("\nAucun mouvement sur la période.")
+        pause()
+        return
+    
+    headers = ["Jour", "Entrées", "Sorties", "Mouvements"]
+    data = [[v[0].strftime("%d/%m/%Y"), v[1], v[2], v[3]] for v in volumes]
+    print(tabulate(data, headers=headers, tablefmt="grid"))
+    print(f"\nTotal: {sum(v[1] for v in volumes)} entrée(s), {sum(v[2] for v in volumes)} sortie(s)")
+    
+    print("\nProduits les plus sortis:")
+    headers = ["Réf.", "Nom", "Entrées", "Sorties", "Mouvements"]
+    data = [[p[1], p[2], p[3], p[4], p[5]] for p in volumes_par_produit(debut, fin, 10)]
+    print(tabulate(data, headers=headers, tablefmt="grid"))
+    pause()
+
+
+def previsions_menu():
+    """Afficher les seuils d'alerte suggérés par la prévision de consommation"""
+    import numpy as np
+    from prevision import calculer_previsions, appliquer_seuils
+    clear_screen()
+    afficher_titre("Prévision de Consommation")
+    
+    delai = saisie_int("\nDélai de réapprovisionnement en jours (défaut: 7): ", 7)
+    niveau = saisie_float("Niveau de service (défaut: 0.95): ", 0.95)
+    if delai < 0:
+        print("\n✗ Le délai de réapprovisionnement doit être positif")
+        pause()
+        return
+    if not 0.5 <= niveau < 1:
+        print("\n✗ Le niveau de service doit être compris entre 0.5 et 1")
+        pause()
+        return
+    
+    previsions = calculer_previsions(delai=delai, niveau_service=niveau)
+    if previsions is None:
+        print("\n✗ Erreur lors du calcul des prévisions")
+        pause()
+        return
+    if not len(previsions['produit_id']):
+        print("\nAucune sortie de stock sur la période.")
+        pause()
+        return
+    
+    # Produits dont le seuil actuel s'éloigne le plus de la suggestion (sans seuil en tête)
+    ecarts = np.abs(previsions['seuil_suggere'] - previsions['seuil_actuel'])
+    headers = ["Réf.", "Moy. 28j", "Lissage", "Écart-type", "Seuil actuel", "Suggéré"]
+    data = [[previsions['reference'][i], f"{previsions['moyenne_mobile'][i]:.2f}",
+             f"{previsions['lissage'][i]:.2f}", f"{previsions['ecart_type'][i]:.2f}",
+             "-" if np.isnan(previsions['seuil_actuel'][i]) else int(previsions['seuil_actuel'][i]),
+             previsions['seuil_suggere'][i]]
+            for i in np.argsort(-np.nan_to_num(ecarts, nan=np.inf), kind='stable')[:TAILLE_PAGE]]
+    print(tabulate(data, headers=headers, tablefmt="grid"))
+    print(f"\n{len(previsions['produit_id'])} produit(s) analysé(s), "
+          f"{np.count_nonzero(ecarts)} seuil(s) à ajuster")
+    
+    confirm = input("\nAppliquer les seuils suggérés? (oui/non): ")
+    if confirm.lower() == 'oui':
+        nb = appliquer_seuils(previsions['produit_id'], previsions['seuil_suggere'])
+        if nb is not None:
+            print(f"\n✓ {nb} seuil(s) mis à jour")
+        else:
+            print("\n✗ Erreur lors de la mise à jour")
+    pause()
+
+
 # ============================================
 # MENU UTILISATEURS (Admin)
 # ============================================
@@ -782,6 +1252,12 @@ def menu_utilisateurs():
         print("2. Créer un utilisateur")
         print("3. Modifier mot de passe")
         print("4. Désactiver un utilisateur")
+        print("5. Statistiques du cache")
+        print("6. Archiver les anciens mouvements")
+        print("7. Prendre un instantané du stock")
+        print("8. Statistiques de la file d'ingestion")
+        print("9. Réconciliation stock / mouvements")
+        print("10. Statistiques du pool de connexions")
         print("0. Retour")
         
         choix = input("\nVotre choix: ")
@@ -794,6 +1270,18 @@ def menu_utilisateurs():
             modifier_mdp_menu()
         elif choix == "4":
             desactiver_utilisateur_menu()
+        elif choix == "5":
+            afficher_statistiques_cache()
+        elif choix == "6":
+            archiver_mouvements_menu()
+        elif choix == "7":
+            prendre_instantanes_menu()
+        elif choix == "8":
+            afficher_statistiques_ingestion()
+        elif choix == "9":
+            reconciliation_menu()
+        elif choix == "10":
+            afficher_statistiques_pool()
         elif choix == "0":
             return
 
@@ -811,6 +1299,7 @@ def afficher_utilisateurs_tableau(utilisateurs):
 
 def lister_utilisateurs_menu():
     """Afficher la liste des utilisateurs"""
+    from utilisateur import lire_utilisateurs
     clear_screen()
     afficher_titre("Liste des Utilisateurs")
     utilisateurs = lire_utilisateurs()
@@ -820,6 +1309,7 @@ def lister_utilisateurs_menu():
 
 def creer_utilisateur_menu():
     """Créer un nouvel utilisateur"""
+    from utilisateur import creer_utilisateur
     clear_screen()
     afficher_titre("Créer un Utilisateur")
     
@@ -841,6 +1331,7 @@ def creer_utilisateur_menu():
 
 def modifier_mdp_menu():
     """Modifier le mot de passe d'un utilisateur"""
+    from utilisateur import lire_utilisateurs, modifier_mot_de_passe
     clear_screen()
     afficher_titre("Modifier Mot de Passe")
     
@@ -867,6 +1358,7 @@ def modifier_mdp_menu():
 
 def desactiver_utilisateur_menu():
     """Désactiver un utilisateur"""
+    from utilisateur import lire_utilisateurs, desactiver_utilisateur
     clear_screen()
     afficher_titre("Désactiver un Utilisateur")
     
@@ -889,12 +1381,134 @@ def desactiver_utilisateur_menu():
     pause()
 
 
+def afficher_statistiques_cache():
+    """Afficher les compteurs du cache des données de référence"""
+    from cache import statistiques_cache
+    clear_screen()
+    afficher_titre("Statistiques du Cache")
+    
+    headers = ["Cache", "Succès", "Échecs", "Entrées"]
+    print(tabulate(statistiques_cache(), headers=headers, tablefmt="grid"))
+    pause()
+
+
+def afficher_statistiques_ingestion():
+    """Afficher la profondeur et les latences de la file d'ingestion des mouvements"""
+    clear_screen()
+    afficher_titre("Statistiques de la File d'Ingestion")
+    
+    if file_ingestion is None:
+        print("\n✗ File d'ingestion indisponible")
+        pause()
+        return
+    
+    headers = ["Métrique", "Valeur"]
+    print(tabulate(file_ingestion.statistiques().items(), headers=headers, tablefmt="grid"))
+    pause()
+
+
+def afficher_statistiques_pool():
+    """Afficher l'état du pool de connexions et l'histogramme des délais d'obtention"""
+    clear_screen()
+    afficher_titre("Statistiques du Pool de Connexions")
+    
+    statistiques = statistiques_pool()
+    histogramme = statistiques.pop('histogramme_attente')
+    headers = ["Métrique", "Valeur"]
+    print(tabulate(statistiques.items(), headers=headers, tablefmt="grid"))
+    print("\nDélai d'obtention d'une connexion:")
+    print(tabulate(histogramme.items(), headers=["Délai", "Emprunts"], tablefmt="grid"))
+    if statistiques['expirations']:
+        print(f"\n⚠️  {statistiques['expirations']} demande(s) de connexion expirée(s) : pool saturé")
+    
+    replique = statistiques_replique()
+    if replique is not None:
+        print("\nRoutage des lectures:")
+        print(tabulate(replique.items(), headers=headers, tablefmt="grid"))
+    pause()
+
+
+def reconciliation_menu():
+    """Comparer le stock de chaque produit au solde de ses mouvements et régulariser les écarts"""
+    from reconciliation import reconcilier, corriger_ecarts
+    clear_screen()
+    afficher_titre("Réconciliation Stock / Mouvements")
+    
+    travailleurs = saisie_int("\nPartitions agrégées en parallèle (défaut: 4): ", 4)
+    print("\nCalcul des soldes...")
+    ecarts = reconcilier(travailleurs)
+    
+    if ecarts is None:
+        print("\n✗ Erreur lors de la réconciliation")
+    elif not ecarts:
+        print("\n✓ Le stock de tous les produits correspond à leurs mouvements")
+    else:
+        headers = ["Réf.", "Nom", "Stock", "Solde mouvements", "Écart"]
+        data = [[e[1], e[2], e[3], e[4], f"{e[5]:+d}"] for e in ecarts]
+        print(tabulate(data, headers=headers, tablefmt="grid"))
+        print(f"\n⚠️  {len(ecarts)} produit(s) en écart")
+        
+        confirm = input("\nEnregistrer des mouvements de régularisation? (oui/non): ")
+        if confirm.lower() == 'oui':
+            nb = corriger_ecarts([e[0] for e in ecarts], utilisateur_connecte[0])
+            if nb is not None:
+                print(f"\n✓ {nb} mouvement(s) de régularisation enregistré(s)")
+            else:
+                print("\n✗ Erreur lors de la régularisation")
+    pause()
+
+
+def archiver_mouvements_menu():
+    """Archiver les partitions mensuelles de mouvements les plus anciennes"""
+    from mouvement import archiver_mouvements, purger_cles_idempotence
+    clear_screen()
+    afficher_titre("Archiver les Anciens Mouvements")
+    
+    mois = saisie_int("\nNombre de mois à conserver (défaut: 24): ", 24)
+    supprimer = input("Supprimer au lieu d'archiver dans le schéma 'archives'? (oui/non): ")
+    
+    nb = archiver_mouvements(mois, supprimer.lower() == 'oui')
+    
+    if nb is not None:
+        print(f"\n✓ {nb} partition(s) mensuelle(s) archivée(s)")
+    else:
+        print("\n✗ Erreur lors de l'archivage")
+    
+    nb = purger_cles_idempotence()
+    if nb is not None:
+        print(f"✓ {nb} clé(s) d'idempotence de plus de 30 jours purgée(s)")
+    pause()
+
+
+def prendre_instantanes_menu():
+    """Enregistrer le stock de tous les produits au début du jour ou du mois"""
+    from instantane import prendre_instantanes
+    clear_screen()
+    afficher_titre("Instantané du Stock")
+    
+    print("\n1. Début du jour")
+    print("2. Début du mois")
+    choix = input("\nPériode: ")
+    periode = {"1": "jour", "2": "mois"}.get(choix)
+    if not periode:
+        return
+    
+    nb = prendre_instantanes(periode)
+    
+    if nb is not None:
+        print(f"\n✓ {nb} instantané(s) créé(s)")
+    else:
+        print("\n✗ Erreur lors de la prise des instantanés")
+    pause()
+
+
 # ============================================
 # AUTHENTIFICATION & INSCRIPTION
 # ============================================
 
 def inscription():
     """Inscription d'un nouvel utilisateur"""
+    from utilisateur import inscrire_utilisateur
     clear_screen()
     afficher_titre("Inscription")
     
@@ -918,14 +1532,11 @@ def inscription():
         pause()
         return False
     
-    # Premier utilisateur = admin, sinon user
-    nb_users = compter_utilisateurs()
-    role = 'admin' if nb_users == 0 else 'user'
-    
-    user_id = creer_utilisateur(username, mot_de_passe, role)
+    # Premier utilisateur = admin, sinon user (décidé à l'insertion)
+    inscrit = inscrire_utilisateur(username, mot_de_passe)
     
-    if user_id:
-        if role == 'admin':
+    if inscrit:
+        if inscrit[1] == 'admin':
             print(f"\n✓ Compte administrateur créé avec succès!")
         else:
             print(f"\n✓ Compte créé avec succès!")
@@ -940,6 +1551,7 @@ def inscription():
 def ecran_connexion():
     """Écran de connexion"""
     global utilisateur_connecte
+    from utilisateur import authentifier, admin_existe
     
     while True:
         clear_screen()
@@ -960,6 +1572,7 @@ def ecran_connexion():
             
             if utilisateur:
                 utilisateur_connecte = utilisateur
+                attendre_demarrage()
                 print(f"\n✓ Bienvenue {utilisateur[1]}!")
                 pause()
                 menu_principal()
@@ -978,8 +1591,37 @@ def ecran_connexion():
 # POINT D'ENTRÉE
 # ============================================
 
+def taches_demarrage():
+    """
+    Démarrage non nécessaire à l'écran de connexion : écoute des invalidations du cache et
+    file d'ingestion (rejeu de son journal). Les partitions des mois à venir sont créées
+    par la tâche planifiée maintenance.py.
+    Chaque étape est indépendante : un échec est signalé dans avertissements_demarrage
+    (affichés après la connexion) sans empêcher les suivantes.
+    """
+    global file_ingestion
+    try:
+        from cache import demarrer_ecoute
+        demarrer_ecoute()
+    except Exception as e:
+        avertissements_demarrage.append(f"Écoute des invalidations du cache indisponible: {e}")
+    try:
+        from ingestion import demarrer_ingestion
+        file_ingestion = demarrer_ingestion()
+    except Exception as e:
+        avertissements_demarrage.append(f"File d'ingestion indisponible: {e}")
+
+
+def attendre_demarrage():
+    """Attendre la fin des tâches de démarrage et afficher leurs avertissements"""
+    demarrage.join()
+    while avertissements_demarrage:
+        print(f"⚠️  {avertissements_demarrage.pop(0)}")
+
+
 def main():
     """Point d'entrée de l'application"""
+    global demarrage
     print("Connexion à la base de données...")
     
     if not test_connexion():
@@ -988,6 +1630,9 @@ def main():
         sys.exit(1)
     
     print("✓ Connexion établie!")
+    # Thread non démon : terminé avant l'arrêt de la file d'ingestion (atexit) si l'on quitte tôt
+    demarrage = threading.Thread(target=taches_demarrage, name='demarrage')
+    demarrage.start()
     
     try:
         ecran_connexion()
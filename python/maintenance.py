@@ -0,0 +1,29 @@
+"""
+Maintenance planifiée des mouvements de stock
+Crée à l'avance les partitions mensuelles de mouvements_stock et purge les clés
+d'idempotence expirées. Sans partition, un mouvement est rangé dans la partition par
+défaut : un passage quotidien (ou au moins mensuel) suffit.
+
+Utilisation en ligne de commande (tâche planifiée, par exemple chaque nuit) :
+    python python/maintenance.py --mois-a-venir 3 --jours-cles 30
+"""
+
+import argparse
+import sys
+
+from mouvement import creer_partitions, purger_cles_idempotence
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance planifiée des mouvements de stock")
+    parser.add_argument('--mois-a-venir', type=int, default=3,
+                        help="partitions créées au-delà du mois courant (défaut: 3)")
+    parser.add_argument('--jours-cles', type=int, default=30,
+                        help="ancienneté des clés d'idempotence purgées, en jours (défaut: 30)")
+    args = parser.parse_args()
+
+    partitions = creer_partitions(args.mois_a_venir)
+    cles = purger_cles_idempotence(args.jours_cles)
+    if partitions is None or cles is None:
+        sys.exit(1)
+    print(f"{partitions} partition(s) créée(s), {cles} clé(s) d'idempotence purgée(s)")
@@ -3,9 +3,10 @@ Modèles SQLAlchemy ORM pour la gestion de stock
 """
 
 import uuid
-from sqlalchemy import Column, String, Text, Integer, DECIMAL, Boolean, ForeignKey, TIMESTAMP
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Column, String, Text, Integer, BigInteger, DECIMAL, Boolean, ForeignKey,
+                        TIMESTAMP, Date, Computed, Index)
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from connexion import Base
 
@@ -57,6 +58,11 @@ class Produit(Base):
     seuil_alerte = Column(Integer, default=10)
     categorie_id = Column(UUID(as_uuid=True), ForeignKey('categories.id', ondelete='SET NULL'))
     fournisseur_id = Column(UUID(as_uuid=True), ForeignKey('fournisseurs.id', ondelete='SET NULL'))
+    # Vecteur plein texte calculé par PostgreSQL, jamais chargé par défaut
+    recherche = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('french', nom || ' ' || coalesce(description, ''))", persisted=True)
+    ))
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, server_default=func.current_timestamp())
 
@@ -64,6 +70,16 @@ class Produit(Base):
     fournisseur = relationship("Fournisseur", back_populates="produits")
     mouvements = relationship("MouvementStock", back_populates="produit", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('idx_produits_nom_trgm', 'nom',
+              postgresql_using='gin', postgresql_ops={'nom': 'gin_trgm_ops'}),
+        Index('idx_produits_reference_trgm', 'reference',
+              postgresql_using='gin', postgresql_ops={'reference': 'gin_trgm_ops'}),
+        Index('idx_produits_recherche', 'recherche', postgresql_using='gin'),
+        Index('idx_produits_alerte', 'quantite_stock',
+              postgresql_where=quantite_stock <= seuil_alerte),
+    )
+
     def __repr__(self):
         return f"<Produit(ref='{self.reference}', nom='{self.nom}')>"
 
@@ -77,15 +93,85 @@ class MouvementStock(Base):
     type_mouvement = Column(String(10), nullable=False)  # 'ENTREE' ou 'SORTIE'
     quantite = Column(Integer, nullable=False)
     motif = Column(Text)
-    date_mouvement = Column(TIMESTAMP, server_default=func.current_timestamp())
+    utilisateur_id = Column(UUID(as_uuid=True), ForeignKey('utilisateurs.id', ondelete='SET NULL'))
+    # Clé de partitionnement (partitions mensuelles), donc membre de la clé primaire
+    date_mouvement = Column(TIMESTAMP, primary_key=True, nullable=False,
+                            server_default=func.current_timestamp())
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    # Mouvement correctif de la réconciliation, hors demande
+    regularisation = Column(Boolean, nullable=False, default=False)
 
     produit = relationship("Produit", back_populates="mouvements")
+    utilisateur = relationship("Utilisateur")
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (date_mouvement)'}
 
     def __repr__(self):
         return f"<MouvementStock(type='{self.type_mouvement}', qte={self.quantite})>"
 
 
+class StockInstantane(Base):
+    """Modèle pour les instantanés de stock (stock d'un produit au début d'une période)"""
+    __tablename__ = 'stocks_instantanes'
+
+    produit_id = Column(UUID(as_uuid=True), ForeignKey('produits.id', ondelete='CASCADE'), primary_key=True)
+    date_instantane = Column(TIMESTAMP, primary_key=True)
+    quantite = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<StockInstantane(date='{self.date_instantane}', qte={self.quantite})>"
+
+
+class SoldeArchive(Base):
+    """Modèle pour le solde des mouvements archivés d'un produit"""
+    __tablename__ = 'soldes_archives'
+
+    produit_id = Column(UUID(as_uuid=True), ForeignKey('produits.id', ondelete='CASCADE'), primary_key=True)
+    quantite = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<SoldeArchive(qte={self.quantite})>"
+
+
+class LimiteArchives(Base):
+    """Modèle pour la limite de l'archivage : mouvements antérieurs à `avant` archivés"""
+    __tablename__ = 'limite_archives'
+
+    unique_ligne = Column(Boolean, primary_key=True, default=True)
+    avant = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f"<LimiteArchives(avant='{self.avant}')>"
+
+
+class MouvementJournalier(Base):
+    """Modèle pour les cumuls journaliers des mouvements d'un produit (tenus à jour par trigger)"""
+    __tablename__ = 'mouvements_journaliers'
+
+    produit_id = Column(UUID(as_uuid=True), ForeignKey('produits.id', ondelete='CASCADE'), primary_key=True)
+    jour = Column(Date, primary_key=True)
+    entrees = Column(BigInteger, nullable=False, default=0)
+    sorties = Column(BigInteger, nullable=False, default=0)
+    sorties_regularisation = Column(BigInteger, nullable=False, default=0)  # hors demande
+    nb_mouvements = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<MouvementJournalier(jour='{self.jour}', entrees={self.entrees}, sorties={self.sorties})>"
+
+
+class CleIdempotence(Base):
+    """Modèle pour les clés d'idempotence (mouvement enregistré pour une clé fournie par le client)"""
+    __tablename__ = 'cles_idempotence'
+
+    cle = Column(String(100), primary_key=True)
+    mouvement_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<CleIdempotence(cle='{self.cle}')>"
+
+
 class Utilisateur(Base):
     """Modèle pour les utilisateurs"""
     __tablename__ = 'utilisateurs'
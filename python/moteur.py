@@ -0,0 +1,104 @@
+"""
+Construction des moteurs SQLAlchemy (primaire et réplique) et de la factory de sessions
+Importé par connexion.py au premier usage de la base : importer connexion ne charge pas SQLAlchemy
+"""
+
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import sessionmaker
+
+from connexion import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                       DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT, DB_REPLICA_URL,
+                       _mesures, _routage)
+
+
+class PoolMesure(QueuePool):
+    """QueuePool mesurant le délai d'obtention de chaque connexion (attente et test inclus)"""
+
+    def connect(self):
+        debut = time.perf_counter()
+        try:
+            connexion = super().connect()
+        except exc.TimeoutError:
+            _mesures.attente(time.perf_counter() - debut, expiree=True)
+            raise
+        _mesures.attente(time.perf_counter() - debut)
+        return connexion
+
+
+# Option de démarrage transmise seulement si nécessaire (refusée par certains poolers)
+_options_connexion = {}
+if DB_STATEMENT_TIMEOUT > 0:
+    _options_connexion['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+
+# Créer le moteur SQLAlchemy
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=PoolMesure,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_recycle=DB_POOL_RECYCLE,
+    connect_args=_options_connexion
+)
+
+
+@event.listens_for(engine, 'connect')
+def _connexion_creee(connexion_dbapi, enregistrement):
+    with _mesures.verrou:
+        _mesures.connexions_creees += 1
+
+
+@event.listens_for(engine, 'checkout')
+def _connexion_empruntee(connexion_dbapi, enregistrement, proxy):
+    with _mesures.verrou:
+        _mesures.emprunts += 1
+        _mesures.pic_empruntees = max(_mesures.pic_empruntees, engine.pool.checkedout())
+
+
+@event.listens_for(engine, 'checkin')
+def _connexion_restituee(connexion_dbapi, enregistrement):
+    with _mesures.verrou:
+        _mesures.restitutions += 1
+
+
+@event.listens_for(engine, 'invalidate')
+def _connexion_invalidee(connexion_dbapi, enregistrement, exception):
+    with _mesures.verrou:
+        _mesures.invalidations += 1
+
+
+# Moteur de la réplique : même pool, connexion courte pour se replier vite sur le primaire
+replica_engine = None
+if DB_REPLICA_URL:
+    replica_engine = create_engine(
+        DB_REPLICA_URL,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args=dict(_options_connexion, connect_timeout=3)
+    )
+
+    # Toute instruction autre qu'un SELECT exécutée sur le primaire compte comme une écriture ;
+    # la fenêtre est rouverte quand la connexion est rendue au pool, après le commit.
+    # Les fonctions SQL qui écrivent (SELECT creer_partitions_mouvements(...)) ne sont pas
+    # détectées : leurs appelants appellent signaler_ecriture()
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _instruction_executee(connexion, curseur, instruction, parametres, contexte, executemany):
+        if instruction.lstrip()[:6].upper() != 'SELECT':
+            connexion.info['ecriture'] = True
+            _routage.ecriture()
+
+    @event.listens_for(engine, 'checkin')
+    def _ecriture_restituee(connexion_dbapi, enregistrement):
+        if enregistrement is not None and enregistrement.info.pop('ecriture', False):
+            _routage.ecriture()
+
+# Créer la factory de sessions
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -2,111 +2,546 @@
 CRUD pour la table mouvements_stock avec SQLAlchemy
 """
 
-from connexion import get_session
-from models import MouvementStock, Produit
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import (select, update, insert, delete, literal, or_, exists, union_all, values,
+                        column, Integer, text, tuple_, func, cast, BigInteger)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import IntegrityError
+from connexion import get_session, transaction_active, signaler_ecriture
+from models import MouvementStock, MouvementJournalier, CleIdempotence, Produit, Utilisateur
 
+# Bornes du schéma : quantités et stocks INTEGER, clés d'idempotence VARCHAR(100)
+QUANTITE_MAX = 2**31 - 1
+LONGUEUR_CLE_MAX = 100
 
-def entree_stock(produit_id, quantite, motif=None):
-    """Enregistrer une entrée de stock"""
+
+def _requete_mouvement(produit_id, type_mouvement, quantite, motif=None, utilisateur_id=None,
+                       cle=None):
+    """
+    Instruction unique appliquant un mouvement : mise à jour conditionnelle du stock
+    (CTE UPDATE ... RETURNING) et insertion du mouvement à partir de son résultat.
+    Avec une clé d'idempotence, le stock n'est mis à jour que si la clé est inconnue, la clé
+    est enregistrée avec le mouvement et l'instruction retourne le mouvement déjà associé
+    à la clé le cas échéant.
+    Ne retourne aucune ligne si le produit n'existe pas ou si le stock est insuffisant.
+    """
+    if type_mouvement == 'ENTREE':
+        conditions = [Produit.id == produit_id]
+        nouveau_stock = Produit.quantite_stock + quantite
+    else:
+        conditions = [Produit.id == produit_id, Produit.quantite_stock >= quantite]
+        nouveau_stock = Produit.quantite_stock - quantite
+    if cle is not None:
+        conditions.append(~exists().where(CleIdempotence.cle == cle))
+    
+    maj = (
+        update(Produit)
+        .where(*conditions)
+        .values(quantite_stock=nouveau_stock)
+        .returning(Produit.id)
+        .cte('maj')
+    )
+    mouvement = (
+        insert(MouvementStock)
+        .from_select(
+            ['produit_id', 'type_mouvement', 'quantite', 'motif', 'utilisateur_id'],
+            select(maj.c.id, literal(type_mouvement), literal(quantite), literal(motif),
+                   literal(utilisateur_id, UUID(as_uuid=True))),
+            include_defaults=False
+        )
+        .returning(MouvementStock.id)
+    )
+    if cle is None:
+        return mouvement
+    
+    # Deux demandes simultanées de même clé : la seconde échoue sur la clé primaire
+    mouvement = mouvement.cte('mouvement')
+    enregistrement = (
+        insert(CleIdempotence)
+        .from_select(['cle', 'mouvement_id'], select(literal(cle), mouvement.c.id))
+        .cte('enregistrement')
+    )
+    return union_all(
+        select(mouvement.c.id),
+        select(CleIdempotence.mouvement_id).where(CleIdempotence.cle == cle)
+    ).add_cte(enregistrement)
+
+
+def _mouvement_de_cle(session, cle):
+    """Mouvement déjà enregistré pour une clé d'idempotence (None si la clé est inconnue)"""
+    return session.execute(
+        select(CleIdempotence.mouvement_id).where(CleIdempotence.cle == cle)
+    ).scalar()
+
+
+def _appliquer_mouvement(produit_id, type_mouvement, quantite, motif, utilisateur_id=None,
+                         cle=None):
+    """
+    Appliquer un mouvement de façon atomique en un seul aller-retour (autocommit,
+    ou dans la transaction de l'unité de travail active).
+    Le stock ne peut ni devenir négatif ni perdre de mise à jour concurrente.
+    Une demande rejouée avec la même clé retourne le mouvement d'origine ; si la même clé
+    est enregistrée simultanément par une autre demande pendant une unité de travail,
+    l'IntegrityError est propagée (la transaction de l'unité est perdue).
+    """
+    if quantite <= 0:
+        print("La quantité doit être positive")
+        return None
+    
     session = get_session()
     try:
-        # Vérifier que le produit existe
-        produit = session.query(Produit).filter(Produit.id == produit_id).first()
-        if not produit:
-            print("Produit non trouvé")
-            return None
-        
-        # Créer le mouvement
-        mouvement = MouvementStock(
-            produit_id=produit_id,
-            type_mouvement='ENTREE',
-            quantite=quantite,
-            motif=motif
-        )
-        session.add(mouvement)
-        
-        # Mettre à jour le stock du produit
-        produit.quantite_stock += quantite
+        if not transaction_active():
+            session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+        mouvement_id = session.execute(
+            _requete_mouvement(produit_id, type_mouvement, quantite, motif, utilisateur_id, cle)
+        ).scalar()
         
-        session.commit()
-        return mouvement.id
+        if mouvement_id is None:
+            # Chemin d'échec uniquement : distinguer produit absent et stock insuffisant
+            stock = session.execute(
+                select(Produit.quantite_stock).where(Produit.id == produit_id)
+            ).scalar()
+            if stock is None:
+                print("Produit non trouvé")
+            else:
+                print(f"Stock insuffisant. Disponible: {stock}")
+        return mouvement_id
+    except IntegrityError as e:
+        # Même clé enregistrée entre-temps par une demande concurrente ; dans une unité de
+        # travail, la transaction est perdue : l'exception annule l'unité (voir transaction())
+        if transaction_active():
+            raise
+        session.rollback()
+        mouvement_id = _mouvement_de_cle(session, cle) if cle is not None else None
+        if mouvement_id is None:
+            print(f"Erreur lors du mouvement de stock: {e}")
+        return mouvement_id
     except Exception as e:
         session.rollback()
-        print(f"Erreur lors de l'entrée de stock: {e}")
+        print(f"Erreur lors du mouvement de stock: {e}")
         return None
     finally:
         session.close()
 
 
-def sortie_stock(produit_id, quantite, motif=None):
-    """Enregistrer une sortie de stock"""
-    session = get_session()
+def entree_stock(produit_id, quantite, motif=None, utilisateur_id=None, cle=None):
+    """
+    Enregistrer une entrée de stock. `cle` est une clé d'idempotence optionnelle :
+    une entrée rejouée avec la même clé n'est pas appliquée deux fois.
+    """
+    return _appliquer_mouvement(produit_id, 'ENTREE', quantite, motif, utilisateur_id, cle)
+
+
+def sortie_stock(produit_id, quantite, motif=None, utilisateur_id=None, cle=None):
+    """Enregistrer une sortie de stock (`cle` : voir entree_stock)"""
+    return _appliquer_mouvement(produit_id, 'SORTIE', quantite, motif, utilisateur_id, cle)
+
+
+def erreur_mouvement(type_mouvement, quantite, cle=None):
+    """Message d'erreur d'un mouvement hors des bornes du schéma, None s'il est valide"""
+    if type_mouvement not in ('ENTREE', 'SORTIE'):
+        return f"Type de mouvement invalide: {type_mouvement}"
+    if isinstance(quantite, bool) or not isinstance(quantite, int) or not 0 < quantite <= QUANTITE_MAX:
+        return f"La quantité doit être un entier compris entre 1 et {QUANTITE_MAX}"
+    if cle is not None and (not isinstance(cle, str) or len(cle) > LONGUEUR_CLE_MAX):
+        return f"La clé d'idempotence doit être une chaîne d'au plus {LONGUEUR_CLE_MAX} caractères"
+    return None
+
+
+def _identifiant_produit(produit):
+    """Interpréter `produit` comme un UUID si possible, sinon comme une référence"""
+    if isinstance(produit, uuid.UUID):
+        return produit, None
     try:
-        # Vérifier que le produit existe
-        produit = session.query(Produit).filter(Produit.id == produit_id).first()
-        if not produit:
-            print("Produit non trouvé")
-            return None
-        
-        # Vérifier le stock disponible
-        if produit.quantite_stock < quantite:
-            print(f"Stock insuffisant. Disponible: {produit.quantite_stock}")
+        return uuid.UUID(str(produit)), None
+    except ValueError:
+        return None, produit
+
+
+class _LotMouvements:
+    """
+    Contrôle et instructions d'un lot de mouvements (voir mouvements_en_lot), indépendants
+    de la session : partagés par l'API synchrone et l'API asynchrone.
+    """
+
+    def __init__(self, lignes, utilisateur_id=None):
+        self.lignes = lignes
+        self.utilisateur_id = utilisateur_id
+        self.identifiants = [_identifiant_produit(ligne[0]) for ligne in lignes]
+        self.cles = [ligne[4] if len(ligne) > 4 else None for ligne in lignes]
+        self.mouvement_ids = [None] * len(lignes)
+        self.erreurs = []
+        self.acceptees = []
+        self.deltas = defaultdict(int)
+        self.nouvelles = {}     # clé -> mouvement de ce lot
+        self.doublons = []      # (index, clé) des lignes répétant une clé de ce lot
+
+    def requete_verrou(self):
+        """Résolution des références et verrouillage des produits en une requête"""
+        ids_demandes = {i for i, _ in self.identifiants if i is not None}
+        references = {r for _, r in self.identifiants if r is not None}
+        return (
+            select(Produit.id, Produit.reference, Produit.quantite_stock)
+            .where(or_(Produit.id.in_(ids_demandes), Produit.reference.in_(references)))
+            .order_by(Produit.id)
+            .with_for_update()
+        )
+
+    def requete_cles(self):
+        """Mouvements déjà enregistrés pour les clés du lot (None si le lot n'a pas de clé)"""
+        cles = set(self.cles) - {None}
+        if not cles:
             return None
-        
-        # Créer le mouvement
-        mouvement = MouvementStock(
-            produit_id=produit_id,
-            type_mouvement='SORTIE',
-            quantite=quantite,
-            motif=motif
+        return (
+            select(CleIdempotence.cle, CleIdempotence.mouvement_id)
+            .where(CleIdempotence.cle.in_(cles))
         )
-        session.add(mouvement)
+
+    def controler(self, produits, connues):
+        """Contrôler les lignes dans leur ordre contre les produits verrouillés et les clés connues"""
+        par_reference = {p.reference: p.id for p in produits}
+        stocks = {p.id: p.quantite_stock for p in produits}
+        for index, ((produit_id, reference), ligne) in enumerate(zip(self.identifiants, self.lignes)):
+            type_mouvement, quantite, motif = ligne[1:4]
+            cle = self.cles[index]
+            produit_id = produit_id if produit_id in stocks else par_reference.get(reference)
+            erreur = erreur_mouvement(type_mouvement, quantite, cle)
+            if erreur is None and cle in connues:
+                self.mouvement_ids[index] = connues[cle]
+            elif erreur is None and cle in self.nouvelles:
+                self.doublons.append((index, cle))
+            elif produit_id is None:
+                self.erreurs.append((index, "Produit non trouvé"))
+            elif erreur is not None:
+                self.erreurs.append((index, erreur))
+            elif type_mouvement == 'SORTIE' and stocks[produit_id] < quantite:
+                self.erreurs.append((index, f"Stock insuffisant. Disponible: {stocks[produit_id]}"))
+            elif type_mouvement == 'ENTREE' and stocks[produit_id] > QUANTITE_MAX - quantite:
+                self.erreurs.append((index, f"Stock maximal dépassé. Disponible: {stocks[produit_id]}"))
+            else:
+                variation = quantite if type_mouvement == 'ENTREE' else -quantite
+                stocks[produit_id] += variation
+                self.deltas[produit_id] += variation
+                self.acceptees.append((index, {
+                    'id': uuid.uuid4(),
+                    'produit_id': produit_id,
+                    'type_mouvement': type_mouvement,
+                    'quantite': quantite,
+                    'motif': motif,
+                    'utilisateur_id': self.utilisateur_id
+                }))
+                if cle is not None:
+                    self.nouvelles[cle] = self.acceptees[-1][1]['id']
+
+    def instructions(self):
+        """Instructions (requête, paramètres) appliquant les lignes acceptées"""
+        # Une seule variation nette par produit, jointe depuis une liste VALUES
+        nettes = [(produit_id, delta) for produit_id, delta in self.deltas.items() if delta]
+        if nettes:
+            variations = values(
+                column('id', UUID(as_uuid=True)), column('delta', Integer), name='variations'
+            ).data(nettes)
+            yield (
+                update(Produit.__table__)
+                .where(Produit.id == variations.c.id)
+                .values(quantite_stock=Produit.quantite_stock + variations.c.delta)
+            ), None
         
-        # Mettre à jour le stock du produit
-        produit.quantite_stock -= quantite
+        # Identifiants générés côté client : insertion multi-lignes sans RETURNING ordonné
+        # (la clé primaire composite n'offre pas de colonne sentinelle à SQLAlchemy)
+        yield insert(MouvementStock), [mouvement for _, mouvement in self.acceptees]
+        if self.nouvelles:
+            yield insert(CleIdempotence), [
+                {'cle': cle, 'mouvement_id': mouvement_id}
+                for cle, mouvement_id in self.nouvelles.items()
+            ]
+
+    def resultat(self):
+        """(ids alignés sur les lignes, erreurs) une fois le lot validé"""
+        for index, mouvement in self.acceptees:
+            self.mouvement_ids[index] = mouvement['id']
+        for index, cle in self.doublons:
+            self.mouvement_ids[index] = self.nouvelles[cle]
+        return self.mouvement_ids, self.erreurs
+
+
+def mouvements_en_lot(lignes, tout_ou_rien=True, utilisateur_id=None, lever=False):
+    """
+    Appliquer une liste de mouvements en une seule transaction.
+    Chaque ligne est (produit_id ou référence, 'ENTREE' ou 'SORTIE', quantité, motif),
+    suivie d'une clé d'idempotence optionnelle : une ligne dont la clé est déjà enregistrée
+    n'est pas appliquée et reçoit l'id du mouvement d'origine.
+    Les produits concernés sont verrouillés dans l'ordre de leur id, le stock est mis à
+    jour par un seul UPDATE ensembliste (une ligne par produit) et les mouvements sont
+    insérés en un INSERT multi-lignes. Les lignes sont contrôlées dans leur ordre.
+    Avec `tout_ou_rien`, la moindre erreur annule tout le lot ; sinon seules les lignes
+    en erreur sont écartées. `utilisateur_id` est l'auteur de tous les mouvements du lot.
+    Avec `lever`, une erreur de base de données est levée après l'annulation au lieu
+    d'être retournée (l'appelant distingue ainsi les erreurs transitoires).
+    Retourne (ids des mouvements alignés sur les lignes, None si non appliquée,
+    liste des erreurs (index de ligne, message)).
+    """
+    lot = _LotMouvements(lignes, utilisateur_id)
+    session = get_session()
+    try:
+        produits = session.execute(lot.requete_verrou()).all()
+        requete_cles = lot.requete_cles()
+        connues = dict(session.execute(requete_cles).all()) if requete_cles is not None else {}
+        lot.controler(produits, connues)
         
+        if lot.erreurs and (tout_ou_rien or not lot.acceptees):
+            # Rien n'a été écrit : les verrous sont libérés à la fermeture (ou à la fin de
+            # l'unité de travail, qui n'est pas annulée)
+            return lot.mouvement_ids, lot.erreurs
+        if not lot.acceptees:
+            return lot.mouvement_ids, lot.erreurs  # uniquement des clés déjà enregistrées
+        
+        for requete, parametres in lot.instructions():
+            session.execute(requete, parametres)
+        session.commit()
+        return lot.resultat()
+    except Exception as e:
+        session.rollback()
+        if lever:
+            raise
+        print(f"Erreur lors du lot de mouvements: {e}")
+        return [None] * len(lignes), lot.erreurs + [(None, str(e))]
+    finally:
+        session.close()
+
+
+def _requete_mouvements(limite=50, avant=None, produit_id=None, type_mouvement=None,
+                        utilisateur_id=None, debut=None, fin=None):
+    """Projection jointe des derniers mouvements (voir lire_mouvements)"""
+    requete = (
+        select(MouvementStock.id, Produit.reference, Produit.nom,
+               MouvementStock.type_mouvement, MouvementStock.quantite,
+               MouvementStock.motif, MouvementStock.date_mouvement, Utilisateur.username)
+        .join(Produit, MouvementStock.produit_id == Produit.id)
+        .outerjoin(Utilisateur, MouvementStock.utilisateur_id == Utilisateur.id)
+        .order_by(MouvementStock.date_mouvement.desc(), MouvementStock.id.desc())
+        .limit(limite)
+    )
+    if avant is not None:
+        requete = requete.where(
+            tuple_(MouvementStock.date_mouvement, MouvementStock.id) < tuple_(*avant)
+        )
+    if produit_id is not None:
+        requete = requete.where(MouvementStock.produit_id == produit_id)
+    if type_mouvement is not None:
+        requete = requete.where(MouvementStock.type_mouvement == type_mouvement)
+    if utilisateur_id is not None:
+        requete = requete.where(MouvementStock.utilisateur_id == utilisateur_id)
+    if debut is not None:
+        requete = requete.where(MouvementStock.date_mouvement >= debut)
+    if fin is not None:
+        requete = requete.where(MouvementStock.date_mouvement < fin)
+    return requete
+
+
+def lire_mouvements(limite=50, avant=None, produit_id=None, type_mouvement=None,
+                    utilisateur_id=None, debut=None, fin=None):
+    """
+    Lire les derniers mouvements de stock, du plus récent au plus ancien, en une requête.
+    `avant` est le curseur (date, id) du dernier mouvement de la page précédente ;
+    `produit_id`, `type_mouvement`, `utilisateur_id`, `debut` (inclus) et `fin` (exclue)
+    filtrent les mouvements.
+    Retourne une liste de (id, référence, produit, type, quantité, motif, date, utilisateur).
+    """
+    session = get_session(lecture=True)
+    try:
+        requete = _requete_mouvements(limite, avant, produit_id, type_mouvement,
+                                      utilisateur_id, debut, fin)
+        return [tuple(ligne) for ligne in session.execute(requete)]
+    finally:
+        session.close()
+
+
+def _requete_historique(produit_id, avant=None, debut=None, fin=None, type_mouvement=None):
+    """
+    Mouvements d'un produit du plus récent au plus ancien, lus dans l'ordre de l'index
+    idx_mouvements_produit_historique. `avant` est le curseur (date, id) du dernier mouvement
+    de la page précédente ; `debut` (inclus) et `fin` (exclue) bornent date_mouvement.
+    """
+    requete = (
+        select(MouvementStock.id, MouvementStock.type_mouvement, MouvementStock.quantite,
+               MouvementStock.motif, MouvementStock.date_mouvement)
+        .where(MouvementStock.produit_id == produit_id)
+        .order_by(MouvementStock.date_mouvement.desc(), MouvementStock.id.desc())
+    )
+    if avant is not None:
+        requete = requete.where(
+            tuple_(MouvementStock.date_mouvement, MouvementStock.id) < tuple_(*avant)
+        )
+    if debut is not None:
+        requete = requete.where(MouvementStock.date_mouvement >= debut)
+    if fin is not None:
+        requete = requete.where(MouvementStock.date_mouvement < fin)
+    if type_mouvement is not None:
+        requete = requete.where(MouvementStock.type_mouvement == type_mouvement)
+    return requete
+
+
+def historique_produit_page(produit_id, avant=None, limite=50, debut=None, fin=None,
+                            type_mouvement=None):
+    """
+    Lire une page de l'historique d'un produit, du plus récent au plus ancien.
+    `avant` est le curseur (date, id) du dernier mouvement de la page précédente,
+    `debut`/`fin` et `type_mouvement` ('ENTREE' ou 'SORTIE') filtrent les mouvements.
+    Retourne une liste de (id, type, quantité, motif, date).
+    """
+    session = get_session(lecture=True)
+    try:
+        lignes = session.execute(
+            _requete_historique(produit_id, avant, debut, fin, type_mouvement).limit(limite)
+        )
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def historique_produit(produit_id):
+    """Obtenir l'historique complet des mouvements d'un produit (voir historique_produit_page)"""
+    session = get_session(lecture=True)
+    try:
+        return [tuple(ligne) for ligne in session.execute(_requete_historique(produit_id))]
+    finally:
+        session.close()
+
+
+def _requete_volumes_journaliers(debut, fin, produit_id=None):
+    """Volumes par jour lus dans les cumuls journaliers (voir volumes_journaliers)"""
+    requete = (
+        select(MouvementJournalier.jour,
+               cast(func.sum(MouvementJournalier.entrees), BigInteger),
+               cast(func.sum(MouvementJournalier.sorties), BigInteger),
+               cast(func.sum(MouvementJournalier.nb_mouvements), BigInteger))
+        .where(MouvementJournalier.jour >= debut, MouvementJournalier.jour < fin,
+               MouvementJournalier.nb_mouvements > 0)
+        .group_by(MouvementJournalier.jour)
+        .order_by(MouvementJournalier.jour)
+    )
+    if produit_id is not None:
+        requete = requete.where(MouvementJournalier.produit_id == produit_id)
+    return requete
+
+
+def volumes_journaliers(debut, fin, produit_id=None):
+    """
+    Volumes d'entrées et de sorties par jour sur [debut, fin), lus dans les cumuls
+    journaliers (une ligne par produit et par jour, quel que soit le nombre de mouvements).
+    Sans `produit_id`, les volumes de tous les produits sont additionnés.
+    Retourne une liste de (jour, entrées, sorties, nombre de mouvements) par jour croissant.
+    """
+    session = get_session(lecture=True)
+    try:
+        lignes = session.execute(_requete_volumes_journaliers(debut, fin, produit_id))
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def _requete_volumes_par_produit(debut, fin, limite=20):
+    """Produits les plus sortis d'après les cumuls journaliers (voir volumes_par_produit)"""
+    cumuls = (
+        select(MouvementJournalier.produit_id,
+               cast(func.sum(MouvementJournalier.entrees), BigInteger).label('entrees'),
+               cast(func.sum(MouvementJournalier.sorties), BigInteger).label('sorties'),
+               cast(func.sum(MouvementJournalier.nb_mouvements), BigInteger).label('nb_mouvements'))
+        .where(MouvementJournalier.jour >= debut, MouvementJournalier.jour < fin)
+        .group_by(MouvementJournalier.produit_id)
+        .subquery()
+    )
+    return (
+        select(Produit.id, Produit.reference, Produit.nom,
+               cumuls.c.entrees, cumuls.c.sorties, cumuls.c.nb_mouvements)
+        .join(cumuls, cumuls.c.produit_id == Produit.id)
+        .where(cumuls.c.nb_mouvements > 0)
+        .order_by(cumuls.c.sorties.desc(), Produit.reference)
+        .limit(limite)
+    )
+
+
+def volumes_par_produit(debut, fin, limite=20):
+    """
+    Produits ayant le plus de sorties sur [debut, fin), d'après les cumuls journaliers.
+    Retourne une liste de (id, référence, nom, entrées, sorties, nombre de mouvements).
+    """
+    session = get_session(lecture=True)
+    try:
+        lignes = session.execute(_requete_volumes_par_produit(debut, fin, limite))
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def purger_cles_idempotence(jours_conserves=30):
+    """
+    Supprimer les clés d'idempotence de plus de `jours_conserves` jours : une demande plus
+    ancienne ne peut plus être rejouée. Retourne le nombre de clés supprimées.
+    """
+    session = get_session()
+    try:
+        nb = session.execute(
+            delete(CleIdempotence).where(
+                CleIdempotence.created_at < func.localtimestamp() - timedelta(days=jours_conserves)
+            )
+        ).rowcount
         session.commit()
-        return mouvement.id
+        return nb
     except Exception as e:
         session.rollback()
-        print(f"Erreur lors de la sortie de stock: {e}")
+        print(f"Erreur lors de la purge des clés d'idempotence: {e}")
         return None
     finally:
         session.close()
 
 
-def lire_mouvements(limite=50):
-    """Lire les derniers mouvements de stock"""
+def creer_partitions(mois_a_venir=3):
+    """
+    Créer les partitions mensuelles du mois courant et des `mois_a_venir` suivants
+    (tâche planifiée, voir maintenance.py).
+    Idempotent : les partitions existantes sont conservées. Retourne le nombre créé.
+    """
     session = get_session()
     try:
-        mouvements = session.query(MouvementStock).order_by(
-            MouvementStock.date_mouvement.desc()
-        ).limit(limite).all()
-        
-        result = []
-        for m in mouvements:
-            result.append((
-                m.id,
-                m.produit.reference if m.produit else None,
-                m.produit.nom if m.produit else None,
-                m.type_mouvement,
-                m.quantite,
-                m.motif,
-                m.date_mouvement
-            ))
-        return result
+        nb = session.execute(text(
+            "SELECT creer_partitions_mouvements(CURRENT_DATE, "
+            "(date_trunc('month', CURRENT_DATE) + make_interval(months => :mois))::DATE)"
+        ), {'mois': mois_a_venir + 1}).scalar()
+        session.commit()
+        if nb > 0:
+            signaler_ecriture()  # écriture faite par un SELECT, non détectée par moteur.py
+        return nb
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors de la création des partitions: {e}")
+        return None
     finally:
         session.close()
 
 
-def historique_produit(produit_id):
-    """Obtenir l'historique des mouvements d'un produit"""
+def archiver_mouvements(mois_conserves=24, supprimer=False):
+    """
+    Détacher les partitions de plus de `mois_conserves` mois (en plus du mois courant)
+    et les déplacer dans le schéma archives, ou les supprimer.
+    Retourne le nombre de partitions archivées.
+    """
     session = get_session()
     try:
-        mouvements = session.query(MouvementStock).filter(
-            MouvementStock.produit_id == produit_id
-        ).order_by(MouvementStock.date_mouvement.desc()).all()
-        
-        return [(m.id, m.type_mouvement, m.quantite, m.motif, m.date_mouvement) for m in mouvements]
+        nb = session.execute(text(
+            "SELECT archiver_partitions_mouvements("
+            "(date_trunc('month', CURRENT_DATE) - make_interval(months => :mois))::DATE, :supprimer)"
+        ), {'mois': mois_conserves, 'supprimer': supprimer}).scalar()
+        session.commit()
+        if nb > 0:
+            signaler_ecriture()  # écriture faite par un SELECT, non détectée par moteur.py
+        return nb
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors de l'archivage des mouvements: {e}")
+        return None
     finally:
         session.close()
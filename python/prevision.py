@@ -0,0 +1,180 @@
+"""
+Prévision de la consommation et calcul des seuils d'alerte suggérés
+Les sorties journalières sont lues dans mouvements_journaliers en une requête (COPY binaire)
+puis traitées pour tous les produits à la fois avec NumPy
+
+Utilisation en ligne de commande :
+    python python/prevision.py --delai 7 --niveau-service 0.95
+    python python/prevision.py --appliquer
+"""
+
+import argparse
+import io
+import sys
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from sqlalchemy import text
+
+from connexion import engine
+
+# Une ligne par (produit, jour) ayant des sorties, lue dans les cumuls journaliers ;
+# les régularisations ne sont pas de la demande.
+# Le numéro de produit est son rang par id, comme la liste des produits lue dans la même transaction.
+SQL_SORTIES_JOURNALIERES = """
+    SELECT p.numero::INT4, (j.jour - %(debut)s::DATE)::INT4,
+           (j.sorties - j.sorties_regularisation)::INT4
+    FROM mouvements_journaliers j
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS numero FROM produits) p
+        ON p.id = j.produit_id
+    WHERE j.jour >= %(debut)s AND j.jour < %(fin)s
+      AND j.sorties > j.sorties_regularisation
+"""
+
+# Format COPY binaire : en-tête de 19 octets, puis par ligne le nombre de champs (int16)
+# et pour chaque champ sa longueur (int32) suivie de la valeur, en gros-boutiste
+_ENTETE_COPY = 19
+_LIGNE_COPY = np.dtype([
+    ('nb_champs', '>i2'),
+    ('l1', '>i4'), ('produit', '>i4'),
+    ('l2', '>i4'), ('jour', '>i4'),
+    ('l3', '>i4'), ('quantite', '>i4'),
+])
+
+SQL_SEUILS = """
+    UPDATE produits p SET seuil_alerte = s.seuil
+    FROM unnest(CAST(:produit_ids AS UUID[]), CAST(:seuils AS INTEGER[])) AS s(id, seuil)
+    WHERE p.id = s.id AND p.seuil_alerte IS DISTINCT FROM s.seuil
+"""
+
+
+def _charger_sorties(debut, fin):
+    """
+    Lire les produits (id, référence, seuil) et les sorties journalières de [debut, fin)
+    dans un même instantané. Retourne (produits, tableau structuré produit/jour/quantite).
+    """
+    connexion = engine.raw_connection()
+    try:
+        curseur = connexion.cursor()
+        curseur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        curseur.execute("SELECT id, reference, seuil_alerte FROM produits ORDER BY id")
+        produits = curseur.fetchall()
+        tampon = io.BytesIO()
+        copie = curseur.mogrify(
+            f"COPY ({SQL_SORTIES_JOURNALIERES}) TO STDOUT (FORMAT binary)",
+            {'debut': debut, 'fin': fin}
+        ).decode()
+        curseur.copy_expert(copie, tampon)
+        connexion.commit()
+    finally:
+        connexion.close()
+
+    donnees = tampon.getbuffer()
+    nb = (len(donnees) - _ENTETE_COPY - 2) // _LIGNE_COPY.itemsize
+    return produits, np.frombuffer(donnees, dtype=_LIGNE_COPY, count=nb, offset=_ENTETE_COPY)
+
+
+def calculer_previsions(jours=730, fenetre=28, alpha=0.1, delai=7, niveau_service=0.95):
+    """
+    Prévoir la consommation journalière des produits ayant eu des sorties sur les `jours`
+    derniers jours (jour courant exclu) et en déduire un point de commande :
+        seuil = demande lissée × délai + z(niveau de service) × écart-type × √délai
+    - moyenne mobile : moyenne des sorties des `fenetre` derniers jours ;
+    - lissage exponentiel de coefficient `alpha`, calculé en une somme pondérée ;
+    - écart-type de la demande journalière sur toute la période.
+    Le délai doit être positif ou nul et le niveau de service compris entre 0.5 et 1 ;
+    les seuils suggérés sont positifs ou nuls (contrainte de produits.seuil_alerte).
+    Retourne un dictionnaire de tableaux alignés : produit_id, reference, seuil_actuel,
+    moyenne_mobile, lissage, ecart_type, seuil_suggere ; ou None en cas d'erreur.
+    """
+    if delai < 0:
+        print("Le délai de réapprovisionnement doit être positif")
+        return None
+    if not 0.5 <= niveau_service < 1:
+        print("Le niveau de service doit être compris entre 0.5 et 1")
+        return None
+    if not 0 < fenetre <= jours:
+        print("La fenêtre de moyenne mobile doit être comprise entre 1 et la période analysée")
+        return None
+
+    fin = date.today()
+    debut = fin - timedelta(days=jours)
+    try:
+        produits, sorties = _charger_sorties(debut, fin)
+    except Exception as e:
+        print(f"Erreur lors de la lecture des sorties: {e}")
+        return None
+
+    nb_produits = len(produits)
+    produit = sorties['produit'].astype(np.intp)
+    jour = sorties['jour'].astype(np.int64)
+    quantite = sorties['quantite'].astype(np.float64)
+
+    # Les jours sans sortie valent zéro : les sommes par produit suffisent
+    total = np.bincount(produit, weights=quantite, minlength=nb_produits)
+    carres = np.bincount(produit, weights=quantite * quantite, minlength=nb_produits)
+    moyenne = total / jours
+    ecart_type = np.sqrt(np.maximum(carres / jours - moyenne * moyenne, 0))
+
+    recents = jour >= jours - fenetre
+    moyenne_mobile = np.bincount(produit[recents], weights=quantite[recents],
+                                 minlength=nb_produits) / fenetre
+
+    # s(t) = alpha·x(t) + (1 - alpha)·s(t-1), s(-1) = 0, développé en poids par jour
+    poids = alpha * (1 - alpha) ** (jours - 1 - jour)
+    lissage = np.bincount(produit, weights=quantite * poids, minlength=nb_produits)
+
+    z = NormalDist().inv_cdf(niveau_service)
+    seuils = np.maximum(np.ceil(lissage * delai + z * ecart_type * np.sqrt(delai)), 0).astype(np.int64)
+
+    actifs = total > 0
+    colonnes = np.array(produits, dtype=object).reshape(nb_produits, 3)
+    return {
+        'produit_id': colonnes[actifs, 0],
+        'reference': colonnes[actifs, 1],
+        'seuil_actuel': colonnes[actifs, 2].astype(np.float64),  # NaN si aucun seuil
+        'moyenne_mobile': moyenne_mobile[actifs],
+        'lissage': lissage[actifs],
+        'ecart_type': ecart_type[actifs],
+        'seuil_suggere': seuils[actifs],
+    }
+
+
+def appliquer_seuils(produit_ids, seuils):
+    """
+    Enregistrer les seuils d'alerte suggérés en un seul UPDATE (tableaux dépliés par unnest).
+    Retourne le nombre de produits dont le seuil a changé.
+    """
+    try:
+        with engine.begin() as connexion:
+            return connexion.execute(text(SQL_SEUILS), {
+                'produit_ids': [str(produit_id) for produit_id in produit_ids],
+                'seuils': np.asarray(seuils).tolist()
+            }).rowcount
+    except Exception as e:
+        print(f"Erreur lors de la mise à jour des seuils: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prévision de consommation et seuils d'alerte")
+    parser.add_argument('--jours', type=int, default=730, help="historique analysé (défaut: 730)")
+    parser.add_argument('--fenetre', type=int, default=28, help="fenêtre de la moyenne mobile")
+    parser.add_argument('--alpha', type=float, default=0.1, help="coefficient de lissage")
+    parser.add_argument('--delai', type=int, default=7, help="délai de réapprovisionnement (jours)")
+    parser.add_argument('--niveau-service', type=float, default=0.95)
+    parser.add_argument('--appliquer', action='store_true',
+                        help="enregistrer les seuils suggérés")
+    args = parser.parse_args()
+
+    previsions = calculer_previsions(args.jours, args.fenetre, args.alpha, args.delai,
+                                     args.niveau_service)
+    if previsions is None:
+        sys.exit(1)
+    print(f"{len(previsions['produit_id'])} produit(s) avec des sorties")
+    if args.appliquer:
+        nb = appliquer_seuils(previsions['produit_id'], previsions['seuil_suggere'])
+        if nb is None:
+            sys.exit(1)
+        print(f"{nb} seuil(s) mis à jour")
@@ -2,14 +2,35 @@
 CRUD pour la table produits avec SQLAlchemy
 """
 
-from sqlalchemy import or_
-from connexion import get_session
+from decimal import Decimal
+from sqlalchemy import or_, select, tuple_, case, func, update
+from connexion import get_session, transaction
 from models import Produit, Categorie, Fournisseur
+from mouvement import entree_stock
+
+# Motif de l'entrée enregistrant le stock initial d'un produit créé (voir importation.py)
+MOTIF_STOCK_INITIAL = "Stock initial"
 
 
 def creer_produit(reference, nom, prix_unitaire, description=None, 
-                  quantite_stock=0, seuil_alerte=10, categorie_id=None, fournisseur_id=None):
-    """Créer un nouveau produit"""
+                  quantite_stock=0, seuil_alerte=10, categorie_id=None, fournisseur_id=None,
+                  utilisateur_id=None):
+    """
+    Créer un nouveau produit. Le stock initial est enregistré par une entrée « Stock initial »
+    dans la même unité de travail : le produit n'est pas créé si elle échoue.
+    """
+    with transaction() as uow:
+        produit_id = _inserer_produit(reference, nom, prix_unitaire, description, seuil_alerte,
+                                      categorie_id, fournisseur_id)
+        if produit_id and quantite_stock and not entree_stock(produit_id, quantite_stock,
+                                                              MOTIF_STOCK_INITIAL, utilisateur_id):
+            uow.annuler()
+    return None if uow.annulee else produit_id
+
+
+def _inserer_produit(reference, nom, prix_unitaire, description, seuil_alerte, categorie_id,
+                     fournisseur_id):
+    """Insérer un produit sans stock ; retourne son id ou None"""
     session = get_session()
     try:
         produit = Produit(
@@ -17,7 +38,6 @@ def creer_produit(reference, nom, prix_unitaire, description=None,
             nom=nom,
             description=description,
             prix_unitaire=prix_unitaire,
-            quantite_stock=quantite_stock,
             seuil_alerte=seuil_alerte,
             categorie_id=categorie_id,
             fournisseur_id=fournisseur_id
@@ -33,72 +53,137 @@ def creer_produit(reference, nom, prix_unitaire, description=None,
         session.close()
 
 
+def _selection_produits():
+    """
+    Projection des produits jointe aux noms de catégorie et de fournisseur.
+    Une seule requête, sans chargement d'objets ORM ni lazy loading.
+    """
+    return (
+        select(
+            Produit.id,
+            Produit.reference,
+            Produit.nom,
+            Produit.prix_unitaire,
+            Produit.quantite_stock,
+            Produit.seuil_alerte,
+            Categorie.nom.label('categorie'),
+            Fournisseur.nom.label('fournisseur')
+        )
+        .outerjoin(Categorie, Produit.categorie_id == Categorie.id)
+        .outerjoin(Fournisseur, Produit.fournisseur_id == Fournisseur.id)
+    )
+
+
 def lire_produits():
     """Lire tous les produits avec catégorie et fournisseur"""
-    session = get_session()
+    session = get_session(lecture=True)
+    try:
+        lignes = session.execute(_selection_produits().order_by(Produit.nom, Produit.id))
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def _requete_page(apres=None, limite=50):
+    """Page de produits triés par (nom, id) après le curseur `apres`"""
+    requete = _selection_produits()
+    if apres is not None:
+        requete = requete.where(tuple_(Produit.nom, Produit.id) > tuple_(*apres))
+    return requete.order_by(Produit.nom, Produit.id).limit(limite)
+
+
+def lire_produits_page(apres=None, limite=50):
+    """
+    Lire une page de produits triés par (nom, id).
+    `apres` est le curseur (nom, id) du dernier produit de la page précédente.
+    """
+    session = get_session(lecture=True)
+    try:
+        lignes = session.execute(_requete_page(apres, limite))
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def iterer_produits(taille_lot=1000):
+    """
+    Parcourir tous les produits triés par (nom, id) sans les charger en mémoire.
+    Utilise un curseur côté serveur lu par lots de `taille_lot` lignes.
+    """
+    session = get_session(lecture=True)
     try:
-        produits = session.query(Produit).order_by(Produit.nom).all()
-        result = []
-        for p in produits:
-            result.append((
-                p.id,
-                p.reference,
-                p.nom,
-                p.prix_unitaire,
-                p.quantite_stock,
-                p.seuil_alerte,
-                p.categorie.nom if p.categorie else None,
-                p.fournisseur.nom if p.fournisseur else None
-            ))
-        return result
+        lignes = session.execute(
+            _selection_produits()
+            .order_by(Produit.nom, Produit.id)
+            .execution_options(yield_per=taille_lot)
+        )
+        for ligne in lignes:
+            yield tuple(ligne)
     finally:
         session.close()
 
 
+def _requete_produit(produit_id):
+    """Détail d'un produit avec les noms de sa catégorie et de son fournisseur"""
+    return (
+        select(
+            Produit.id,
+            Produit.reference,
+            Produit.nom,
+            Produit.description,
+            Produit.prix_unitaire,
+            Produit.quantite_stock,
+            Produit.seuil_alerte,
+            Categorie.nom.label('categorie'),
+            Fournisseur.nom.label('fournisseur')
+        )
+        .outerjoin(Categorie, Produit.categorie_id == Categorie.id)
+        .outerjoin(Fournisseur, Produit.fournisseur_id == Fournisseur.id)
+        .where(Produit.id == produit_id)
+    )
+
+
 def lire_produit(produit_id):
     """Lire un produit par son ID"""
-    session = get_session()
+    session = get_session(lecture=True)
     try:
-        p = session.query(Produit).filter(Produit.id == produit_id).first()
-        if p:
-            return (
-                p.id,
-                p.reference,
-                p.nom,
-                p.description,
-                p.prix_unitaire,
-                p.quantite_stock,
-                p.seuil_alerte,
-                p.categorie.nom if p.categorie else None,
-                p.fournisseur.nom if p.fournisseur else None
-            )
+        ligne = session.execute(_requete_produit(produit_id)).first()
+        if ligne:
+            return tuple(ligne)
         return None
     finally:
         session.close()
 
 
-def rechercher_produits(terme):
-    """Rechercher des produits par nom ou référence"""
-    session = get_session()
+def _requete_recherche(terme, limite=50):
+    """Recherche triée par pertinence (voir rechercher_produits)"""
+    requete_texte = func.plainto_tsquery('french', terme)
+    prefixe_reference = Produit.reference.istartswith(terme, autoescape=True)
+    pertinence = (
+        case((prefixe_reference, 1.0), else_=0.0)
+        + func.similarity(Produit.nom, terme)
+        + func.ts_rank(Produit.recherche, requete_texte)
+    )
+    return _selection_produits().where(
+        or_(
+            Produit.nom.icontains(terme, autoescape=True),
+            Produit.reference.icontains(terme, autoescape=True),
+            Produit.recherche.op('@@')(requete_texte)
+        )
+    ).order_by(pertinence.desc(), Produit.nom, Produit.id).limit(limite)
+
+
+def rechercher_produits(terme, limite=50):
+    """
+    Rechercher des produits par nom, référence ou description.
+    Les filtres sont servis par les index GIN (trigrammes et plein texte) ;
+    les résultats sont triés par pertinence : préfixe de référence d'abord,
+    puis similarité du nom et rang plein texte.
+    """
+    session = get_session(lecture=True)
     try:
-        pattern = f"%{terme}%"
-        produits = session.query(Produit).filter(
-            or_(Produit.nom.ilike(pattern), Produit.reference.ilike(pattern))
-        ).order_by(Produit.nom).all()
-        
-        result = []
-        for p in produits:
-            result.append((
-                p.id,
-                p.reference,
-                p.nom,
-                p.prix_unitaire,
-                p.quantite_stock,
-                p.seuil_alerte,
-                p.categorie.nom if p.categorie else None,
-                p.fournisseur.nom if p.fournisseur else None
-            ))
-        return result
+        lignes = session.execute(_requete_recherche(terme, limite))
+        return [tuple(ligne) for ligne in lignes]
     finally:
         session.close()
 
@@ -111,8 +196,9 @@ def modifier_produit(produit_id, **kwargs):
         if not produit:
             return False
         
+        # quantite_stock ne se modifie que par des mouvements (entree_stock, sortie_stock)
         champs_autorises = ['reference', 'nom', 'description', 'prix_unitaire', 
-                           'quantite_stock', 'seuil_alerte', 'categorie_id', 'fournisseur_id']
+                           'seuil_alerte', 'categorie_id', 'fournisseur_id']
         
         for champ, valeur in kwargs.items():
             if champ in champs_autorises and valeur is not None:
@@ -128,6 +214,82 @@ def modifier_produit(produit_id, **kwargs):
         session.close()
 
 
+def _filtre_produits(categorie_id=None, fournisseur_id=None, terme=None):
+    """Conditions de sélection des produits pour les opérations en masse"""
+    conditions = []
+    if categorie_id is not None:
+        conditions.append(Produit.categorie_id == categorie_id)
+    if fournisseur_id is not None:
+        conditions.append(Produit.fournisseur_id == fournisseur_id)
+    if terme:
+        conditions.append(or_(
+            Produit.nom.icontains(terme, autoescape=True),
+            Produit.reference.icontains(terme, autoescape=True)
+        ))
+    return conditions
+
+
+def _valeurs_prix(pourcentage):
+    """Nouveau prix arrondi au centime après une variation de `pourcentage` %"""
+    facteur = 1 + Decimal(str(pourcentage)) / 100
+    return {Produit.prix_unitaire: func.round(Produit.prix_unitaire * facteur, 2)}
+
+
+def _requetes_en_masse(valeurs, conditions):
+    """(comptage, mise à jour) des produits vérifiant `conditions`"""
+    return (
+        select(func.count()).select_from(Produit).where(*conditions),
+        update(Produit).where(*conditions).values(valeurs)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _modifier_en_masse(valeurs, conditions, simulation):
+    """
+    Appliquer `valeurs` à tous les produits vérifiant `conditions` en un seul UPDATE.
+    Avec `simulation`, compte seulement les produits concernés sans rien modifier.
+    Retourne le nombre de produits modifiés (ou concernés), None en cas d'erreur.
+    """
+    comptage, mise_a_jour = _requetes_en_masse(valeurs, conditions)
+    session = get_session()
+    try:
+        if simulation:
+            return session.execute(comptage).scalar()
+        
+        resultat = session.execute(mise_a_jour)
+        session.commit()
+        return resultat.rowcount
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors de la modification en masse: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def modifier_prix_en_masse(pourcentage, categorie_id=None, fournisseur_id=None,
+                           terme=None, simulation=False):
+    """Augmenter (ou baisser) de `pourcentage` % le prix des produits filtrés"""
+    if pourcentage <= -100:
+        print("La baisse ne peut pas atteindre 100%")
+        return None
+    
+    conditions = _filtre_produits(categorie_id, fournisseur_id, terme)
+    return _modifier_en_masse(_valeurs_prix(pourcentage), conditions, simulation)
+
+
+def modifier_seuil_en_masse(seuil_alerte, categorie_id=None, fournisseur_id=None,
+                            terme=None, simulation=False):
+    """Fixer le seuil d'alerte de tous les produits filtrés"""
+    if seuil_alerte < 0:
+        print("Le seuil d'alerte doit être positif")
+        return None
+    
+    valeurs = {Produit.seuil_alerte: seuil_alerte}
+    conditions = _filtre_produits(categorie_id, fournisseur_id, terme)
+    return _modifier_en_masse(valeurs, conditions, simulation)
+
+
 def supprimer_produit(produit_id):
     """Supprimer un produit"""
     session = get_session()
@@ -146,37 +308,63 @@ def supprimer_produit(produit_id):
         session.close()
 
 
+def _requete_alertes():
+    """Produits dont le stock est sous le seuil d'alerte, du plus faible stock au plus fort"""
+    return (
+        select(
+            Produit.id,
+            Produit.reference,
+            Produit.nom,
+            Produit.quantite_stock,
+            Produit.seuil_alerte,
+            Categorie.nom.label('categorie')
+        )
+        .outerjoin(Categorie, Produit.categorie_id == Categorie.id)
+        .where(Produit.quantite_stock <= Produit.seuil_alerte)
+        .order_by(Produit.quantite_stock)
+    )
+
+
 def produits_en_alerte():
     """Obtenir les produits dont le stock est sous le seuil d'alerte"""
-    session = get_session()
+    session = get_session(lecture=True)
     try:
-        produits = session.query(Produit).filter(
-            Produit.quantite_stock <= Produit.seuil_alerte
-        ).order_by(Produit.quantite_stock).all()
-        
-        result = []
-        for p in produits:
-            result.append((
-                p.id,
-                p.reference,
-                p.nom,
-                p.quantite_stock,
-                p.seuil_alerte,
-                p.categorie.nom if p.categorie else None
-            ))
-        return result
+        return [tuple(ligne) for ligne in session.execute(_requete_alertes())]
     finally:
         session.close()
 
 
+def _requete_nombre_alertes():
+    """Nombre de produits en alerte (servi par l'index partiel idx_produits_alerte)"""
+    return (
+        select(func.count()).select_from(Produit)
+        .where(Produit.quantite_stock <= Produit.seuil_alerte)
+    )
+
+
+def compter_produits_en_alerte():
+    """Compter les produits en alerte (servi par l'index partiel idx_produits_alerte)"""
+    session = get_session(lecture=True)
+    try:
+        return session.execute(_requete_nombre_alertes()).scalar()
+    finally:
+        session.close()
+
+
+def _requete_par_categorie(categorie_id):
+    """Produits d'une catégorie triés par nom"""
+    return (
+        select(Produit.id, Produit.reference, Produit.nom,
+               Produit.prix_unitaire, Produit.quantite_stock)
+        .where(Produit.categorie_id == categorie_id)
+        .order_by(Produit.nom)
+    )
+
+
 def produits_par_categorie(categorie_id):
     """Obtenir les produits d'une catégorie"""
-    session = get_session()
+    session = get_session(lecture=True)
     try:
-        produits = session.query(Produit).filter(
-            Produit.categorie_id == categorie_id
-        ).order_by(Produit.nom).all()
-        
-        return [(p.id, p.reference, p.nom, p.prix_unitaire, p.quantite_stock) for p in produits]
+        return [tuple(ligne) for ligne in session.execute(_requete_par_categorie(categorie_id))]
     finally:
         session.close()
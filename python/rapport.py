@@ -0,0 +1,100 @@
+"""
+Rapports de valorisation du stock calculés par PostgreSQL
+Agrégations SQL en direct ou lecture des vues matérialisées
+"""
+
+from sqlalchemy import select, func, text
+from connexion import get_session
+from models import Produit, Categorie, Fournisseur
+
+
+def _agregats_stock():
+    """Colonnes agrégées communes : nombre de produits, quantité et valeur du stock"""
+    return (
+        func.count(Produit.id),
+        func.coalesce(func.sum(Produit.quantite_stock), 0),
+        func.coalesce(func.sum(Produit.prix_unitaire * Produit.quantite_stock), 0)
+    )
+
+
+def valeur_stock_par_categorie(depuis_vue=False):
+    """
+    Valeur du stock par catégorie : liste de (catégorie, nb produits, quantité, valeur),
+    triée par valeur décroissante. Avec `depuis_vue`, lit mv_stock_par_categorie.
+    """
+    session = get_session(lecture=True)
+    try:
+        if depuis_vue:
+            lignes = session.execute(text(
+                "SELECT categorie, nb_produits, quantite, valeur "
+                "FROM mv_stock_par_categorie ORDER BY valeur DESC"
+            ))
+        else:
+            nombre, quantite, valeur = _agregats_stock()
+            lignes = session.execute(
+                select(func.coalesce(Categorie.nom, 'Sans catégorie'), nombre, quantite, valeur)
+                .select_from(Produit)
+                .outerjoin(Categorie, Produit.categorie_id == Categorie.id)
+                .group_by(Produit.categorie_id, Categorie.nom)
+                .order_by(valeur.desc())
+            )
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def valeur_stock_par_fournisseur(depuis_vue=False):
+    """
+    Valeur du stock par fournisseur : liste de (fournisseur, nb produits, quantité, valeur),
+    triée par valeur décroissante. Avec `depuis_vue`, lit mv_stock_par_fournisseur.
+    """
+    session = get_session(lecture=True)
+    try:
+        if depuis_vue:
+            lignes = session.execute(text(
+                "SELECT fournisseur, nb_produits, quantite, valeur "
+                "FROM mv_stock_par_fournisseur ORDER BY valeur DESC"
+            ))
+        else:
+            nombre, quantite, valeur = _agregats_stock()
+            lignes = session.execute(
+                select(func.coalesce(Fournisseur.nom, 'Sans fournisseur'), nombre, quantite, valeur)
+                .select_from(Produit)
+                .outerjoin(Fournisseur, Produit.fournisseur_id == Fournisseur.id)
+                .group_by(Produit.fournisseur_id, Fournisseur.nom)
+                .order_by(valeur.desc())
+            )
+        return [tuple(ligne) for ligne in lignes]
+    finally:
+        session.close()
+
+
+def date_rafraichissement_rapports():
+    """Date du dernier rafraîchissement des vues matérialisées (la plus ancienne des deux)"""
+    session = get_session(lecture=True)
+    try:
+        return session.execute(text(
+            "SELECT least((SELECT max(rafraichi_le) FROM mv_stock_par_categorie), "
+            "(SELECT max(rafraichi_le) FROM mv_stock_par_fournisseur))"
+        )).scalar()
+    finally:
+        session.close()
+
+
+def rafraichir_rapports():
+    """
+    Recalculer les vues matérialisées des rapports.
+    CONCURRENTLY : les lectures des vues ne sont pas bloquées pendant le calcul.
+    """
+    session = get_session()
+    try:
+        session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_stock_par_categorie"))
+        session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_stock_par_fournisseur"))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors du rafraîchissement des rapports: {e}")
+        return False
+    finally:
+        session.close()
@@ -0,0 +1,154 @@
+"""
+Réconciliation du stock des produits avec le journal des mouvements
+Le solde d'un produit (solde archivé + entrées - sorties) doit égaler quantite_stock
+
+Utilisation en ligne de commande :
+    python python/reconciliation.py --travailleurs 8
+    python python/reconciliation.py --corriger
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from connexion import engine
+
+# Libellé des mouvements correctifs ; cumuler_mouvements_journaliers (init.sql) les isole
+# par la colonne regularisation, pas par ce libellé
+MOTIF_CORRECTION = "Régularisation (réconciliation)"
+
+SQL_VARIATION = "CASE WHEN type_mouvement = 'ENTREE' THEN quantite ELSE -quantite END"
+
+# Un seul agrégat groupé ; PostgreSQL le parallélise lui-même sur les partitions
+SQL_ECARTS = f"""
+    SELECT p.id, p.reference, p.nom, p.quantite_stock,
+           coalesce(a.quantite, 0) + coalesce(m.solde, 0) AS solde
+    FROM produits p
+    LEFT JOIN soldes_archives a ON a.produit_id = p.id
+    LEFT JOIN (
+        SELECT produit_id, sum({SQL_VARIATION}) AS solde
+        FROM mouvements_stock
+        GROUP BY produit_id
+    ) m ON m.produit_id = p.id
+    WHERE p.quantite_stock <> coalesce(a.quantite, 0) + coalesce(m.solde, 0)
+    ORDER BY p.reference
+"""
+
+SQL_PARTITIONS = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'mouvements_stock'::regclass
+"""
+
+# Écart recalculé dans l'instruction même : un mouvement concurrent modifie le stock et le
+# journal ensemble et ne change donc pas l'écart. La correction est datée du début de
+# l'historique du produit pour ne pas fausser les instantanés et le stock à une date.
+SQL_CORRECTION = f"""
+    INSERT INTO mouvements_stock (produit_id, type_mouvement, quantite, motif, utilisateur_id,
+                                  date_mouvement, regularisation)
+    SELECT p.id, CASE WHEN e.ecart > 0 THEN 'ENTREE' ELSE 'SORTIE' END, abs(e.ecart),
+           :motif, :utilisateur_id, least(p.created_at, e.premier, LOCALTIMESTAMP), TRUE
+    FROM produits p
+    CROSS JOIN LATERAL (
+        SELECT p.quantite_stock - coalesce(sum({SQL_VARIATION}), 0)
+               - coalesce((SELECT quantite FROM soldes_archives a WHERE a.produit_id = p.id), 0)
+               AS ecart,
+               min(m.date_mouvement) AS premier
+        FROM mouvements_stock m
+        WHERE m.produit_id = p.id
+    ) e
+    WHERE p.id = ANY(:produit_ids) AND e.ecart <> 0
+"""
+
+
+def _soldes_partition(partition, instantane):
+    """Soldes par produit d'une partition, lus dans l'instantané exporté par le coordinateur"""
+    with engine.connect().execution_options(isolation_level='REPEATABLE READ') as connexion:
+        connexion.execute(text(f"SET TRANSACTION SNAPSHOT '{instantane}'"))
+        nom = connexion.dialect.identifier_preparer.quote(partition)
+        return connexion.execute(text(
+            f"SELECT produit_id, sum({SQL_VARIATION}) FROM {nom} GROUP BY produit_id"
+        )).all()
+
+
+def _ecarts_paralleles(travailleurs):
+    """
+    Agréger chaque partition de mouvements_stock dans un thread distinct.
+    Tous les travailleurs partagent l'instantané (pg_export_snapshot) de la transaction
+    qui lit le stock : le résultat est cohérent malgré les mouvements concurrents.
+    """
+    with engine.connect().execution_options(isolation_level='REPEATABLE READ') as connexion:
+        instantane = connexion.execute(text("SELECT pg_export_snapshot()")).scalar()
+        produits = connexion.execute(text(
+            "SELECT p.id, p.reference, p.nom, p.quantite_stock, coalesce(a.quantite, 0) "
+            "FROM produits p LEFT JOIN soldes_archives a ON a.produit_id = p.id"
+        )).all()
+        partitions = connexion.execute(text(SQL_PARTITIONS)).scalars().all()
+
+        soldes = {p.id: p[4] for p in produits}
+        with ThreadPoolExecutor(max_workers=travailleurs) as executeur:
+            for lignes in executeur.map(lambda nom: _soldes_partition(nom, instantane), partitions):
+                for produit_id, solde in lignes:
+                    soldes[produit_id] = soldes.get(produit_id, 0) + solde
+
+    return sorted(
+        ((p.id, p.reference, p.nom, p.quantite_stock, soldes[p.id])
+         for p in produits if p.quantite_stock != soldes[p.id]),
+        key=lambda ecart: ecart[1]
+    )
+
+
+def reconcilier(travailleurs=1):
+    """
+    Comparer le stock de chaque produit au solde de ses mouvements.
+    Avec `travailleurs` > 1, les partitions mensuelles sont agrégées en parallèle.
+    Retourne la liste des écarts (id, référence, nom, stock, solde, écart), écart = stock - solde,
+    ou None en cas d'erreur.
+    """
+    try:
+        if travailleurs > 1:
+            ecarts = _ecarts_paralleles(travailleurs)
+        else:
+            with engine.connect() as connexion:
+                ecarts = connexion.execute(text(SQL_ECARTS)).all()
+        return [(e[0], e[1], e[2], e[3], e[4], e[3] - e[4]) for e in ecarts]
+    except Exception as e:
+        print(f"Erreur lors de la réconciliation: {e}")
+        return None
+
+
+def corriger_ecarts(produit_ids, utilisateur_id=None):
+    """
+    Enregistrer pour chaque produit un mouvement de régularisation égal à son écart,
+    sans modifier quantite_stock. Retourne le nombre de mouvements créés.
+    """
+    try:
+        with engine.begin() as connexion:
+            return connexion.execute(text(SQL_CORRECTION), {
+                'produit_ids': list(produit_ids),
+                'motif': MOTIF_CORRECTION,
+                'utilisateur_id': utilisateur_id
+            }).rowcount
+    except Exception as e:
+        print(f"Erreur lors de la correction des écarts: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Réconciliation stock / mouvements")
+    parser.add_argument('--travailleurs', type=int, default=1,
+                        help="nombre de partitions agrégées en parallèle (défaut: 1)")
+    parser.add_argument('--corriger', action='store_true',
+                        help="enregistrer des mouvements de régularisation")
+    args = parser.parse_args()
+
+    ecarts = reconcilier(args.travailleurs)
+    if ecarts is None:
+        sys.exit(1)
+    for _, reference, nom, stock, solde, ecart in ecarts:
+        print(f"{reference}\t{nom}\tstock={stock}\tsolde={solde}\técart={ecart:+d}")
+    print(f"{len(ecarts)} écart(s)")
+    if ecarts and args.corriger:
+        print(f"{corriger_ecarts([e[0] for e in ecarts])} mouvement(s) de régularisation")
@@ -4,6 +4,7 @@ Gestion de l'authentification
 """
 
 import hashlib
+from sqlalchemy import text
 from connexion import get_session
 from models import Utilisateur
 
@@ -40,6 +41,37 @@ def creer_utilisateur(username, mot_de_passe, role='user'):
         session.close()
 
 
+def inscrire_utilisateur(username, mot_de_passe):
+    """
+    Inscrire un utilisateur : le premier inscrit devient administrateur, les suivants 'user'.
+    Le rôle est décidé dans la transaction d'insertion, la table étant verrouillée contre
+    les inscriptions simultanées. Retourne (id, rôle) ou None.
+    """
+    session = get_session()
+    try:
+        session.execute(text("LOCK TABLE utilisateurs IN SHARE ROW EXCLUSIVE MODE"))
+        existant = session.query(Utilisateur.id).filter(Utilisateur.username == username).first()
+        if existant:
+            print("Ce nom d'utilisateur existe déjà")
+            return None
+        
+        role = 'user' if session.query(Utilisateur.id).first() else 'admin'
+        utilisateur = Utilisateur(
+            username=username,
+            password_hash=hasher_mot_de_passe(mot_de_passe),
+            role=role
+        )
+        session.add(utilisateur)
+        session.commit()
+        return (utilisateur.id, role)
+    except Exception as e:
+        session.rollback()
+        print(f"Erreur lors de l'inscription: {e}")
+        return None
+    finally:
+        session.close()
+
+
 def authentifier(username, mot_de_passe):
     """Authentifier un utilisateur"""
     session = get_session()
@@ -60,7 +92,7 @@ def authentifier(username, mot_de_passe):
 
 def lire_utilisateurs():
     """Lire tous les utilisateurs"""
-    session = get_session()
+    session = get_session(lecture=True)
     try:
         utilisateurs = session.query(Utilisateur).order_by(Utilisateur.username).all()
         return [(u.id, u.username, u.role, u.actif) for u in utilisateurs]
@@ -70,7 +102,7 @@ def lire_utilisateurs():
 
 def lire_utilisateur(utilisateur_id):
     """Lire un utilisateur par son ID"""
-    session = get_session()
+    session = get_session(lecture=True)
     try:
         u = session.query(Utilisateur).filter(Utilisateur.id == utilisateur_id).first()
         if u:
@@ -188,7 +220,7 @@ def supprimer_utilisateur(utilisateur_id):
 
 
 def compter_utilisateurs():
-    """Compter le nombre d'utilisateurs"""
+    """Compter le nombre d'utilisateurs (sur le primaire : sert à des décisions de rôle)"""
     session = get_session()
     try:
         return session.query(Utilisateur).count()